@@ -0,0 +1,203 @@
+"""Reproducible performance benchmarks for CrystalGrowthSimulation.
+
+Every case (lattice size x temperature x coverage x engine) starts from the
+same seeded lattice, pre-grown to the requested coverage, and is measured
+three ways:
+
+- throughput: events and steps per second of run_steps, as in a real run
+  (compiled kernel included when the engine uses it);
+- phases: the simulation's own per-phase metrics (enable_profiling) for
+  rate calculation, event selection, event execution, cluster update and
+  step bookkeeping over the same number of Python steps;
+- memory: tracemalloc peak while building the simulation and stepping.
+
+    python benchmark.py --sizes 32 64 --temperatures 700 800 --coverages 0.05 0.3 \
+        --engines grouped tree --steps 5000 --output bench/baseline.json
+    python benchmark.py ... --compare bench/baseline.json --tolerance 0.15
+
+With --compare, cases present in both files are checked against the
+baseline; a throughput drop or memory increase beyond the tolerance is a
+regression, and the exit status is 1 if any were found. Timings are only
+comparable between runs on the same machine.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from typing import Callable, Dict, List, Optional
+from kmc import CrystalGrowthSimulation, ENGINES, KERNELS, PROFILED_METHODS
+import kernels
+
+BENCHMARK_VERSION = 2
+# Phases of the Python step path (see CrystalGrowthSimulation.enable_profiling)
+PHASES = tuple(phase for phase in PROFILED_METHODS if phase != 'compiled_batch')
+# Upper bound on the steps used to grow a lattice to a coverage level
+MAX_WARMUP_STEPS = 5_000_000
+
+def grow_lattice(size: int, temperature: float, coverage: float, seed: int) -> np.ndarray:
+    """Lattice of a seeded run stopped at the given coverage."""
+    sim = CrystalGrowthSimulation(size, temperature, seed=seed)
+    sim.run_steps(MAX_WARMUP_STEPS, max_coverage=coverage)
+    return sim.lattice.copy()
+
+def simulation_at(lattice: np.ndarray, temperature: float, engine: str, kernel: str,
+                  seed: int) -> CrystalGrowthSimulation:
+    """Simulation with the given engine, continuing from lattice."""
+    sim = CrystalGrowthSimulation(lattice.shape, temperature, engine=engine, kernel=kernel, seed=seed)
+    sim.lattice[...] = lattice
+    sim._rebuild_site_sets()
+    sim._rebuild_indexes()
+    return sim
+
+def run_case(lattice: np.ndarray, temperature: float, engine: str, steps: int,
+             kernel: str = 'auto', seed: int = 0) -> Dict:
+    """Throughput, per-phase times and peak memory of one case."""
+    # Throughput, as a real run would step
+    sim = simulation_at(lattice, temperature, engine, kernel, seed)
+    events_before = sum(sim.event_counts.values())
+    start = time.perf_counter()
+    executed = sim.run_steps(steps)
+    wall = time.perf_counter() - start
+    events = sum(sim.event_counts.values()) - events_before
+
+    # Phases, on the Python step path the compiled kernel mirrors
+    sim = simulation_at(lattice, temperature, engine, 'python', seed)
+    sim.enable_profiling()
+    phase_steps = sim.run_steps(steps)
+    metrics = sim.metrics
+
+    # Peak traced allocation while building the simulation and stepping it
+    tracemalloc.start()
+    try:
+        sim = simulation_at(lattice, temperature, engine, kernel, seed)
+        sim.run_steps(min(steps, 1000))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'steps': executed,
+        'events': events,
+        'wall_time': wall,
+        'steps_per_second': executed / wall if wall > 0 else 0.0,
+        'events_per_second': events / wall if wall > 0 else 0.0,
+        'compiled': sim.use_kernel,
+        'phase_steps': phase_steps,
+        'phases': {
+            phase: {
+                **metrics.get(phase, {'seconds': 0.0, 'calls': 0}),
+                'us_per_step': 1e6 * metrics[phase]['seconds'] / phase_steps if phase in metrics else 0.0
+            }
+            for phase in PHASES
+        },
+        'peak_memory_bytes': peak
+    }
+
+def case_key(case: Dict) -> str:
+    return f"size={case['size']} T={case['temperature']} coverage={case['coverage']} engine={case['engine']}"
+
+def run_benchmarks(sizes: List[int], temperatures: List[float], coverages: List[float],
+                   engines: List[str], steps: int, kernel: str = 'auto', seed: int = 0,
+                   progress: Optional[Callable[[str], None]] = print) -> Dict:
+    """Run every case of the grid and return the JSON-serializable result set."""
+    cases = []
+    for size in sizes:
+        for temperature in temperatures:
+            for coverage in coverages:
+                lattice = grow_lattice(size, temperature, coverage, seed)
+                actual = float(np.count_nonzero(lattice) / lattice.size)
+                for engine in engines:
+                    case = {'size': size, 'temperature': temperature, 'coverage': coverage,
+                            'engine': engine, 'actual_coverage': actual}
+                    case.update(run_case(lattice, temperature, engine, steps, kernel, seed))
+                    cases.append(case)
+                    if progress:
+                        progress(f"{case_key(case):<52} {case['events_per_second']:>12,.0f} events/s "
+                                 f"{case['peak_memory_bytes'] / 2**20:>8.1f} MiB")
+    return {
+        'version': BENCHMARK_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': kernels.NUMBA_AVAILABLE
+        },
+        'settings': {'steps': steps, 'kernel': kernel, 'seed': seed},
+        'cases': cases
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Regressions of results against baseline, matching cases by parameters."""
+    base_cases = {case_key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        base = base_cases.get(case_key(case))
+        if base is None:
+            continue
+        checks = [
+            ('events_per_second', case['events_per_second'] < base['events_per_second'] * (1 - tolerance)),
+            ('peak_memory_bytes', case['peak_memory_bytes'] > base['peak_memory_bytes'] * (1 + tolerance))
+        ]
+        for metric, regressed in checks:
+            if regressed:
+                regressions.append({'case': case_key(case), 'metric': metric,
+                                    'baseline': base[metric], 'current': case[metric],
+                                    'change': case[metric] / base[metric] - 1 if base[metric] else 0.0})
+    return regressions
+
+def print_phase_table(results: Dict):
+    """Per-phase microseconds per step of every case."""
+    print(f"\n{'case':<52}" + ''.join(f"{phase:>18}" for phase in PHASES))
+    for case in results['cases']:
+        print(f"{case_key(case):<52}" + ''.join(
+            f"{case['phases'][phase]['us_per_step']:>15.1f} us" for phase in PHASES))
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark crystal growth KMC performance.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[16, 32], help="Lattice edge lengths")
+    parser.add_argument('--temperatures', type=float, nargs='+', default=[800], help="Temperatures (K)")
+    parser.add_argument('--coverages', type=float, nargs='+', default=[0.05, 0.3],
+                        help="Coverage levels to pre-grow the lattice to")
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=list(ENGINES), help="Engines to measure")
+    parser.add_argument('--steps', type=int, default=5000, help="Measured steps per case")
+    parser.add_argument('--kernel', choices=KERNELS, default='auto', help="Grouped-engine kernel for throughput")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for growing and stepping")
+    parser.add_argument('--output', help="Write results as JSON to this path")
+    parser.add_argument('--compare', metavar='BASELINE', help="Flag regressions against a saved result file")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative throughput drop or memory increase")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    results = run_benchmarks(args.sizes, args.temperatures, args.coverages, args.engines,
+                             args.steps, args.kernel, args.seed)
+    print_phase_table(results)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if not regressions:
+            print(f"\nNo regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+            return 0
+        print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+        for r in regressions:
+            print(f"  {r['case']:<52} {r['metric']:<18} {r['baseline']:,.0f} -> {r['current']:,.0f} "
+                  f"({r['change']:+.1%})")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
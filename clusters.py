@@ -8,14 +8,43 @@
 # _detect_clusters()	           Detects clusters of type 2 atoms using scipy.ndimage.label()
 # _update_cluster_info()	       Calls _detect_clusters, stores cluster sizes, critical ones
 # get_nucleated_clusters()       (optional)	Returns info of clusters ≥ critical for visualization
+# IncrementalClusterTracker      Same API, updated per event with local merges instead of full relabeling
 
 
+import heapq
+import itertools
 import numpy as np
-from scipy.ndimage import label, center_of_mass
-from typing import Dict, List
+from typing import Callable, Dict, List, Set, Tuple
 from constants import STRUCTURE_3D, STATES
 
+class ClusterRecord(dict):
+    """Cluster property dict whose expensive entries are computed on first access.
+
+    Keys listed in ``lazy`` map to zero-argument loaders; reading one calls its
+    loader once and stores the result, so callers such as nucleation or the
+    visualizer only pay for 'indices' when they actually use it.
+    """
+    def __init__(self, values: dict, lazy: Dict[str, Callable[[], object]] = None):
+        super().__init__(values)
+        self._lazy = dict(lazy or {})
+
+    def __missing__(self, key):
+        if key not in self._lazy:
+            raise KeyError(key)
+        value = self[key] = self._lazy.pop(key)()
+        return value
+
+    def __contains__(self, key):
+        return super().__contains__(key) or key in self._lazy
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+
 class ClusterAnalyzer:
+    # Full relabel after every step; event hooks below are no-ops
+    incremental = False
+
     def __init__(self, critical_size: int):
         self.critical_size = critical_size
         self.cluster_labels = None
@@ -24,30 +53,74 @@ class ClusterAnalyzer:
         self.cluster_properties: Dict[int, dict] = {}
 
     def update_cluster_info(self, lattice: np.ndarray):
-        """Detect and analyze clusters in the lattice."""
-        binary = (lattice == STATES['MOBILE']).astype(int)
+        """Detect and analyze clusters in the lattice.
+
+        All properties come from one pass over the labeled sites: sizes and
+        centers from weighted bincounts, extents from find_objects slices.
+        Member indices are grouped by a single sort, done only when the first
+        cluster's 'indices' is requested.
+        """
+        # scipy is only needed for full relabeling, keep it off the import path
+        from scipy.ndimage import label, find_objects
+        
+        binary = lattice == STATES['MOBILE']
         self.cluster_labels, self.num_clusters = label(binary, structure=STRUCTURE_3D)
         
         self.cluster_sizes.clear()
         self.cluster_properties.clear()
+        if self.num_clusters == 0:
+            return
         
-        for cluster_id in range(1, self.num_clusters + 1):
-            mask = (self.cluster_labels == cluster_id)
-            indices = np.argwhere(mask)
-            
-            self.cluster_sizes[cluster_id] = int(np.sum(mask))
-            self.cluster_properties[cluster_id] = {
-                'size': self.cluster_sizes[cluster_id],
-                'center': center_of_mass(mask),
-                'extent': np.ptp(indices, axis=0),
-                'indices': indices
-            }
+        shape = self.cluster_labels.shape
+        sites = np.flatnonzero(self.cluster_labels)
+        ids = self.cluster_labels.ravel()[sites]
+        sizes = np.bincount(ids, minlength=self.num_clusters + 1)
+        coords = np.unravel_index(sites, shape)
+        centers = np.stack([
+            np.bincount(ids, weights=c, minlength=self.num_clusters + 1)[1:] / sizes[1:]
+            for c in coords
+        ], axis=1)
+        bounds = np.concatenate(([0], np.cumsum(sizes[1:])))
+        grouped = []
+        
+        def member_indices(cluster_id: int) -> np.ndarray:
+            if not grouped:
+                # Stable sort keeps C order within each cluster, like np.argwhere
+                grouped.append(sites[np.argsort(ids, kind='stable')])
+            members = grouped[0][bounds[cluster_id - 1]:bounds[cluster_id]]
+            return np.column_stack(np.unravel_index(members, shape))
+        
+        for cluster_id, box in enumerate(find_objects(self.cluster_labels), start=1):
+            size = int(sizes[cluster_id])
+            self.cluster_sizes[cluster_id] = size
+            self.cluster_properties[cluster_id] = ClusterRecord({
+                'id': cluster_id,
+                'size': size,
+                'center': tuple(centers[cluster_id - 1]),
+                'extent': np.array([s.stop - s.start - 1 for s in box])
+            }, lazy={'indices': lambda cid=cluster_id: member_indices(cid)})
+
+    def atom_added(self, pos: Tuple[int, int, int]):
+        """Notify that a mobile atom appeared at pos."""
+
+    def atom_removed(self, pos: Tuple[int, int, int]):
+        """Notify that the mobile atom at pos disappeared."""
+
+    def cluster_removed(self, cluster_id: int):
+        """Notify that a whole cluster stopped being mobile (nucleation)."""
+
+    def has_critical_clusters(self) -> bool:
+        """Whether any cluster reaches the critical size."""
+        return any(size >= self.critical_size for size in self.cluster_sizes.values())
+
+    def critical_atom_count(self) -> int:
+        """Total number of atoms in clusters of at least the critical size."""
+        return sum(size for size in self.cluster_sizes.values() if size >= self.critical_size)
 
     def get_critical_clusters(self) -> List[dict]:
         """Get clusters exceeding critical size."""
         return [
-            {'id': cid, **props}
-            for cid, props in self.cluster_properties.items()
+            props for props in self.cluster_properties.values()
             if props['size'] >= self.critical_size
         ]
 
@@ -61,4 +134,314 @@ class ClusterAnalyzer:
             'critical_clusters': critical,
             'largest_size': max(sizes) if sizes else 0,
             'size_distribution': {s: sizes.count(s) for s in set(sizes)}
-        }
\ No newline at end of file
+        }
+
+
+class IncrementalClusterTracker(ClusterAnalyzer):
+    """Cluster tracker updated per event instead of relabeling the lattice.
+
+    A new mobile atom merges the clusters around it, relabeling the smaller
+    ones into the largest. A leaving atom can only split its cluster if its
+    remaining neighbors in the cluster are not connected to each other
+    within its 3x3x3 neighborhood; only then are the separate groups
+    flood-filled, all at once, until they meet, so the cost follows the
+    smallest piece cut off rather than the cluster size.
+    Connectivity matches update_cluster_info: 26 neighbors, not periodic.
+    Properties of a cluster are computed on demand and cached until its
+    membership changes.
+    """
+    incremental = True
+    OFFSETS = [d for d in itertools.product((-1, 0, 1), repeat=3) if d != (0, 0, 0)]
+
+    def __init__(self, critical_size: int):
+        super().__init__(critical_size)
+        self.members: Dict[int, Set[Tuple[int, int, int]]] = {}
+        self._critical_ids: Set[int] = set()
+        self._first: Dict[int, Tuple[int, int, int]] = {}  # smallest member site, where known
+        self._free_ids: List[int] = []
+        self._next_id = 1
+
+    def update_cluster_info(self, lattice: np.ndarray):
+        """Rebuild all clusters from scratch by flood-filling the mobile atoms.
+
+        IDs are assigned in C order of each cluster's first site, the same
+        numbering scipy.ndimage.label produces.
+        """
+        self.cluster_labels = np.zeros(lattice.shape, dtype=np.int32)
+        self.members.clear()
+        self.cluster_sizes.clear()
+        self.cluster_properties.clear()
+        self._critical_ids.clear()
+        self._first.clear()
+        
+        mobile = list(map(tuple, np.argwhere(lattice == STATES['MOBILE']).tolist()))
+        remaining = set(mobile)
+        for pos in mobile:
+            if pos not in remaining:
+                continue
+            part = self._flood(pos, remaining)
+            remaining -= part
+            cluster_id = len(self.members) + 1
+            self.members[cluster_id] = part
+            self._first[cluster_id] = pos  # Sites are visited in C order
+            self._relabel(part, cluster_id)
+            self._set_size(cluster_id, len(part))
+        
+        self._next_id = len(self.members) + 1
+        self._free_ids = []
+        self.num_clusters = len(self.members)
+
+    def get_state(self) -> Dict:
+        """Labels and ID bookkeeping needed to resume with identical cluster IDs."""
+        return {
+            'labels': self.cluster_labels.copy(),
+            'free_ids': sorted(self._free_ids),
+            'next_id': self._next_id
+        }
+
+    def set_state(self, state: Dict):
+        """Restore a state produced by get_state."""
+        self.cluster_labels = np.asarray(state['labels'], dtype=np.int32).copy()
+        self.members.clear()
+        self.cluster_sizes.clear()
+        self.cluster_properties.clear()
+        self._critical_ids.clear()
+        self._first.clear()
+        for pos in map(tuple, np.argwhere(self.cluster_labels > 0).tolist()):
+            self.members.setdefault(int(self.cluster_labels[pos]), set()).add(pos)
+        for cluster_id, members in self.members.items():
+            self._set_size(cluster_id, len(members))
+        self._free_ids = list(state['free_ids'])
+        heapq.heapify(self._free_ids)
+        self._next_id = int(state['next_id'])
+        self.num_clusters = len(self.members)
+
+    def atom_added(self, pos: Tuple[int, int, int]):
+        """Attach a new mobile atom, merging every cluster it touches."""
+        touching = {int(self.cluster_labels[n]) for n in self._neighbors(pos)} - {0}
+        if not touching:
+            target = self._new_id()
+            self.members[target] = set()
+            first = pos
+        else:
+            target = max(touching, key=lambda cid: len(self.members[cid]))
+            firsts = [self._first.get(cid) for cid in touching]
+            first = None if None in firsts else min(min(firsts), pos)
+            for cluster_id in touching - {target}:
+                merged = self.members.pop(cluster_id)
+                self._relabel(merged, target)
+                self.members[target] |= merged
+                self._drop_id(cluster_id)
+        
+        if first is None:
+            self._first.pop(target, None)
+        else:
+            self._first[target] = first
+        self.members[target].add(pos)
+        self.cluster_labels[pos] = target
+        self._set_size(target, len(self.members[target]))
+        self.num_clusters = len(self.members)
+
+    def atom_removed(self, pos: Tuple[int, int, int]):
+        """Remove a mobile atom and split its cluster if it was a bridge."""
+        cluster_id = int(self.cluster_labels[pos])
+        if cluster_id == 0:
+            return
+        self.cluster_labels[pos] = 0
+        members = self.members[cluster_id]
+        members.discard(pos)
+        if self._first.get(cluster_id) == pos:
+            del self._first[cluster_id]
+        
+        linked = [n for n in self._neighbors(pos) if self.cluster_labels[n] == cluster_id]
+        if not members:
+            del self.members[cluster_id]
+            self._drop_id(cluster_id)
+            self.num_clusters = len(self.members)
+            return
+        self._set_size(cluster_id, len(members))
+        groups = self._local_groups(linked)
+        if len(groups) > 1:
+            # Neighbors not joined around pos may still be joined further out
+            self._split(cluster_id, groups)
+        self.num_clusters = len(self.members)
+
+    def cluster_removed(self, cluster_id: int):
+        """Drop a cluster whose atoms all left the mobile state."""
+        members = self.members.pop(cluster_id)
+        self._relabel(members, 0)
+        self._drop_id(cluster_id)
+        self.num_clusters = len(self.members)
+
+    def has_critical_clusters(self) -> bool:
+        return bool(self._critical_ids)
+
+    def critical_atom_count(self) -> int:
+        return sum(len(self.members[cid]) for cid in self._critical_ids)
+
+    def get_critical_clusters(self) -> List[dict]:
+        """Get clusters exceeding critical size, in C order of their first site.
+
+        That is the order update_cluster_info and scipy labeling give, so the
+        result does not depend on the event history that produced the IDs.
+        """
+        ordered = sorted(self._critical_ids, key=self._first_site)
+        return [self._properties(cid) for cid in ordered]
+
+    def _first_site(self, cluster_id: int) -> Tuple[int, int, int]:
+        """Smallest member site of a cluster, rescanned only after that site left."""
+        first = self._first.get(cluster_id)
+        if first is None:
+            first = self._first[cluster_id] = min(self.members[cluster_id])
+        return first
+
+    def _properties(self, cluster_id: int) -> ClusterRecord:
+        """Cached cluster record; center, extent and indices are filled in lazily."""
+        props = self.cluster_properties.get(cluster_id)
+        if props is None:
+            # Snapshot membership so a record handed out earlier stays consistent
+            members = tuple(self.members[cluster_id])
+            indices = []
+            
+            def member_indices() -> np.ndarray:
+                if not indices:
+                    indices.append(np.array(sorted(members)))
+                return indices[0]
+            
+            props = ClusterRecord({'id': cluster_id, 'size': len(members)}, lazy={
+                'center': lambda: tuple(member_indices().mean(axis=0)),
+                'extent': lambda: np.ptp(member_indices(), axis=0),
+                'indices': member_indices
+            })
+            self.cluster_properties[cluster_id] = props
+        return props
+
+    @staticmethod
+    def _local_groups(sites: List[Tuple[int, int, int]]) -> List[List[Tuple[int, int, int]]]:
+        """Connected groups of the given sites, using only links between them."""
+        remaining = set(sites)
+        groups = []
+        while remaining:
+            stack = [remaining.pop()]
+            group = []
+            while stack:
+                site = stack.pop()
+                group.append(site)
+                near = [n for n in remaining if max(abs(a - b) for a, b in zip(site, n)) == 1]
+                remaining.difference_update(near)
+                stack.extend(near)
+            groups.append(group)
+        return groups
+
+    def _split(self, cluster_id: int, seeds: List[List[Tuple[int, int, int]]]):
+        """Flood from every seed group at once; groups that meet merge, finished ones split off.
+
+        The floods advance one site each in turn and stop once a single group
+        is left growing, which keeps cluster_id; every group that ran out of
+        sites first is a separate piece and gets a new ID.
+        """
+        members = self.members[cluster_id]
+        owner: Dict[Tuple[int, int, int], int] = {}
+        parent = list(range(len(seeds)))
+        sites = [set(group) for group in seeds]
+        stacks = [list(group) for group in seeds]
+        for index, group in enumerate(seeds):
+            for site in group:
+                owner[site] = index
+
+        def root(index: int) -> int:
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        active = set(range(len(seeds)))
+        while len(active) > 1:
+            for index in list(active):
+                if index not in active or len(active) == 1:
+                    continue
+                if not stacks[index]:
+                    # Fully explored without meeting another group: a separate piece
+                    active.discard(index)
+                    self._split_off(cluster_id, sites[index])
+                    continue
+                site = stacks[index].pop()
+                for n in self._neighbors(site):
+                    if n not in members:
+                        continue
+                    other = owner.get(n)
+                    if other is None:
+                        owner[n] = index
+                        sites[index].add(n)
+                        stacks[index].append(n)
+                        continue
+                    other = root(other)
+                    if other != index:
+                        # Two floods met: keep the larger one, folding the other into it
+                        keep, fold = (index, other) if len(sites[index]) >= len(sites[other]) else (other, index)
+                        parent[fold] = keep
+                        sites[keep] |= sites[fold]
+                        stacks[keep].extend(stacks[fold])
+                        sites[fold], stacks[fold] = set(), []
+                        active.discard(fold)
+                        if fold == index:
+                            stacks[keep].append(site)  # Its remaining neighbors are now keep's to visit
+                            break
+        self._set_size(cluster_id, len(members))
+
+    def _split_off(self, cluster_id: int, part: Set[Tuple[int, int, int]]):
+        """Move a disconnected piece of a cluster to a new ID."""
+        self.members[cluster_id] -= part
+        if self._first.get(cluster_id) in part:
+            del self._first[cluster_id]
+        new_id = self._new_id()
+        self.members[new_id] = part
+        self._first[new_id] = min(part)
+        self._relabel(part, new_id)
+        self._set_size(new_id, len(part))
+
+    def _flood(self, start: Tuple[int, int, int], allowed: Set[Tuple[int, int, int]]) -> Set[Tuple[int, int, int]]:
+        """Connected part of allowed that contains start."""
+        seen = {start}
+        stack = [start]
+        while stack:
+            for n in self._neighbors(stack.pop()):
+                if n in allowed and n not in seen:
+                    seen.add(n)
+                    stack.append(n)
+        return seen
+
+    def _neighbors(self, pos: Tuple[int, int, int]):
+        """In-bounds 26-connected neighbors of a site."""
+        shape = self.cluster_labels.shape
+        x, y, z = pos
+        for dx, dy, dz in self.OFFSETS:
+            nx, ny, nz = x + dx, y + dy, z + dz
+            if 0 <= nx < shape[0] and 0 <= ny < shape[1] and 0 <= nz < shape[2]:
+                yield (nx, ny, nz)
+
+    def _relabel(self, sites: Set[Tuple[int, int, int]], cluster_id: int):
+        if sites:
+            self.cluster_labels[tuple(np.array(list(sites)).T)] = cluster_id
+
+    def _set_size(self, cluster_id: int, size: int):
+        self.cluster_sizes[cluster_id] = size
+        self.cluster_properties.pop(cluster_id, None)
+        if size >= self.critical_size:
+            self._critical_ids.add(cluster_id)
+        else:
+            self._critical_ids.discard(cluster_id)
+
+    def _new_id(self) -> int:
+        # Reuse freed IDs so labels stay compact for find_objects
+        if self._free_ids:
+            return heapq.heappop(self._free_ids)
+        self._next_id += 1
+        return self._next_id - 1
+
+    def _drop_id(self, cluster_id: int):
+        self._first.pop(cluster_id, None)
+        self.cluster_sizes.pop(cluster_id, None)
+        self.cluster_properties.pop(cluster_id, None)
+        self._critical_ids.discard(cluster_id)
+        heapq.heappush(self._free_ids, cluster_id)
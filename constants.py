@@ -44,7 +44,8 @@ VISUALIZATION = {
         '#B07AA1'   # 6: Cluster
     ],
     'view_angle': (30, 45),
-    'voxel_alpha': 0.85
+    'voxel_alpha': 0.85,
+    'render_modes': ('voxels', 'surface', 'maps')  # CrystalVisualizer modes
 }
 
 # Diffusion parameters
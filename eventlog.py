@@ -0,0 +1,235 @@
+"""Streaming append-only event trajectory log with replay.
+
+Every lattice change made by CrystalGrowthSimulation is stored as a fixed-size
+binary record (step, time, event type, from-site, to-site). Records are
+buffered into chunks in the stepping thread and written by a background
+thread, so the KMC loop never waits on disk I/O.
+
+File layout: an 8-byte magic, then any number of chunks, each a uint32
+record count followed by that many EVENT_RECORD records. Chunks are only
+appended, and a chunk cut short by a crash is ignored on read. Every writer
+starts with an empty chunk that marks a new session; when a run is resumed
+from a checkpoint, records of earlier sessions from that step on are
+superseded by the new session.
+
+replay_lattice() rebuilds the lattice at any step from the nearest earlier
+checkpoint plus the logged deltas, so snapshots for analysis and rendering
+can be produced after the run without re-simulating.
+"""
+import os
+import queue
+import struct
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from constants import STATES
+
+MAGIC = b'KMCEVLG1'
+
+EVENT_RECORD = np.dtype([
+    ('step', '<u8'),
+    ('time', '<f8'),
+    ('event', 'u1'),
+    ('src', '<i4', (3,)),
+    ('dst', '<i4', (3,))
+])
+
+# Event type codes; nucleation writes one record per converted site with src == dst
+EVENT_CODES = {
+    'attach': 1,
+    'diffuse_x': 2,
+    'diffuse_y': 3,
+    'diffuse_z': 4,
+    'nucleation': 5
+}
+EVENT_NAMES = {code: name for name, code in EVENT_CODES.items()}
+
+_CHUNK_HEADER = struct.Struct('<I')
+
+class EventLogWriter:
+    """Chunked append-only event log fed from the stepping loop.
+
+    append() only copies a record into the current in-memory chunk; full
+    chunks are handed to a writer thread through a bounded queue.
+    """
+    def __init__(self, path: str, chunk_size: int = 8192, max_pending: int = 64):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._chunk = np.zeros(chunk_size, dtype=EVENT_RECORD)
+        self._count = 0
+        self.records_written = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        if new_file:
+            self._file.write(MAGIC)
+        self._file.write(_CHUNK_HEADER.pack(0))  # Session marker
+        self._file.flush()
+
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._write_loop, name='EventLogWriter', daemon=True)
+        self._thread.start()
+
+    def append(self, step: int, time: float, event: str,
+               src: Tuple[int, int, int], dst: Tuple[int, int, int]):
+        """Buffer one record; hands the chunk to the writer thread when full."""
+        record = self._chunk[self._count]
+        record['step'] = step
+        record['time'] = time
+        record['event'] = EVENT_CODES[event]
+        record['src'] = src
+        record['dst'] = dst
+        self._count += 1
+        if self._count == self.chunk_size:
+            self._submit()
+
+    def flush(self):
+        """Hand any buffered records to the writer thread."""
+        if self._count:
+            self._submit()
+
+    def close(self):
+        """Flush, wait for the writer thread to finish and close the file."""
+        if self._file.closed:
+            return
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        if self._error is not None:
+            raise RuntimeError(f"Event log writer failed: {self._error}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _submit(self):
+        if self._error is not None:
+            raise RuntimeError(f"Event log writer failed: {self._error}")
+        self._queue.put(self._chunk[:self._count])
+        self.records_written += self._count
+        self._chunk = np.zeros(self.chunk_size, dtype=EVENT_RECORD)
+        self._count = 0
+
+    def _write_loop(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            try:
+                self._file.write(_CHUNK_HEADER.pack(len(chunk)))
+                self._file.write(chunk.tobytes())
+                self._file.flush()
+            except BaseException as e:  # Surface I/O errors in the stepping thread
+                self._error = e
+
+def read_events(path: str) -> np.ndarray:
+    """All complete, current records of a log in step order.
+
+    Records a resumed session re-simulated are taken from the newest session.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a KMC event log")
+
+    sessions: List[List[np.ndarray]] = [[]]
+    offset = len(MAGIC)
+    while offset + _CHUNK_HEADER.size <= len(data):
+        (count,) = _CHUNK_HEADER.unpack_from(data, offset)
+        offset += _CHUNK_HEADER.size
+        if count == 0:
+            sessions.append([])
+            continue
+        end = offset + count * EVENT_RECORD.itemsize
+        if end > len(data):
+            break  # Truncated trailing chunk
+        sessions[-1].append(np.frombuffer(data, dtype=EVENT_RECORD, count=count, offset=offset))
+        offset = end
+
+    kept: List[np.ndarray] = []
+    cutoff = np.inf
+    for chunks in reversed(sessions):
+        if not chunks:
+            continue
+        records = np.concatenate(chunks)
+        first_step = records['step'][0]
+        kept.append(records[records['step'] < cutoff])
+        cutoff = min(cutoff, first_step)
+    if not kept:
+        return np.zeros(0, dtype=EVENT_RECORD)
+    return np.concatenate(kept[::-1])
+
+def apply_events(lattice: np.ndarray, events: np.ndarray) -> np.ndarray:
+    """Apply logged deltas to a lattice in place, in log order.
+
+    The lattice must already reach every logged z (see replay_lattice).
+    """
+    for event, src, dst in zip(events['event'], events['src'].tolist(), events['dst'].tolist()):
+        name = EVENT_NAMES[event]
+        if name == 'attach':
+            lattice[tuple(dst)] = STATES['MOBILE']
+        elif name == 'nucleation':
+            lattice[tuple(dst)] = STATES['STABLE']
+        else:
+            src, dst = tuple(src), tuple(dst)
+            lattice[dst] = lattice[src]
+            lattice[src] = STATES['EMPTY']
+    return lattice
+
+def nearest_checkpoint(step: int, checkpoints: Sequence[str]) -> Tuple[str, int]:
+    """Path and step of the latest checkpoint saved at or before step."""
+    # Imported here so reading a log does not pull in the simulation core
+    from checkpoint import read_checkpoint_header
+
+    base_path, base_step = None, -1
+    for path in checkpoints:
+        saved_step = read_checkpoint_header(path)['step_count']
+        if base_step < saved_step <= step:
+            base_path, base_step = path, saved_step
+    if base_path is None:
+        raise ValueError(f"No checkpoint at or before step {step}")
+    return base_path, base_step
+
+def advance_lattice(lattice: np.ndarray, events: np.ndarray, after: int, upto: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Apply the logged deltas of steps after < step <= upto to lattice.
+
+    Returns the lattice, padded in z when the deltas reach beyond it (so
+    possibly a new array), and the applied records.
+    """
+    window = events[(events['step'] > after) & (events['step'] <= upto)]
+    if len(window):
+        # The z extent of a growing lattice may have increased since the checkpoint
+        top = int(window['dst'][:, 2].max())
+        if top >= lattice.shape[2]:
+            lattice = np.pad(lattice, ((0, 0), (0, 0), (0, top + 1 - lattice.shape[2])))
+    return apply_events(lattice, window), window
+
+def replay_lattice(log_path: str, step: int, checkpoints: Sequence[str],
+                   events: Optional[np.ndarray] = None) -> np.ndarray:
+    """Lattice as it was right after `step`, from the nearest earlier checkpoint plus deltas.
+
+    events may be passed in (from read_events) when replaying many steps of
+    the same log, to avoid re-reading the file each time.
+    """
+    base_path, base_step = nearest_checkpoint(step, checkpoints)
+    with np.load(base_path) as data:
+        lattice = data['lattice'].copy()
+    if events is None:
+        events = read_events(log_path)
+    return advance_lattice(lattice, events, base_step, step)[0]
+
+def event_counts(events: np.ndarray) -> Dict[str, int]:
+    """Per-type event totals of a log (nucleation counted per event, not per site)."""
+    counts = {name: 0 for name in EVENT_CODES}
+    codes, totals = np.unique(events['event'], return_counts=True)
+    for code, total in zip(codes.tolist(), totals.tolist()):
+        counts[EVENT_NAMES[code]] = total
+    nucleation = events[events['event'] == EVENT_CODES['nucleation']]
+    counts['nucleation'] = len(np.unique(nucleation['step']))
+    return counts
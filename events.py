@@ -2,77 +2,329 @@
 
 #june 30
 
+import functools
 import numpy as np
 import random
-from typing import Dict, Tuple
+from typing import Dict, Iterable, Optional, Tuple, Union
 from constants import SIMULATION_PARAMS, DIFFUSION, STATES
+from selection import SumTree
+from sitesets import IndexedSiteSet
 
 class RateCalculator:
-    def __init__(self, lattice_size: int):
-        self.size = lattice_size
+    """Event rates on an Lx x Ly x Lz lattice, periodic in x and y.
+
+    z is not periodic: z = 0 is the substrate and nothing lies beyond the
+    top layer, so out-of-range z neighbors are treated as blocked sites.
+    """
+    def __init__(self, lattice_size: Union[int, Tuple[int, int, int]],
+                 barriers: Optional[Dict[str, float]] = None):
+        # Per-axis diffusion barriers (eV), DIFFUSION unless overridden
+        self.barriers = {**DIFFUSION, **(barriers or {})}
+        self.set_shape(lattice_shape(lattice_size))
         self.neighbor_offsets = {
             'x': [(1,0,0), (-1,0,0)],
             'y': [(0,1,0), (0,-1,0)],
             'z': [(0,0,1), (0,0,-1)]
         }
 
+    def set_shape(self, shape: Tuple[int, int, int]):
+        """Adopt a new lattice shape, e.g. after the z extent has grown."""
+        self.shape = tuple(shape)
+        self._strides = (self.shape[1] * self.shape[2], self.shape[2], 1)
+
     def calculate_total_rates(self, lattice: np.ndarray, temperature: float) -> Dict[str, float]:
         """Calculate rates for all event types."""
+        totals = self.count_vacant_neighbors_all(lattice).sum(axis=(1, 2, 3))
         rates = {
-            'diffuse_x': 0.0,
-            'diffuse_y': 0.0,
-            'diffuse_z': 0.0,
-            'attach': 0.0
+            f'diffuse_{direction}': self._arrhenius_rate(self.barriers[direction], temperature) * int(totals[axis])
+            for axis, direction in enumerate(('x', 'y', 'z'))
         }
-        
-        # Diffusion rates
-        mobile_atoms = np.argwhere(lattice == STATES['MOBILE'])
-        for pos in mobile_atoms:
-            for direction in ['x', 'y', 'z']:
-                rates[f'diffuse_{direction}'] += self._calculate_diffusion_rate(
-                    tuple(pos), lattice, direction, temperature
-                )
-        
-        # Attachment rate
-        empty_sites = np.sum(lattice == STATES['EMPTY'])
+        # Only frontier sites can take an attaching atom
         rates['attach'] = self._arrhenius_rate(
             SIMULATION_PARAMS['E_a'], temperature
-        ) * empty_sites
-        
+        ) * int(np.count_nonzero(self.frontier_mask(lattice)))
+        return rates
+
+    def calculate_site_rates(self, lattice: np.ndarray, temperature: float) -> Dict[str, np.ndarray]:
+        """Per-site rate arrays for all event types, keyed like calculate_total_rates."""
+        counts = self.count_vacant_neighbors_all(lattice)
+        rates = {
+            f'diffuse_{direction}': self._arrhenius_rate(self.barriers[direction], temperature) * counts[axis]
+            for axis, direction in enumerate(('x', 'y', 'z'))
+        }
+        rates['attach'] = self._arrhenius_rate(
+            SIMULATION_PARAMS['E_a'], temperature
+        ) * self.frontier_mask(lattice)
         return rates
 
+    def count_vacant_neighbors_all(self, lattice: np.ndarray) -> np.ndarray:
+        """Vacant-neighbor counts per axis for every mobile atom, shape (3, *lattice.shape).
+
+        Vectorized count_vacant_neighbors: one shift of the vacancy mask per
+        neighbor offset, zeroed on non-mobile sites.
+        """
+        empty = (lattice == STATES['EMPTY']).view(np.int8)
+        mobile = lattice == STATES['MOBILE']
+        counts = np.zeros((3,) + lattice.shape, dtype=np.int8)
+        for axis in range(3):
+            np.add(_shift(empty, 1, axis), _shift(empty, -1, axis), out=counts[axis])
+            counts[axis][~mobile] = 0
+        return counts
+
     def _calculate_diffusion_rate(self, pos: Tuple[int,int,int], 
                                 lattice: np.ndarray, 
                                 direction: str, 
                                 temperature: float) -> float:
         """Calculate diffusion rate in specific direction."""
+        vacant = self.count_vacant_neighbors(pos, lattice, direction)
+        if vacant == 0:
+            return 0.0
+            
+        return self._arrhenius_rate(self.barriers[direction], temperature) * vacant
+
+    def count_vacant_neighbors(self, pos: Tuple[int,int,int],
+                               lattice: np.ndarray,
+                               direction: str) -> int:
+        """Count empty neighbors of a site along one axis."""
         vacant = 0
         for dx, dy, dz in self.neighbor_offsets[direction]:
-            nx = (pos[0] + dx) % self.size
-            ny = (pos[1] + dy) % self.size
-            nz = (pos[2] + dz) % self.size
+            nx = (pos[0] + dx) % self.shape[0]
+            ny = (pos[1] + dy) % self.shape[1]
+            nz = pos[2] + dz
             
-            if lattice[nx, ny, nz] == STATES['EMPTY']:
+            if 0 <= nz < self.shape[2] and lattice[nx, ny, nz] == STATES['EMPTY']:
                 vacant += 1
-                
-        if vacant == 0:
-            return 0.0
-            
-        return self._arrhenius_rate(DIFFUSION[direction], temperature) * vacant
+        return vacant
+
+    def is_frontier_site(self, pos: Tuple[int,int,int], lattice: np.ndarray) -> bool:
+        """Empty site next to a substrate or stable atom, i.e. a valid attachment site."""
+        if lattice[pos] != STATES['EMPTY']:
+            return False
+        return any(lattice[n] in (STATES['SUBSTRATE'], STATES['STABLE'])
+                   for n in self.get_periodic_neighbors(pos).values())
+
+    def frontier_mask(self, lattice: np.ndarray) -> np.ndarray:
+        """Boolean mask of all attachment sites (vectorized is_frontier_site)."""
+        support = (lattice == STATES['SUBSTRATE']) | (lattice == STATES['STABLE'])
+        adjacent = np.zeros_like(support)
+        for axis in range(3):
+            adjacent |= _shift(support, 1, axis)
+            adjacent |= _shift(support, -1, axis)
+        return adjacent & (lattice == STATES['EMPTY'])
+
+    def flat_index(self, pos: Tuple[int,int,int]) -> int:
+        """Flat (C-order) lattice index of a site."""
+        return pos[0] * self._strides[0] + pos[1] * self._strides[1] + pos[2]
+
+    def site_position(self, index: int) -> Tuple[int,int,int]:
+        """Inverse of flat_index."""
+        x, rest = divmod(int(index), self._strides[0])
+        y, z = divmod(rest, self._strides[1])
+        return (x, y, z)
 
     def get_periodic_neighbors(self, pos: Tuple[int,int,int]) -> Dict[str,Tuple[int,int,int]]:
-        """Get all periodic neighbors with direction labels."""
+        """Get all neighbors with direction labels (x/y wrap, z neighbors outside are omitted)."""
         x, y, z = pos
-        return {
-            'x+': ((x+1)%self.size, y, z),
-            'x-': ((x-1)%self.size, y, z),
-            'y+': (x, (y+1)%self.size, z),
-            'y-': (x, (y-1)%self.size, z),
-            'z+': (x, y, (z+1)%self.size),
-            'z-': (x, y, (z-1)%self.size)
+        size_x, size_y, size_z = self.shape
+        neighbors = {
+            'x+': ((x+1)%size_x, y, z),
+            'x-': ((x-1)%size_x, y, z),
+            'y+': (x, (y+1)%size_y, z),
+            'y-': (x, (y-1)%size_y, z)
         }
+        if z + 1 < size_z:
+            neighbors['z+'] = (x, y, z+1)
+        if z > 0:
+            neighbors['z-'] = (x, y, z-1)
+        return neighbors
 
     @staticmethod
     def _arrhenius_rate(barrier: float, temperature: float) -> float:
-        """Calculate Arrhenius rate."""
-        return SIMULATION_PARAMS['A'] * np.exp(-barrier / (SIMULATION_PARAMS['k_B'] * temperature))
\ No newline at end of file
+        """Calculate Arrhenius rate (cached per barrier and temperature)."""
+        return arrhenius_rate(barrier, temperature)
+
+
+@functools.lru_cache(maxsize=1024)
+def arrhenius_rate(barrier: float, temperature: float) -> float:
+    """A*exp(-E/kT), computed once per (barrier, temperature) pair."""
+    return float(SIMULATION_PARAMS['A'] * np.exp(-barrier / (SIMULATION_PARAMS['k_B'] * temperature)))
+
+def lattice_shape(lattice_size: Union[int, Tuple[int, int, int]]) -> Tuple[int, int, int]:
+    """(Lx, Ly, Lz) from an edge length or a 3-sequence."""
+    if isinstance(lattice_size, (int, np.integer)):
+        return (int(lattice_size),) * 3
+    shape = tuple(int(n) for n in lattice_size)
+    if len(shape) != 3:
+        raise ValueError(f"Lattice shape needs three extents, got {lattice_size}")
+    return shape
+
+def _shift(mask: np.ndarray, shift: int, axis: int) -> np.ndarray:
+    """mask moved by shift along axis: periodic in x/y, zero-filled in z."""
+    if axis < 2:
+        return np.roll(mask, shift, axis=axis)
+    shifted = np.zeros_like(mask)
+    if shift > 0:
+        shifted[..., shift:] = mask[..., :-shift]
+    else:
+        shifted[..., :shift] = mask[..., -shift:]
+    return shifted
+
+
+class RateCatalog:
+    """Per-site rate catalog that is refreshed locally after each event.
+
+    Diffusion rates are stored as integer vacant-neighbor counts per axis for
+    every mobile atom, so totals are exact sums that never drift; the Arrhenius
+    factor is applied only when the totals are read.
+
+    Attachment sites (empty sites next to a substrate or stable atom) are
+    held in an IndexedSiteSet of flat indices, which gives both the
+    attachment rate and O(1) uniform sampling of the attachment site.
+
+    With ``track_sites`` the catalog also keeps a SumTree holding the total
+    rate of every executable event at each site (diffusion of a mobile atom
+    or attachment onto a frontier site), indexed by flat lattice position.
+
+    With ``track_pairs`` it keeps, per axis, the mobile atoms with at least
+    one vacant neighbor along it and those with two. Listing the latter
+    twice gives exactly direction_totals[axis] entries, one per executable
+    (atom, move) pair, so a uniform entry picks a pair uniformly
+    (see pair_choice).
+    """
+    DIRECTIONS = ('x', 'y', 'z')
+
+    def __init__(self, rate_calc: RateCalculator, temperature: float,
+                 track_sites: bool = False, track_pairs: bool = False):
+        self.rate_calc = rate_calc
+        self.temperature = temperature
+        self.track_sites = track_sites
+        self.track_pairs = track_pairs
+        self.vacancy_counts = None   # (3, *lattice.shape) int8, zero for non-mobile sites
+        self.frontier = None         # IndexedSiteSet of empty sites next to substrate/stable atoms
+        self.direction_totals = [0, 0, 0]
+        self.site_tree = None
+        self.movable = None          # per axis, IndexedSiteSets of atoms with >= 1 and with 2 vacant neighbors
+        self._update_factors()
+
+    def set_temperature(self, temperature: float):
+        """Switch to the rate factors of another temperature; the site tree is re-weighted."""
+        if temperature == self.temperature:
+            return
+        self.temperature = temperature
+        self._update_factors()
+        if self.site_tree is not None:
+            self.site_tree.build(self.site_rates().ravel())
+
+    def _update_factors(self):
+        """Cache the Arrhenius prefactors for the current temperature."""
+        self.diffusion_factors = [
+            RateCalculator._arrhenius_rate(self.rate_calc.barriers[d], self.temperature)
+            for d in self.DIRECTIONS
+        ]
+        self.attach_factor = RateCalculator._arrhenius_rate(
+            SIMULATION_PARAMS['E_a'], self.temperature
+        )
+
+    def rebuild(self, lattice: np.ndarray):
+        """Rebuild the whole catalog from the lattice."""
+        self.vacancy_counts = self.rate_calc.count_vacant_neighbors_all(lattice)
+        self.direction_totals = [int(c) for c in self.vacancy_counts.sum(axis=(1, 2, 3))]
+
+        self.frontier = IndexedSiteSet(lattice.size)
+        self.frontier.update(np.flatnonzero(self.rate_calc.frontier_mask(lattice)))
+
+        if self.track_sites:
+            self.site_tree = SumTree(lattice.size)
+            self.site_tree.build(self.site_rates().ravel())
+
+        if self.track_pairs:
+            self.movable = []
+            for counts in self.vacancy_counts.reshape(3, -1):
+                one, two = IndexedSiteSet(lattice.size), IndexedSiteSet(lattice.size)
+                one.update(np.flatnonzero(counts >= 1))
+                two.update(np.flatnonzero(counts == 2))
+                self.movable.append((one, two))
+
+    def pair_choice(self, axis: int, rng) -> int:
+        """Flat index of the atom of a uniformly random executable move along axis.
+
+        Needs track_pairs and a positive direction total; one rng.random() draw.
+        """
+        one, two = self.movable[axis]
+        k = int(rng.random() * self.direction_totals[axis])
+        if k < len(one):
+            return one.item(k)
+        return two.item(k - len(one))
+
+    def site_rates(self) -> np.ndarray:
+        """Total executable event rate of every site."""
+        frontier = np.zeros(self.vacancy_counts.shape[1:], dtype=bool)
+        frontier.flat[self.frontier.items()] = True
+        rates = self.attach_factor * frontier
+        for axis in range(3):
+            rates = rates + self.diffusion_factors[axis] * self.vacancy_counts[axis]
+        return rates
+
+    def refresh(self, lattice: np.ndarray, sites: Iterable[Tuple[int,int,int]]):
+        """Refresh the changed sites and their nearest neighbors.
+
+        Sites are visited in a fixed order (each changed site, then its
+        neighbors) so the frontier order, and with it a seeded run, does not
+        depend on set hashing; kernels.py follows the same order.
+        """
+        affected = []
+        for pos in sites:
+            affected.append(pos)
+            affected.extend(self.rate_calc.get_periodic_neighbors(pos).values())
+        
+        for pos in dict.fromkeys(affected):
+            self._refresh_site(lattice, pos)
+
+    def _refresh_site(self, lattice: np.ndarray, pos: Tuple[int,int,int]):
+        """Recompute the catalog entries of a single site."""
+        state = lattice[pos]
+        index = self.rate_calc.flat_index(pos)
+        for axis, direction in enumerate(self.DIRECTIONS):
+            key = (axis,) + pos
+            new = (self.rate_calc.count_vacant_neighbors(pos, lattice, direction)
+                   if state == STATES['MOBILE'] else 0)
+            old = self.vacancy_counts[key]
+            if new != old:
+                self.vacancy_counts[key] = new
+                self.direction_totals[axis] += new - int(old)
+                if self.movable is not None:
+                    self._update_pairs(axis, index, new)
+        
+        frontier = self.rate_calc.is_frontier_site(pos, lattice)
+        if frontier:
+            self.frontier.add(index)
+        else:
+            self.frontier.discard(index)
+
+        if self.site_tree is not None:
+            rate = self.attach_factor if frontier else sum(
+                self.diffusion_factors[axis] * int(self.vacancy_counts[(axis,) + pos])
+                for axis in range(3)
+            )
+            if rate != self.site_tree.get(index):
+                self.site_tree.update(index, rate)
+
+    def _update_pairs(self, axis: int, index: int, count: int):
+        one, two = self.movable[axis]
+        if count >= 1:
+            one.add(index)
+        else:
+            one.discard(index)
+        if count == 2:
+            two.add(index)
+        else:
+            two.discard(index)
+
+    def rates(self) -> Dict[str, float]:
+        """Total rate of each event group, same keys as calculate_total_rates."""
+        rates = {
+            f'diffuse_{d}': self.diffusion_factors[axis] * self.direction_totals[axis]
+            for axis, d in enumerate(self.DIRECTIONS)
+        }
+        rates['attach'] = self.attach_factor * len(self.frontier)
+        return rates
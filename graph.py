@@ -1,6 +1,7 @@
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Dict, List
+import numpy as np
+from typing import Dict, Optional, Sequence
 from constants import VISUALIZATION
 
 class GraphVisualizer:
@@ -8,10 +9,13 @@ class GraphVisualizer:
         sns.set_theme(style="whitegrid", palette=VISUALIZATION['colors'])
         self.figures = []
 
-    def create_growth_plot(self, time_data: List[float], 
-                         coverage_data: List[float],
-                         aspect_ratios: List[float] = None):
-        """Create coverage vs time plot with optional aspect ratio."""
+    def create_growth_plot(self, time_data: Sequence[float], 
+                         coverage_data: Sequence[float],
+                         aspect_ratios: Optional[Sequence[float]] = None):
+        """Create coverage vs time plot with optional aspect ratio.
+
+        Takes lists or NumPy columns, e.g. those of a TimeSeriesRecorder.
+        """
         fig, ax1 = plt.subplots(figsize=(10, 6))
         
         # Plot coverage
@@ -22,7 +26,7 @@ class GraphVisualizer:
         ax1.tick_params(axis='y', labelcolor=VISUALIZATION['colors'][2])
         
         # Add aspect ratio if provided
-        if aspect_ratios:
+        if aspect_ratios is not None and len(aspect_ratios):
             ax2 = ax1.twinx()
             sns.lineplot(x=time_data, y=aspect_ratios, ax=ax2,
                         color=VISUALIZATION['colors'][5], label='Aspect Ratio')
@@ -34,13 +38,13 @@ class GraphVisualizer:
         self.figures.append(fig)
         return fig
 
-    def create_event_plot(self, time_data: List[float], 
-                        event_counts: Dict[str, List[int]]):
+    def create_event_plot(self, time_data: Sequence[float], 
+                        event_counts: Dict[str, Sequence[int]]):
         """Create event distribution plot."""
         fig, ax = plt.subplots(figsize=(10, 6))
         
         for event, counts in event_counts.items():
-            if sum(counts) > 0:  # Only plot if events occurred
+            if np.any(counts):  # Only plot if events occurred
                 sns.lineplot(x=time_data, y=counts, ax=ax,
                             label=event.replace('_', ' ').title())
         
@@ -52,6 +56,19 @@ class GraphVisualizer:
         self.figures.append(fig)
         return fig
 
+    def create_recording_plots(self, columns: Dict[str, np.ndarray]):
+        """Growth and event plots straight from TimeSeriesRecorder columns."""
+        time_data = columns['time_points']
+        growth = self.create_growth_plot(time_data, columns['coverage'], columns['aspect_ratios'])
+        events = self.create_event_plot(time_data, {
+            'x': columns['diffuse_x_events'],
+            'y': columns['diffuse_y_events'],
+            'z': columns['diffuse_z_events'],
+            'attach': columns['attach_events'],
+            'nucleation': columns['nucleation_events']
+        })
+        return growth, events
+
     def save_plot(self, filename: str):
         """Save most recent plot to file."""
         if self.figures:
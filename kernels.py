@@ -0,0 +1,414 @@
+"""Optional compiled inner loop for the grouped KMC engine.
+
+run_grouped_batch() executes up to K BKL steps of CrystalGrowthSimulation
+in a single Numba-compiled call, working directly on the raw lattice, the
+vacancy-count catalog and the index arrays of the site sets. It follows
+execute_simulation_step draw for draw, so a seeded run gives the same
+trajectory with or without the kernel, and execute_simulation_step remains
+the reference implementation and the fallback when Numba is not installed.
+
+A batch only covers the stretch the kernel can handle on its own. It
+returns to Python as soon as something needs the full model: a critical
+cluster forming (nucleation), a temperature change point, z growth, the
+coverage limit, or running out of events.
+"""
+import importlib.util
+import math
+import numpy as np
+from typing import Dict
+from constants import STATES
+
+# Cheap check only: numba (and llvmlite) are imported on the first compiled batch
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+# Kernel functions, compiled by _compile(); callees first, so the jitted callers see jitted globals
+_COMPILED_FUNCTIONS = ('_set_add', '_set_discard', '_refresh_site', '_cluster_reaches', '_grouped_batch')
+_compiled = False
+
+def _compile():
+    """Replace the kernel functions with numba.njit dispatchers, once per process."""
+    global _compiled
+    if _compiled:
+        return
+    import numba
+    jit = numba.njit(cache=True, nogil=True)  # compiled lazily, on first call
+    namespace = globals()
+    for name in _COMPILED_FUNCTIONS:
+        namespace[name] = jit(namespace[name])
+    _compiled = True
+
+# Maximum steps per compiled call; bounds the pre-drawn uniforms and event records
+BATCH_STEPS = 4096
+# Uniforms one grouped step can consume: group, site, move, time increment
+_DRAWS_PER_STEP = 4
+
+# Why a batch returned
+STOP_STEPS = 0
+STOP_SCHEDULE = 1
+STOP_CRITICAL = 2
+STOP_HEADROOM = 3
+STOP_COVERAGE = 4
+STOP_NO_EVENTS = 5
+
+# Event groups in the order of RateCatalog.rates()
+_GROUPS = ('diffuse_x', 'diffuse_y', 'diffuse_z', 'attach')
+
+_EMPTY = STATES['EMPTY']
+_MOBILE = STATES['MOBILE']
+_SUBSTRATE = STATES['SUBSTRATE']
+_STABLE = STATES['STABLE']
+
+def run_grouped_batch(sim, max_steps: int, max_coverage: float = 1.0) -> Dict:
+    """Run up to max_steps grouped steps of sim in the compiled kernel.
+
+    The caller must make sure no critical cluster exists. Returns the number
+    of steps executed, the simulated time advanced, the per-type event and
+    null-event counts of the batch and the stop reason (one of the STOP_* codes).
+    """
+    if not NUMBA_AVAILABLE:
+        raise ImportError("The compiled KMC kernel needs numba (pip install numba)")
+    _compile()
+    max_steps = min(max_steps, BATCH_STEPS)
+    catalog = sim.rate_catalog
+    mobile, frontier = sim.mobile_sites, catalog.frontier
+    # Each step adds at most one mobile atom and refreshes at most 14 frontier sites
+    mobile.reserve(max_steps)
+    frontier.reserve(14 * max_steps)
+
+    sizes = np.array([len(mobile), len(frontier), len(sim.occupied_sites), len(sim.empty_sites)],
+                     dtype=np.int64)
+    totals = np.array(catalog.direction_totals, dtype=np.int64)
+    factors = np.array(catalog.diffusion_factors + [catalog.attach_factor], dtype=np.float64)
+    uniforms = sim.rng.peek(_DRAWS_PER_STEP * max_steps)
+    counts = np.zeros(4, dtype=np.int64)
+    nulls = np.zeros(4, dtype=np.int64)
+    records = np.zeros((max_steps, 4), dtype=np.int64)   # step offset, group, src, dst
+    record_times = np.zeros(max_steps, dtype=np.float64)
+
+    start_time = sim.time
+    steps, used, new_time, stop, num_records = _grouped_batch(
+        sim.lattice.reshape(-1), np.array(sim.lattice.shape, dtype=np.int64),
+        mobile._items, mobile._slots, frontier._items, frontier._slots,
+        sim.occupied_sites._flat, sim.empty_sites._flat, sizes,
+        catalog.vacancy_counts.reshape(3, -1), totals, factors,
+        uniforms, start_time, max_steps, sim._next_temperature_change,
+        sim.critical_size, sim._growth_threshold(), sim.volume, max_coverage,
+        counts, nulls, records, record_times
+    )
+
+    # Write the scalar state back into the Python objects
+    mobile._size, frontier._size = int(sizes[0]), int(sizes[1])
+    sim.occupied_sites._size, sim.empty_sites._size = int(sizes[2]), int(sizes[3])
+    catalog.direction_totals = [int(t) for t in totals]
+    sim.rng.advance(int(used))
+    sim.time = float(new_time)
+    first_step = sim.step_count
+    sim.step_count += int(steps)
+    event_counts = {group: int(n) for group, n in zip(_GROUPS, counts)}
+    for group, n in event_counts.items():
+        sim.event_counts[group] += n
+    null_counts = {group: int(n) for group, n in zip(_GROUPS, nulls)}
+    for group, n in null_counts.items():
+        sim.null_counts[group] += n
+
+    if sim.cluster_analyzer.incremental:
+        # Feed the moves to the tracker as the Python path does, which keeps cluster IDs identical
+        analyzer, position = sim.cluster_analyzer, sim.rate_calc.site_position
+        for _, group, src, dst in records[:num_records].tolist():
+            if group < 3:
+                analyzer.atom_removed(position(src))
+            analyzer.atom_added(position(dst))
+    elif steps:
+        sim.cluster_analyzer.update_cluster_info(sim.lattice)
+    if sim.event_log is not None:
+        for (offset, group, src, dst), t in zip(records[:num_records].tolist(), record_times[:num_records].tolist()):
+            sim.event_log.append(first_step + offset, t, _GROUPS[group],
+                                 sim.rate_calc.site_position(src), sim.rate_calc.site_position(dst))
+    if sim.grow_z and num_records:
+        # The batch stops at the first site above the threshold, so only the last event can need it
+        sim._ensure_headroom([sim.rate_calc.site_position(records[num_records - 1, 3])])
+    if sim.time >= sim._next_temperature_change:
+        sim._apply_temperature_schedule()
+
+    return {
+        'steps': int(steps),
+        'time': sim.time - start_time,
+        'event_counts': event_counts,
+        'null_counts': null_counts,
+        'stop': int(stop)
+    }
+
+# The compiled functions below mirror the Python path in kmc.py, events.py
+# and sitesets.py, and must stay in step with it.
+
+def _set_add(items, slots, sizes, which, index):
+    """IndexedSiteSet.add on raw arrays."""
+    if slots[index] >= 0:
+        return
+    n = sizes[which]
+    items[n] = index
+    slots[index] = n
+    sizes[which] = n + 1
+
+def _set_discard(items, slots, sizes, which, index):
+    """IndexedSiteSet.discard on raw arrays."""
+    slot = slots[index]
+    if slot < 0:
+        return
+    n = sizes[which] - 1
+    last = items[n]
+    items[slot] = last
+    slots[last] = slot
+    slots[index] = -1
+    sizes[which] = n
+
+def _refresh_site(lattice, shape, index, vacancy, totals,
+                  frontier_items, frontier_slots, sizes):
+    """RateCatalog._refresh_site for one flat index."""
+    sy, sz = shape[1], shape[2]
+    x = index // (sy * sz)
+    y = (index // sz) % sy
+    z = index % sz
+    sx = shape[0]
+    xp = ((x + 1) % sx) * sy * sz + y * sz + z
+    xm = ((x - 1 + sx) % sx) * sy * sz + y * sz + z
+    yp = x * sy * sz + ((y + 1) % sy) * sz + z
+    ym = x * sy * sz + ((y - 1 + sy) % sy) * sz + z
+    state = lattice[index]
+
+    for axis in range(3):
+        new = 0
+        if state == _MOBILE:
+            if axis == 0:
+                new = int(lattice[xp] == _EMPTY) + int(lattice[xm] == _EMPTY)
+            elif axis == 1:
+                new = int(lattice[yp] == _EMPTY) + int(lattice[ym] == _EMPTY)
+            else:
+                if z + 1 < sz and lattice[index + 1] == _EMPTY:
+                    new += 1
+                if z > 0 and lattice[index - 1] == _EMPTY:
+                    new += 1
+        old = vacancy[axis, index]
+        if new != old:
+            vacancy[axis, index] = new
+            totals[axis] += new - old
+
+    frontier = False
+    if state == _EMPTY:
+        for n in (xp, xm, yp, ym):
+            if lattice[n] == _SUBSTRATE or lattice[n] == _STABLE:
+                frontier = True
+        if z + 1 < sz and (lattice[index + 1] == _SUBSTRATE or lattice[index + 1] == _STABLE):
+            frontier = True
+        if z > 0 and (lattice[index - 1] == _SUBSTRATE or lattice[index - 1] == _STABLE):
+            frontier = True
+    if frontier:
+        _set_add(frontier_items, frontier_slots, sizes, 1, index)
+    else:
+        _set_discard(frontier_items, frontier_slots, sizes, 1, index)
+
+def _cluster_reaches(lattice, shape, start, critical_size):
+    """Whether the 26-connected mobile cluster containing start has critical_size atoms.
+
+    Connectivity is not periodic, as in the cluster analyzers. The search
+    stops as soon as the size is reached, so it costs O(critical_size).
+    """
+    if critical_size <= 1:
+        return True
+    sx, sy, sz = shape[0], shape[1], shape[2]
+    found = np.empty(critical_size, dtype=np.int64)
+    found[0] = start
+    count = 1
+    head = 0
+    while head < count:
+        site = found[head]
+        head += 1
+        x = site // (sy * sz)
+        y = (site // sz) % sy
+        z = site % sz
+        for dx in range(-1, 2):
+            nx = x + dx
+            if nx < 0 or nx >= sx:
+                continue
+            for dy in range(-1, 2):
+                ny = y + dy
+                if ny < 0 or ny >= sy:
+                    continue
+                for dz in range(-1, 2):
+                    nz = z + dz
+                    if nz < 0 or nz >= sz:
+                        continue
+                    n = nx * sy * sz + ny * sz + nz
+                    if lattice[n] != _MOBILE:
+                        continue
+                    seen = False
+                    for i in range(count):
+                        if found[i] == n:
+                            seen = True
+                            break
+                    if not seen:
+                        found[count] = n
+                        count += 1
+                        if count >= critical_size:
+                            return True
+    return False
+
+def _grouped_batch(lattice, shape, mobile_items, mobile_slots, frontier_items, frontier_slots,
+                   occupied, empty, sizes, vacancy, totals, factors,
+                   uniforms, time, max_steps, next_change,
+                   critical_size, z_stop, volume, max_coverage,
+                   counts, nulls, records, record_times):
+    """Grouped BKL steps, draw-for-draw like CrystalGrowthSimulation.execute_simulation_step."""
+    sx, sy, sz = shape[0], shape[1], shape[2]
+    rates = np.zeros(4)
+    touched = np.zeros(2, dtype=np.int64)
+    moves = np.zeros(2, dtype=np.int64)
+    affected = np.zeros(14, dtype=np.int64)
+    used = 0
+    steps = 0
+    num_records = 0
+    src = 0
+    dst = 0
+    stop = STOP_STEPS
+
+    while steps < max_steps:
+        if used + _DRAWS_PER_STEP > len(uniforms):
+            break
+        for g in range(3):
+            rates[g] = factors[g] * totals[g]
+        rates[3] = factors[3] * sizes[1]
+
+        # RandomStream.choice_index over the positive group rates
+        weight_sum = 0.0
+        for g in range(4):
+            if rates[g] > 0:
+                weight_sum += rates[g]
+        if weight_sum == 0.0:
+            stop = STOP_NO_EVENTS
+            break
+        r = uniforms[used] * weight_sum
+        used += 1
+        selected = -1
+        last = -1
+        for g in range(4):
+            if rates[g] > 0:
+                if r < rates[g]:
+                    selected = g
+                    break
+                r -= rates[g]
+                last = g
+        if selected < 0:
+            selected = last
+
+        num_touched = 0
+        if selected < 3:
+            # Diffusion: random mobile atom, then a random vacant neighbor along the axis
+            src = mobile_items[int(uniforms[used] * sizes[0])]
+            used += 1
+            x = src // (sy * sz)
+            y = (src // sz) % sy
+            z = src % sz
+            num_moves = 0
+            for delta in (-1, 1):
+                if selected == 0:
+                    dst = ((x + delta + sx) % sx) * sy * sz + y * sz + z
+                elif selected == 1:
+                    dst = x * sy * sz + ((y + delta + sy) % sy) * sz + z
+                else:
+                    if z + delta < 0 or z + delta >= sz:
+                        continue
+                    dst = src + delta
+                if lattice[dst] == _EMPTY:
+                    moves[num_moves] = dst
+                    num_moves += 1
+            if num_moves:
+                dst = moves[int(uniforms[used] * num_moves)]
+                used += 1
+                lattice[dst] = lattice[src]
+                lattice[src] = _EMPTY
+                occupied[src] = False
+                occupied[dst] = True
+                empty[src] = True
+                empty[dst] = False
+                _set_discard(mobile_items, mobile_slots, sizes, 0, src)
+                _set_add(mobile_items, mobile_slots, sizes, 0, dst)
+                touched[0] = src
+                touched[1] = dst
+                num_touched = 2
+        else:
+            # Attachment onto a random frontier site
+            src = frontier_items[int(uniforms[used] * sizes[1])]
+            used += 1
+            dst = src
+            lattice[dst] = _MOBILE
+            empty[dst] = False
+            sizes[3] -= 1
+            occupied[dst] = True
+            sizes[2] += 1
+            _set_add(mobile_items, mobile_slots, sizes, 0, dst)
+            touched[0] = dst
+            num_touched = 1
+
+        # RateCatalog.refresh: each touched site, then its neighbors, first occurrence wins
+        num_affected = 0
+        for t in range(num_touched):
+            site = touched[t]
+            x = site // (sy * sz)
+            y = (site // sz) % sy
+            z = site % sz
+            candidates = (
+                site,
+                ((x + 1) % sx) * sy * sz + y * sz + z,
+                ((x - 1 + sx) % sx) * sy * sz + y * sz + z,
+                x * sy * sz + ((y + 1) % sy) * sz + z,
+                x * sy * sz + ((y - 1 + sy) % sy) * sz + z,
+                site + 1 if z + 1 < sz else -1,
+                site - 1 if z > 0 else -1
+            )
+            for c in candidates:
+                if c < 0:
+                    continue
+                duplicate = False
+                for i in range(num_affected):
+                    if affected[i] == c:
+                        duplicate = True
+                        break
+                if not duplicate:
+                    affected[num_affected] = c
+                    num_affected += 1
+        for i in range(num_affected):
+            _refresh_site(lattice, shape, affected[i], vacancy, totals,
+                          frontier_items, frontier_slots, sizes)
+
+        # Time advance with the rates of the step start
+        total = rates[0] + rates[1] + rates[2] + rates[3]
+        time += -math.log(1.0 - uniforms[used]) / total
+        used += 1
+        steps += 1
+
+        if not num_touched:
+            nulls[selected] += 1
+        else:
+            counts[selected] += 1
+            records[num_records, 0] = steps
+            records[num_records, 1] = selected
+            records[num_records, 2] = src
+            records[num_records, 3] = dst
+            record_times[num_records] = time
+            num_records += 1
+
+            # Hand back to Python when the new atom needs z growth or completes a critical cluster
+            if dst % sz >= z_stop:
+                stop = STOP_HEADROOM
+                break
+            if _cluster_reaches(lattice, shape, dst, critical_size):
+                stop = STOP_CRITICAL
+                break
+        if time >= next_change:
+            stop = STOP_SCHEDULE
+            break
+        if sizes[2] / volume >= max_coverage:
+            stop = STOP_COVERAGE
+            break
+
+    return steps, used, time, stop, num_records
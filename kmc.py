@@ -1,24 +1,79 @@
+import math
 import numpy as np
-import random
-from typing import Dict, Set, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 from constants import SIMULATION_PARAMS, STATES, DIFFUSION, NUCLEATION, STRUCTURE_3D
-from events import RateCalculator
-from clusters import ClusterAnalyzer
+from events import RateCalculator, RateCatalog, lattice_shape
+from clusters import ClusterAnalyzer, IncrementalClusterTracker
 from nucleation import NucleationCalculator
+from sitesets import IndexedSiteSet, SiteBitmap
+from rng import RandomStream, SeedLike
+from schedules import TemperatureSchedule
+from profiling import PhaseProfiler
+import kernels
+
+ENGINES = ('grouped', 'rejection_free', 'tree')
+CLUSTER_TRACKING = ('incremental', 'full')
+KERNELS = ('auto', 'numba', 'python')
+# With grow_z, empty layers kept above the highest occupied site, and the minimum growth step
+Z_HEADROOM = 2
+Z_GROWTH_LAYERS = 8
+# Methods timed into each phase by enable_profiling, as (owner attribute, method); owner '' is the simulation.
+# 'bookkeeping' is the rest of a step: time advance, schedule, z growth and event log.
+PROFILED_METHODS = {
+    'bookkeeping': (('', 'execute_simulation_step'),),
+    'rate_calculation': (('rate_catalog', 'rates'), ('rate_catalog', 'refresh'),
+                         ('', '_calculate_nucleation_rate')),
+    'selection': (('', '_select_and_execute_event'), ('', '_execute_diffusion'), ('', '_execute_attachment')),
+    'execution': (('', '_diffuse_atom'), ('', '_attach_atom'), ('', '_execute_nucleation')),
+    'cluster_update': tuple(('cluster_analyzer', name) for name in (
+        'update_cluster_info', 'atom_added', 'atom_removed', 'cluster_removed',
+        'has_critical_clusters', 'critical_atom_count', 'get_critical_clusters')),
+    'compiled_batch': (('', '_run_kernel_batch'),)
+}
 
 class CrystalGrowthSimulation:
-    def __init__(self, lattice_size: int, temperature: float):
+    def __init__(self, lattice_size: Union[int, Tuple[int, int, int]], temperature: float,
+                 engine: str = 'grouped',
+                 cluster_tracking: str = 'incremental',
+                 diffusion_barriers: Optional[Dict[str, float]] = None,
+                 critical_size: Optional[int] = None,
+                 seed: SeedLike = None,
+                 grow_z: bool = False,
+                 temperature_schedule: Optional[TemperatureSchedule] = None,
+                 kernel: str = 'auto'):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+
+        if cluster_tracking not in CLUSTER_TRACKING:
+            raise ValueError(f"Unknown cluster tracking '{cluster_tracking}', expected one of {CLUSTER_TRACKING}")
+        # Edge length of a cube, or (Lx, Ly, Lz); x and y are periodic, z is not
         self.lattice_size = lattice_size
+        self.lattice_shape = lattice_shape(lattice_size)
+        # Allocate z layers only as the film thickens, up to Lz
+        self.grow_z = grow_z
         self.temperature = temperature
-        
-        # Initialize lattice
-        self.lattice = np.zeros((lattice_size,)*3, dtype=np.int8)
-        self.empty_sites: Set[Tuple[int, int, int]] = set()
-        self.occupied_sites: Set[Tuple[int, int, int]] = set()
+        # 'grouped': pick an event group, then a site within it (original scheme)
+        # 'rejection_free': pick an event group, then one of its executable (atom, move) pairs
+        # 'tree': draw individual events from a sum tree of per-site rates
+        self.engine = engine
+        # 'incremental': clusters updated per event; 'full': scipy relabel after every step
+        self.cluster_tracking = cluster_tracking
+        self.set_kernel(kernel)
+        # Parameter overrides, defaulting to constants.py
+        self.critical_size = critical_size or SIMULATION_PARAMS['critical_size']
+        # Every random draw goes through this stream, so a seed reproduces the run
+        self.rng = RandomStream(seed)
         
         # Simulation components
-        self.rate_calc = RateCalculator(lattice_size)
-        self.cluster_analyzer = ClusterAnalyzer(SIMULATION_PARAMS['critical_size'])
+        self.rate_calc = RateCalculator(self.lattice_shape, barriers=diffusion_barriers)
+        
+        # Initialize lattice (and the occupancy bitmaps, flat-index: O(1) counts, no per-site objects)
+        self._allocate_lattice(self._initial_z_extent())
+        
+        self.rate_catalog = RateCatalog(self.rate_calc, temperature,
+                                        track_sites=(engine == 'tree'),
+                                        track_pairs=(engine == 'rejection_free'))
+        self.cluster_analyzer = self._make_cluster_analyzer()
         
         # Updated nucleation calculator with k_B parameter
         self.nucleation_calc = NucleationCalculator(
@@ -28,6 +83,11 @@ class CrystalGrowthSimulation:
             NUCLEATION['theta_deg'],
             SIMULATION_PARAMS['k_B']  # Added Boltzmann constant
         )
+        self._nucleation_factor = self._compute_nucleation_factor()
+        
+        # Optional T(t) profile; temperature switches at its change points, between steps
+        self.temperature_schedule = temperature_schedule
+        self._next_temperature_change = math.inf
         
         # Simulation state
         self.time = 0.0
@@ -41,98 +101,282 @@ class CrystalGrowthSimulation:
             'diffuse_z': 0,
             'nucleation': 0
         }
+        # Selections per event type that found nothing to execute (steps that changed nothing)
+        self.null_counts = {k: 0 for k in self.event_counts}
+        self.mobile_sites = IndexedSiteSet(self.lattice.size)  # flat indices of MOBILE atoms
+        # Sites changed by the current event, refreshed in the rate catalog afterwards
+        self._touched_sites: List[Tuple[int, int, int]] = []
+        # Optional eventlog.EventLogWriter; receives (event, from, to) records per step
+        self.event_log = None
+        self._event_records: List[Tuple[str, Tuple[int, int, int], Tuple[int, int, int]]] = []
+        # Optional profiling.PhaseProfiler, set up by enable_profiling
+        self.profiler: Optional[PhaseProfiler] = None
+        self._profiling = False
         
         self._initialize_lattice()
-        # Initialize cluster analysis at start
-        self.cluster_analyzer.update_cluster_info(self.lattice)
+        self._rebuild_indexes()
+        self._apply_temperature_schedule()
+
+    def _initial_z_extent(self) -> int:
+        return min(self.lattice_shape[2], Z_GROWTH_LAYERS) if self.grow_z else self.lattice_shape[2]
+
+    def _allocate_lattice(self, z_extent: int):
+        """Allocate an empty lattice of z_extent layers and matching site bitmaps."""
+        self.lattice = np.zeros(self.lattice_shape[:2] + (z_extent,), dtype=np.int8)
+        self.empty_sites = SiteBitmap(self.lattice.shape)
+        self.occupied_sites = SiteBitmap(self.lattice.shape)
+        self.rate_calc.set_shape(self.lattice.shape)
 
     def _initialize_lattice(self):
         """Initialize lattice with substrate and seed atom."""
-        size = self.lattice_size
-        self.empty_sites = set(np.ndindex(self.lattice.shape))
-        self.occupied_sites.clear()
+        size_x, size_y, _ = self.lattice_shape
         
         # Create substrate
-        for x, y in np.ndindex((size, size)):
-            pos = (x, y, 0)
-            self.lattice[pos] = STATES['SUBSTRATE']
-            self.occupied_sites.add(pos)
-            self.empty_sites.discard(pos)
+        self.lattice[:, :, 0] = STATES['SUBSTRATE']
         
         # Add seed atom
-        seed_pos = (size//2, size//2, 1)
+        seed_pos = (size_x//2, size_y//2, 1)
         self.lattice[seed_pos] = STATES['MOBILE']
-        self.occupied_sites.add(seed_pos)
-        self.empty_sites.discard(seed_pos)
+        self._rebuild_site_sets()
+
+    def _rebuild_site_sets(self):
+        """Recreate empty_sites and occupied_sites from the lattice."""
+        occupied = self.lattice != STATES['EMPTY']
+        self.occupied_sites.set_mask(occupied)
+        self.empty_sites.set_mask(~occupied)
+
+    def _rebuild_indexes(self):
+        """Rebuild all incremental indexes from the current lattice."""
+        self.rate_catalog.rebuild(self.lattice)
+        self._touched_sites.clear()
+        self.mobile_sites = IndexedSiteSet(self.lattice.size)
+        self.mobile_sites.update(np.flatnonzero(self.lattice == STATES['MOBILE']))
+        self.cluster_analyzer.update_cluster_info(self.lattice)
+
+    def _make_cluster_analyzer(self) -> ClusterAnalyzer:
+        """Create the cluster analyzer selected by cluster_tracking."""
+        if self.cluster_tracking == 'incremental':
+            return IncrementalClusterTracker(self.critical_size)
+        return ClusterAnalyzer(self.critical_size)
 
     def execute_simulation_step(self) -> Tuple[np.ndarray, float, str]:
         """Execute one full KMC step."""
         if self.paused:
             return self.lattice, 0.0, 'paused'
         
-        # Calculate rates (using current state)
-        rates = self.rate_calc.calculate_total_rates(self.lattice, self.temperature)
-        if self.cluster_analyzer.get_critical_clusters():
+        # Rates come from the catalog, which only refreshes sites near the last event
+        rates = self.rate_catalog.rates()
+        if self.cluster_analyzer.has_critical_clusters():
             rates['nucleation'] = self._calculate_nucleation_rate()
         
         # Select and execute event
         event_type = self._select_and_execute_event(rates)
+        self.rate_catalog.refresh(self.lattice, self._touched_sites)
+        if self.grow_z:
+            self._ensure_headroom(self._touched_sites)
+        self._touched_sites.clear()
         
-        # Update cluster analysis AFTER event execution
-        self.cluster_analyzer.update_cluster_info(self.lattice)
+        # Update cluster analysis AFTER event execution (incremental trackers follow events)
+        if not self.cluster_analyzer.incremental:
+            self.cluster_analyzer.update_cluster_info(self.lattice)
         
         # Advance time
         total_rate = sum(rates.values())
-        dt = -np.log(random.random()) / total_rate if total_rate > 0 else 0
+        dt = self.rng.exponential() / total_rate if total_rate > 0 else 0
         self.time += dt
         self.step_count += 1
+        if self.time >= self._next_temperature_change:
+            self._apply_temperature_schedule()
+        
+        if self.event_log is not None:
+            for event, src, dst in self._event_records:
+                self.event_log.append(self.step_count, self.time, event, src, dst)
+            self._event_records.clear()
         
         return self.lattice, dt, event_type
 
-    def _calculate_nucleation_rate(self) -> float:
-        """Calculate total nucleation rate for critical clusters."""
+    def set_kernel(self, kernel: str):
+        """Choose how run_steps executes grouped steps: 'numba', 'python', or 'auto' (numba if installed)."""
+        if kernel not in KERNELS:
+            raise ValueError(f"Unknown kernel '{kernel}', expected one of {KERNELS}")
+        if kernel == 'numba' and not kernels.NUMBA_AVAILABLE:
+            raise ImportError("kernel='numba' needs numba installed")
+        self.kernel = kernel
+        self.use_kernel = self.engine == 'grouped' and kernel != 'python' and kernels.NUMBA_AVAILABLE
+
+    def run_steps(self, num_steps: int, max_coverage: float = 1.0) -> int:
+        """Execute up to num_steps steps, stopping early once coverage reaches max_coverage.
+
+        With use_kernel, stretches without critical clusters run as compiled
+        batches; the result is the same as calling execute_simulation_step
+        repeatedly. Returns the number of steps executed.
+        """
+        start = self.step_count
+        end = start + num_steps
+        while self.step_count < end and self.coverage < max_coverage and not self.paused:
+            if self.use_kernel and not self.cluster_analyzer.has_critical_clusters():
+                if self._run_kernel_batch(end - self.step_count, max_coverage)['steps']:
+                    continue
+            self.execute_simulation_step()
+        return self.step_count - start
+
+    def _run_kernel_batch(self, max_steps: int, max_coverage: float) -> Dict:
+        return kernels.run_grouped_batch(self, max_steps, max_coverage)
+
+    def enable_profiling(self, allocations: bool = False):
+        """Start collecting per-phase metrics from zero; see metrics and profiling.py.
+
+        With allocations, net allocated memory blocks are counted per phase too.
+        """
+        self.disable_profiling()
+        self.profiler = PhaseProfiler(allocations)
+        self._profiling = True
+        self._instrument()
+
+    def disable_profiling(self):
+        """Stop profiling; the metrics collected so far stay available."""
+        for _, target, name in self._profiled_methods():
+            if name in vars(target):
+                delattr(target, name)
+        self._profiling = False
+
+    def _profiled_methods(self) -> Iterator[Tuple[str, object, str]]:
+        for phase, methods in PROFILED_METHODS.items():
+            for owner, name in methods:
+                yield phase, (getattr(self, owner) if owner else self), name
+
+    def _instrument(self):
+        """Wrap the profiled methods on their instances (skipping those already wrapped)."""
+        for phase, target, name in self._profiled_methods():
+            if name not in vars(target):
+                setattr(target, name, self.profiler.wrap(phase, getattr(target, name)))
+
+    @property
+    def metrics(self) -> Dict[str, Dict]:
+        """Per-phase {'seconds', 'calls'[, 'allocated_blocks']} of the profiled steps ({} if never profiled)."""
+        return self.profiler.metrics() if self.profiler is not None else {}
+
+    def _ensure_headroom(self, sites: List[Tuple[int, int, int]]):
+        """Grow the z extent if an occupied site came within Z_HEADROOM of the top."""
+        extent = self.lattice.shape[2]
+        top = max(pos[2] for pos in sites) if sites else 0
+        if top >= self._growth_threshold():
+            # Geometric steps keep the total rebuild cost linear in the final film volume
+            self.resize_z(min(self.lattice_shape[2], extent + max(Z_GROWTH_LAYERS, extent // 4)))
+
+    def _growth_threshold(self) -> int:
+        """Lowest z whose occupation triggers growth (the extent itself when z cannot grow)."""
+        extent = self.lattice.shape[2]
+        if self.grow_z and extent < self.lattice_shape[2]:
+            return extent - Z_HEADROOM
+        return extent
+
+    def resize_z(self, z_extent: int):
+        """Reallocate the lattice with z_extent layers and rebuild all indexes."""
+        old = self.lattice
+        if np.any(old[:, :, z_extent:] != STATES['EMPTY']):
+            raise ValueError(f"Occupied sites above z extent {z_extent}")
+        self._allocate_lattice(z_extent)
+        depth = min(z_extent, old.shape[2])
+        self.lattice[:, :, :depth] = old[:, :, :depth]
+        self._rebuild_site_sets()
+        self._rebuild_indexes()
+
+    def set_temperature(self, temperature: float):
+        """Change the temperature, swapping in the cached rate factors for it."""
+        self.temperature = temperature
+        self.rate_catalog.set_temperature(temperature)
+        self._nucleation_factor = self._compute_nucleation_factor()
+
+    def _apply_temperature_schedule(self):
+        """Adopt the scheduled temperature for the current time and find the next change."""
+        if self.temperature_schedule is None:
+            return
+        temperature = self.temperature_schedule.temperature_at(self.time)
+        if temperature != self.temperature:
+            self.set_temperature(temperature)
+        self._next_temperature_change = self.temperature_schedule.next_change(self.time)
+
+    def _compute_nucleation_factor(self) -> float:
+        """Nucleation rate per atom of a critical cluster; depends only on temperature."""
         delta_T = self.nucleation_calc.compute_undercooling(self.temperature)
-        delta_Gv = self.nucleation_calc.compute_volume_energy(delta_T)
         _, delta_G_hetero = self.nucleation_calc.compute_nucleation_barriers(delta_T)
-        
-        total_rate = 0.0
-        for cluster in self.cluster_analyzer.get_critical_clusters():
-            prob = self.nucleation_calc.compute_nucleation_probability(delta_G_hetero, self.temperature)
-            total_rate += NUCLEATION['A'] * prob * cluster['size']
-            
-        return total_rate
+        prob = self.nucleation_calc.compute_nucleation_probability(delta_G_hetero, self.temperature)
+        return NUCLEATION['A'] * prob
+
+    def _calculate_nucleation_rate(self) -> float:
+        """Calculate total nucleation rate for critical clusters."""
+        return self._nucleation_factor * self.cluster_analyzer.critical_atom_count()
 
     def _select_and_execute_event(self, rates: Dict[str, float]) -> str:
         """Select and execute event based on rates."""
+        if self.engine == 'tree':
+            return self._select_and_execute_site_event(rates)
+        
         event_groups = [g for g in rates if rates[g] > 0]
         weights = [rates[g] for g in event_groups]
-        selected = random.choices(event_groups, weights=weights)[0]
+        selected = event_groups[self.rng.choice_index(weights)]
         
         if selected.startswith('diffuse'):
-            return self._execute_diffusion(selected.split('_')[1])
+            event_type = self._execute_diffusion(selected.split('_')[1])
         elif selected == 'attach':
-            return self._execute_attachment()
+            event_type = self._execute_attachment()
         elif selected == 'nucleation':
-            return self._execute_nucleation()
-        return 'no_event'
+            event_type = self._execute_nucleation()
+        else:
+            return 'no_event'
+        if event_type != selected:
+            self.null_counts[selected] += 1
+        return event_type
+
+    def _select_and_execute_site_event(self, rates: Dict[str, float]) -> str:
+        """Draw a single event in proportion to its rate using the site tree."""
+        tree = self.rate_catalog.site_tree
+        site_total = tree.total
+        nucleation_rate = rates.get('nucleation', 0.0)
+        r = self.rng.random() * (site_total + nucleation_rate)
+        if r >= site_total:
+            return self._execute_nucleation() if nucleation_rate > 0 else 'no_event'
+        
+        pos = self.rate_calc.site_position(tree.find(r))
+        if self.lattice[pos] == STATES['EMPTY']:
+            return self._attach_atom(pos)
+        
+        # Mobile atom: pick an axis in proportion to its rate, then a vacant neighbor along it
+        axis_rates = [
+            self.rate_catalog.diffusion_factors[axis] * int(self.rate_catalog.vacancy_counts[(axis,) + pos])
+            for axis in range(3)
+        ]
+        direction = RateCatalog.DIRECTIONS[self.rng.choice_index(axis_rates)]
+        return self._diffuse_atom(pos, direction)
 
     def _execute_diffusion(self, direction: str) -> str:
         """Execute diffusion event in specified direction."""
-        mobile_atoms = [p for p in self.occupied_sites if self.lattice[p] == STATES['MOBILE']]
-        if not mobile_atoms:
+        if not self.mobile_sites:
             return 'no_mobile_atoms'
-            
-        pos = random.choice(mobile_atoms)
+        
+        if self.engine == 'rejection_free':
+            # Only atoms that can move along this axis, weighted by their number of moves
+            index = self.rate_catalog.pair_choice(RateCatalog.DIRECTIONS.index(direction), self.rng)
+        else:
+            index = self.mobile_sites.choice(self.rng)
+        return self._diffuse_atom(self.rate_calc.site_position(index), direction)
+
+    def _diffuse_atom(self, pos: Tuple[int, int, int], direction: str) -> str:
+        """Move an atom to a random vacant neighbor along one axis."""
         possible_moves = []
         
+        size_x, size_y, size_z = self.lattice.shape
         for delta in [-1, 1]:
             x, y, z = pos
             if direction == 'x':
-                new_pos = ((x + delta) % self.lattice_size, y, z)
+                new_pos = ((x + delta) % size_x, y, z)
             elif direction == 'y':
-                new_pos = (x, (y + delta) % self.lattice_size, z)
+                new_pos = (x, (y + delta) % size_y, z)
             else:
-                new_pos = (x, y, (z + delta) % self.lattice_size)
+                new_pos = (x, y, z + delta)
+                if not 0 <= new_pos[2] < size_z:
+                    continue  # z is not periodic
                 
             if self.lattice[new_pos] == STATES['EMPTY']:
                 possible_moves.append(new_pos)
@@ -140,28 +384,36 @@ class CrystalGrowthSimulation:
         if not possible_moves:
             return 'no_available_moves'
             
-        new_pos = random.choice(possible_moves)
+        new_pos = possible_moves[int(self.rng.random() * len(possible_moves))]
         self._move_atom(pos, new_pos)
         
         event_type = f'diffuse_{direction}'
         self.event_counts[event_type] += 1
+        if self.event_log is not None:
+            self._event_records.append((event_type, pos, new_pos))
         return event_type
 
     def _execute_attachment(self) -> str:
         """Execute attachment event - UPDATED to allow attachment to stable clusters."""
-        candidates = [p for p in self.empty_sites 
-                     if any(self.lattice[n] in (STATES['SUBSTRATE'], STATES['STABLE'])
-                     for n in self.rate_calc.get_periodic_neighbors(p).values())]
-        
-        if not candidates:
+        # Frontier index holds the empty sites next to substrate or stable atoms
+        frontier = self.rate_catalog.frontier
+        if not frontier:
             return 'no_attachment_sites'
             
-        pos = random.choice(candidates)
+        return self._attach_atom(self.rate_calc.site_position(frontier.choice(self.rng)))
+
+    def _attach_atom(self, pos: Tuple[int, int, int]) -> str:
+        """Deposit a mobile atom on an empty site."""
         self.lattice[pos] = STATES['MOBILE']
         self.empty_sites.remove(pos)
         self.occupied_sites.add(pos)
+        self._touched_sites.append(pos)
+        self.mobile_sites.add(self.rate_calc.flat_index(pos))
+        self.cluster_analyzer.atom_added(pos)
         
         self.event_counts['attach'] += 1
+        if self.event_log is not None:
+            self._event_records.append(('attach', pos, pos))
         return 'attach'
 
     def _execute_nucleation(self) -> str:
@@ -171,14 +423,19 @@ class CrystalGrowthSimulation:
             return 'no_critical_clusters'
             
         # Weight by cluster size
-        selected = random.choices(
-            critical_clusters,
-            weights=[c['size'] for c in critical_clusters]
-        )[0]
+        selected = critical_clusters[self.rng.choice_index(
+            [c['size'] for c in critical_clusters]
+        )]
         
         # Convert to stable
         for idx in selected['indices']:
-            self.lattice[tuple(idx)] = STATES['STABLE']
+            pos = tuple(idx)
+            self.lattice[pos] = STATES['STABLE']
+            self._touched_sites.append(pos)
+            self.mobile_sites.discard(self.rate_calc.flat_index(pos))
+            if self.event_log is not None:
+                self._event_records.append(('nucleation', pos, pos))
+        self.cluster_analyzer.cluster_removed(selected['id'])
         
         self.event_counts['nucleation'] += 1
         self.nucleation_count += 1
@@ -192,20 +449,62 @@ class CrystalGrowthSimulation:
         self.occupied_sites.add(new_pos)
         self.empty_sites.add(old_pos)
         self.empty_sites.remove(new_pos)
+        self._touched_sites.extend((old_pos, new_pos))
+        if self.lattice[new_pos] == STATES['MOBILE']:
+            self.mobile_sites.discard(self.rate_calc.flat_index(old_pos))
+            self.mobile_sites.add(self.rate_calc.flat_index(new_pos))
+            self.cluster_analyzer.atom_removed(old_pos)
+            self.cluster_analyzer.atom_added(new_pos)
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of lattice sites that are occupied, over the full Lx x Ly x Lz volume."""
+        return len(self.occupied_sites) / self.volume
+
+    @property
+    def volume(self) -> int:
+        """Number of sites in the full lattice, including z layers not yet allocated."""
+        return self.lattice_shape[0] * self.lattice_shape[1] * self.lattice_shape[2]
+
+    @property
+    def mobile_count(self) -> int:
+        """Number of mobile atoms, read from the mobile index."""
+        return len(self.mobile_sites)
+
+    def iter_mobile_sites(self) -> Iterator[Tuple[int, int, int]]:
+        """Iterate over the positions of mobile atoms."""
+        for index in self.mobile_sites:
+            yield self.rate_calc.site_position(index)
+
+    def null_event_fractions(self) -> Dict[str, float]:
+        """Share of the selections of each event type, and of all steps, that executed nothing."""
+        fractions = {}
+        for event, nulls in self.null_counts.items():
+            attempts = self.event_counts[event] + nulls
+            fractions[event] = nulls / attempts if attempts else 0.0
+        nulls = sum(self.null_counts.values())
+        attempts = sum(self.event_counts.values()) + nulls
+        fractions['total'] = nulls / attempts if attempts else 0.0
+        return fractions
 
     def calculate_aspect_ratio(self) -> float:
         """Calculate aspect ratio of mobile atoms."""
-        mobile = np.argwhere(self.lattice == STATES['MOBILE'])
-        if len(mobile) < 2:
+        if self.mobile_count < 2:
             return 1.0
-        return (mobile[:,0].max() - mobile[:,0].min()) / (mobile[:,1].max() - mobile[:,1].min() + 1e-6)
+        x, y, _ = np.unravel_index(self.mobile_sites.items(), self.lattice.shape)
+        return (x.max() - x.min()) / (y.max() - y.min() + 1e-6)
 
     def reset_simulation(self):
         """Reset simulation to initial state."""
-        self.lattice.fill(STATES['EMPTY'])
+        self._allocate_lattice(self._initial_z_extent())
         self.time = 0.0
         self.step_count = 0
         self.nucleation_count = 0
         self.event_counts = {k:0 for k in self.event_counts}
+        self.null_counts = {k: 0 for k in self.null_counts}
+        self.cluster_analyzer = self._make_cluster_analyzer()
+        if self._profiling:
+            self._instrument()  # New analyzer
         self._initialize_lattice()
-        self.cluster_analyzer = ClusterAnalyzer(SIMULATION_PARAMS['critical_size'])
\ No newline at end of file
+        self._rebuild_indexes()
+        self._apply_temperature_schedule()
\ No newline at end of file
@@ -3,6 +3,7 @@ from matplotlib.widgets import Button
 from kmc import CrystalGrowthSimulation
 from visualization import CrystalVisualizer
 from graph import GraphVisualizer
+from recorder import TimeSeriesRecorder
 import time
 import sys
 import numpy as np
@@ -19,14 +20,26 @@ class SimulationApp:
             'visualize_every': 20,
             'view_angle': (30, 49),
             'save_plots': True,
-            'max_coverage': 0.95  # Stop if coverage reaches this value
+            'max_coverage': 0.95,  # Stop if coverage reaches this value
+            'seed': None,  # Set an int to make runs reproducible
+            'profile': False,  # Collect per-phase step timings for the summary
+            'renderer': 'process',  # 'process': draw in a renderer process; 'inline': draw between steps
+            'render_fps': 10,  # Maximum snapshots per second handed to the renderer process
+            'render_mode': 'surface',  # 'surface': cached exposed faces; 'voxels': full ax.voxels redraw;
+                                       # 'maps': 2D height map, projection and z-slice for large films
+            'samples_per_decade': None,  # Log-time sampling of the time series (None: every update_interval)
+            'record_spill_dir': None  # Directory to spill full time-series chunks to, if any
         }
+        self.renderer = None
         
         # Initialize components with error handling
         try:
-            self.setup_ui()
-            self.visualizer = CrystalVisualizer()
+            if self.config['renderer'] == 'inline':
+                self.setup_ui()
+                self.visualizer = CrystalVisualizer(mode=self.config['render_mode'])
             self.graph_visualizer = GraphVisualizer()
+            self.recorder = TimeSeriesRecorder(samples_per_decade=self.config['samples_per_decade'],
+                                               spill_dir=self.config['record_spill_dir'])
             self.initialize_simulation()
             
             # Initialize simulation data with starting values
@@ -34,31 +47,18 @@ class SimulationApp:
             self.current_step = 0
             self._init_simulation_data()
             
-            plt.show()
+            if self.config['renderer'] == 'inline':
+                plt.show()
+            else:
+                self.run_with_renderer()
         except Exception as e:
             print(f"Initialization failed: {str(e)}")
             sys.exit(1)
 
     def _init_simulation_data(self):
-        """Initialize simulation data with starting values."""
-        self.simulation_data = {
-            'time_points': [0.0],
-            'coverage': [0.0],
-            'aspect_ratios': [1.0],
-            'events': [{
-                'attach': 0,
-                'diffuse_x': 0,
-                'diffuse_y': 0,
-                'diffuse_z': 0,
-                'nucleation': 0
-            }],
-            'cluster_stats': [{
-                'total_clusters': 0,
-                'critical_clusters': [],
-                'largest_size': 0,
-                'avg_size': 0.0
-            }]
-        }
+        """Start a new time series with the current state as its first sample."""
+        self.recorder.reset()
+        self.recorder.record(self.sim, force=True)
 
     def setup_ui(self):
         """Initialize interactive UI with improved layout."""
@@ -123,8 +123,11 @@ class SimulationApp:
         try:
             self.sim = CrystalGrowthSimulation(
                 self.config['lattice_size'],
-                self.config['temperature']
+                self.config['temperature'],
+                seed=self.config['seed']
             )
+            if self.config['profile']:
+                self.sim.enable_profiling()
             print("KMC Simulation initialized successfully")
         except Exception as e:
             raise RuntimeError(f"Simulation initialization failed: {str(e)}")
@@ -144,7 +147,8 @@ class SimulationApp:
         self.sim.paused = False
         self._init_simulation_data()
         self.update_button_states()
-        self.run_simulation()
+        if self.renderer is None:
+            self.run_simulation()  # Otherwise run_with_renderer does the stepping
 
     def run_simulation(self):
         """Main simulation loop with improved performance and error handling."""
@@ -154,7 +158,7 @@ class SimulationApp:
         try:
             while (self.current_step < self.config['num_steps'] and 
                    self.running and 
-                   len(self.sim.occupied_sites)/self.sim.lattice.size < self.config['max_coverage']):
+                   self.sim.coverage < self.config['max_coverage']):
                 
                 if self.sim.paused:
                     plt.pause(0.1)
@@ -186,21 +190,68 @@ class SimulationApp:
             self.running = False
             self.update_button_states()
 
+    def run_with_renderer(self):
+        """Serve the renderer process: step while running, publish snapshots, obey its buttons.
+
+        Stepping happens here in batches of at most update_interval steps;
+        between batches the control channel is polled and, at most render_fps
+        times a second, a snapshot is published. Nothing here waits for a
+        frame to be drawn.
+        """
+        from renderer import RendererProcess
+        
+        self.renderer = RendererProcess(self.sim.lattice_shape, view_angle=self.config['view_angle'],
+                                        fps=self.config['render_fps'], num_steps=self.config['num_steps'],
+                                        mode=self.config['render_mode'])
+        try:
+            self.publish_snapshot(force=True)
+            start_time = time.time()
+            while True:
+                stepping = self.running and not self.sim.paused
+                commands = self.renderer.commands(timeout=0.0 if stepping else 0.1)
+                if 'quit' in commands:
+                    break
+                for command in commands:
+                    if command == 'start' and not self.running:
+                        self.start_simulation()
+                        start_time = time.time()
+                    elif command == 'pause':
+                        self.toggle_pause(None)
+                    elif command == 'reset':
+                        self.reset_simulation(None)
+                if not (self.running and not self.sim.paused):
+                    continue
+                
+                if (self.current_step >= self.config['num_steps'] or
+                        self.sim.coverage >= self.config['max_coverage']):
+                    self.publish_snapshot(force=True)
+                    self.finalize_simulation(start_time)
+                    self.publish_snapshot(force=True)
+                    continue
+                
+                # Run to the next sampling point
+                interval = self.config['update_interval']
+                target = min(self.config['num_steps'], (self.current_step // interval + 1) * interval)
+                self.current_step += self.sim.run_steps(target - self.current_step, self.config['max_coverage'])
+                if self.current_step % interval == 0:
+                    self.collect_simulation_data()
+                if self.publish_snapshot():
+                    print(f"Step {self.current_step:,}/{self.config['num_steps']:,} | "
+                          f"Coverage: {self.sim.coverage:5.1%} | "
+                          f"Nucleation: {self.sim.nucleation_count}", end='\r')
+        finally:
+            self.renderer.close()
+            self.renderer = None
+
+    def publish_snapshot(self, force: bool = False) -> bool:
+        """Hand the current state to the renderer process (rate-limited unless forced)."""
+        state = 'paused' if self.running and self.sim.paused else 'running' if self.running else 'ready'
+        return self.renderer.publish(self.sim, self.current_step, state, force=force)
+
     def collect_simulation_data(self):
-        """Record current simulation state with enhanced metrics."""
+        """Record the current simulation state (if due under log-time sampling)."""
         try:
-            coverage = len(self.sim.occupied_sites) / self.sim.lattice.size
-            self.simulation_data['time_points'].append(self.sim.time)
-            self.simulation_data['coverage'].append(coverage)
-            self.simulation_data['aspect_ratios'].append(self.sim.calculate_aspect_ratio())
-            self.simulation_data['events'].append(self.sim.event_counts.copy())
-            
-            # Enhanced cluster statistics
-            cluster_stats = self.sim.cluster_analyzer.get_cluster_statistics()
-            if cluster_stats['total_clusters'] > 0:
-                cluster_stats['avg_size'] = sum(cluster_stats['size_distribution'].values()) / cluster_stats['total_clusters']
-            self.simulation_data['cluster_stats'].append(cluster_stats)
-            
+            self.recorder.record(self.sim)
         except Exception as e:
             print(f"Data collection error: {str(e)}")
 
@@ -213,7 +264,7 @@ class SimulationApp:
             metrics = {
                 'step': self.current_step,
                 'time': self.sim.time,
-                'coverage': len(self.sim.occupied_sites) / self.sim.lattice.size,
+                'coverage': self.sim.coverage,
                 'aspect_ratio': self.sim.calculate_aspect_ratio(),
                 'events': self.sim.event_counts,
                 'cluster_stats': current_stats
@@ -239,7 +290,7 @@ class SimulationApp:
             metrics = {
                 'step': self.current_step,
                 'time': self.sim.time,
-                'coverage': len(self.sim.occupied_sites) / self.sim.lattice.size,
+                'coverage': self.sim.coverage,
                 'aspect_ratio': self.sim.calculate_aspect_ratio(),
                 'events': self.sim.event_counts,
                 'cluster_stats': current_stats
@@ -259,8 +310,8 @@ class SimulationApp:
     def update_status(self, event_type):
         """Update status display with current metrics."""
         try:
-            mobile = sum(1 for p in self.sim.occupied_sites if self.sim.lattice[p] == 2)
-            coverage = 100 * len(self.sim.occupied_sites) / self.sim.lattice.size
+            mobile = self.sim.mobile_count
+            coverage = 100 * self.sim.coverage
             aspect_ratio = self.sim.calculate_aspect_ratio()
             
             status = (
@@ -301,29 +352,16 @@ class SimulationApp:
         try:
             print("\nGenerating analysis plots...")
             
-            # Growth kinetics plot with moving average
-            self.graph_visualizer.create_growth_plot(
-                time_data=self.simulation_data['time_points'],
-                coverage_data=self.simulation_data['coverage'],
-                aspect_ratios=self.simulation_data['aspect_ratios']
-            )
-            
-            # Enhanced event distribution plot
-            self.graph_visualizer.create_event_plot(
-                time_data=self.simulation_data['time_points'],
-                event_counts={
-                    'x': [e['diffuse_x'] for e in self.simulation_data['events']],
-                    'y': [e['diffuse_y'] for e in self.simulation_data['events']],
-                    'z': [e['diffuse_z'] for e in self.simulation_data['events']],
-                    'attach': [e['attach'] for e in self.simulation_data['events']],
-                    'nucleation': [e['nucleation'] for e in self.simulation_data['events']]
-                }
-            )
+            # Growth kinetics and event distribution, straight from the recorded columns
+            self.graph_visualizer.create_recording_plots(self.recorder.columns())
             
             if self.config['save_plots']:
                 self.graph_visualizer.save_plot("growth_kinetics.pdf")
                 self.graph_visualizer.save_plot("event_distribution.pdf")
-                self.visualizer.save_visualization("final_state.png")
+                if self.renderer is not None:
+                    self.renderer.save("final_state.png")
+                else:
+                    self.visualizer.save_visualization("final_state.png")
                 
         except Exception as e:
             print(f"Plot generation failed: {str(e)}")
@@ -334,7 +372,7 @@ class SimulationApp:
         """Print comprehensive simulation statistics with more metrics."""
         try:
             real_time = time.time() - start_time
-            final_coverage = len(self.sim.occupied_sites) / self.sim.lattice.size
+            final_coverage = self.sim.coverage
             cluster_stats = self.sim.cluster_analyzer.get_cluster_statistics()
             
             print("\n" + "="*80)
@@ -352,6 +390,23 @@ class SimulationApp:
             print("\nEvent counts:")
             for event, count in self.sim.event_counts.items():
                 print(f"  {event+':':<18} {count:,}")
+            
+            print(f"\nNull events ({self.sim.engine} engine):")
+            fractions = self.sim.null_event_fractions()
+            for event, count in self.sim.null_counts.items():
+                print(f"  {event+':':<18} {count:,} ({fractions[event]:.1%} of selections)")
+            print(f"  {'total:':<18} {fractions['total']:.1%} of steps")
+            
+            metrics = self.sim.metrics
+            if metrics:
+                profiled = sum(m['seconds'] for m in metrics.values())
+                print("\nStep phases:")
+                for phase, m in sorted(metrics.items(), key=lambda item: -item[1]['seconds']):
+                    line = (f"  {phase+':':<18} {m['seconds']:8.3f} s ({m['seconds'] / profiled:5.1%}) "
+                            f"{m['calls']:>10,} calls {1e6 * m['seconds'] / max(m['calls'], 1):8.1f} us/call")
+                    if 'allocated_blocks' in m:
+                        line += f" {m['allocated_blocks']:+,} blocks"
+                    print(line)
             print("="*80)
             
         except Exception as e:
@@ -367,7 +422,7 @@ class SimulationApp:
         self.update_button_states()
         status = "PAUSED" if self.sim.paused else "RESUMED"
         print(f"\nSimulation {status}")
-        self.status_text.set_text(f"Simulation {status}")
+        self.set_status(f"Simulation {status}")
 
     def reset_simulation(self, _):
         """Reset simulation to initial state with confirmation."""
@@ -377,11 +432,20 @@ class SimulationApp:
         self.sim.reset_simulation()
         self._init_simulation_data()
         self.update_button_states()
-        self.update_visualization()
-        self.status_text.set_text("Simulation reset to initial state")
+        if self.renderer is None:
+            self.update_visualization()
+        self.set_status("Simulation reset to initial state")
+
+    def set_status(self, text):
+        """Show a status message in the window (the renderer shows its own status line)."""
+        if self.renderer is None:
+            self.status_text.set_text(text)
 
     def update_button_states(self):
         """Update UI button states with visual feedback."""
+        if self.renderer is not None:
+            self.publish_snapshot(force=True)  # The renderer sets its buttons from the snapshot state
+            return
         self.start_btn.set_active(not self.running)
         self.pause_btn.label.set_text('Resume' if self.sim.paused else 'Pause')
         self.pause_btn.color = '0.85' if self.sim.paused else 'lightgray'
@@ -0,0 +1,222 @@
+"""Offline movie rendering of recorded CrystalGrowthSimulation runs.
+
+Frames come either from saved lattice snapshots (any .npz holding a
+'lattice' array: checkpoints, or runner results) or from an event log
+replayed at regular steps from its checkpoint series. They are drawn with
+CrystalVisualizer by a pool of worker processes, each with its own Agg
+backend, written as frame_00000.png, frame_00001.png, ... and optionally
+assembled into an animation. The simulation itself never pays for drawing:
+
+    python runner.py --steps 200000 --event-log --output runs/a
+    python offline_render.py --event-log runs/a/events.kmclog \
+        --checkpoints runs/a/checkpoints/*.npz --every 2000 --mode surface \
+        --output runs/a/frames --animation runs/a/growth.gif
+    python offline_render.py runs/b/step_*.npz --mode maps --output runs/b/frames
+
+Each worker renders a contiguous run of frames with one visualizer, so the
+surface mode patches its mesh from one frame to the next, and replayed
+frames only apply the logged deltas since the previous frame. An animation
+is written with Pillow for .gif and with ffmpeg (if on PATH) for any other
+extension.
+"""
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import sys
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from checkpoint import read_checkpoint_header
+from clusters import ClusterAnalyzer
+from constants import SIMULATION_PARAMS, VISUALIZATION
+from eventlog import advance_lattice, event_counts, nearest_checkpoint, read_events
+from events import lattice_shape
+
+FRAME_PATTERN = 'frame_{:05d}.png'
+# Chunks per worker: more balances uneven frames, fewer means fewer replays from a checkpoint
+CHUNKS_PER_WORKER = 2
+
+# Per-process state of a pool worker, set up by _init_worker
+_worker: Dict = {}
+
+def load_snapshot(path: str) -> Tuple[np.ndarray, Dict]:
+    """Lattice of a saved .npz and its checkpoint header ({} for plain snapshots)."""
+    with np.load(path) as data:
+        lattice = data['lattice'].copy()
+        has_header = 'header' in data.files
+    return lattice, read_checkpoint_header(path) if has_header else {}
+
+def snapshot_order(paths: Sequence[str]) -> List[str]:
+    """Checkpoints in step order; other snapshots keep the given order."""
+    headers = [load_snapshot(path)[1] for path in paths]
+    if all(headers):
+        return [path for _, path in sorted(zip((h['step_count'] for h in headers), paths))]
+    return list(paths)
+
+def replay_steps(events: np.ndarray, checkpoints: Sequence[str], every: int,
+                 start: Optional[int] = None, stop: Optional[int] = None) -> List[int]:
+    """Steps to render a replayed log at: every `every` steps from start through stop."""
+    if start is None:
+        start = min(read_checkpoint_header(path)['step_count'] for path in checkpoints)
+    if stop is None:
+        stop = int(events['step'].max()) if len(events) else start
+    steps = list(range(start, stop + 1, every))
+    if steps and steps[-1] != stop:
+        steps.append(stop)
+    return steps
+
+def frame_metrics(lattice: np.ndarray, info: Dict, analyzer: ClusterAnalyzer) -> Dict:
+    """Metrics overlay of one frame; relabels the clusters of lattice into analyzer."""
+    analyzer.update_cluster_info(lattice)
+    stats = analyzer.get_cluster_statistics()
+    sizes = list(analyzer.cluster_sizes.values())
+    stats['avg_size'] = sum(sizes) / len(sizes) if sizes else 0.0
+    # Coverage is over the full lattice, including z layers a growing run has not allocated
+    volume = int(np.prod(lattice_shape(info['lattice_size']))) if 'lattice_size' in info else lattice.size
+    return {
+        'step': info['step'],
+        'time': info.get('time', 0.0),
+        'coverage': np.count_nonzero(lattice) / volume,
+        'events': info.get('event_counts', {}),
+        'cluster_stats': stats
+    }
+
+def _init_worker(mode: str, view_angle, dpi: int, output_dir: str, event_log: Optional[str],
+                 checkpoints: Sequence[str]):
+    import matplotlib
+    matplotlib.use('Agg')
+    from visualization import CrystalVisualizer
+
+    visualizer = CrystalVisualizer(mode=mode)
+    if mode != 'maps':
+        # Frames are saved uncropped, so keep the title above the 3D axes inside the figure
+        visualizer.fig.subplots_adjust(top=0.9)
+    _worker.update(visualizer=visualizer, view_angle=view_angle, dpi=dpi,
+                   output_dir=output_dir, checkpoints=list(checkpoints),
+                   events=read_events(event_log) if event_log else None)
+
+def _frame_states(frames: List[Dict]) -> Iterator[Tuple[int, np.ndarray, Dict]]:
+    """(index, lattice, info) of consecutive frames; replayed frames advance one lattice."""
+    events = _worker['events']
+    lattice, info, replayed = None, None, None
+    for frame in frames:
+        if 'path' in frame:
+            lattice, header = load_snapshot(frame['path'])
+            info = dict(header, step=header.get('step_count', frame['index']))
+        else:
+            if replayed is None:
+                base_path, replayed = nearest_checkpoint(frame['step'], _worker['checkpoints'])
+                lattice, header = load_snapshot(base_path)
+                info = dict(header, event_counts=dict(header['event_counts']))
+            lattice, window = advance_lattice(lattice, events, replayed, frame['step'])
+            replayed = info['step'] = frame['step']
+            if len(window):
+                info['time'] = float(window['time'][-1])
+                for name, count in event_counts(window).items():
+                    info['event_counts'][name] = info['event_counts'].get(name, 0) + count
+        yield frame['index'], lattice, info
+
+def _render_chunk(frames: List[Dict]) -> List[str]:
+    """Worker entry point: render a contiguous run of frames, return the written paths."""
+    visualizer = _worker['visualizer']
+    paths = []
+    for index, lattice, info in _frame_states(frames):
+        analyzer = ClusterAnalyzer(info.get('critical_size') or SIMULATION_PARAMS['critical_size'])
+        metrics = frame_metrics(lattice, info, analyzer)
+        visualizer.visualize_crystal(lattice, metrics=metrics, cluster_map=analyzer.cluster_labels,
+                                     view_angle=_worker['view_angle'])
+        path = os.path.join(_worker['output_dir'], FRAME_PATTERN.format(index))
+        visualizer.save_visualization(path, dpi=_worker['dpi'], tight=False)
+        paths.append(path)
+    return paths
+
+def render_frames(frames: List[Dict], output_dir: str, mode: str = 'surface', workers: Optional[int] = None,
+                  dpi: int = 100, view_angle=None, event_log: Optional[str] = None,
+                  checkpoints: Sequence[str] = (),
+                  progress: Optional[Callable[[str], None]] = print) -> List[str]:
+    """Render frames ({'path'} snapshots or {'step'} replays, with 'index') in a process pool.
+
+    Returns the frame image paths in frame order.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, max(len(frames), 1))
+    bounds = np.linspace(0, len(frames), min(len(frames), workers * CHUNKS_PER_WORKER) + 1).astype(int)
+    chunks = [frames[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+    rendered = {}
+    start_time = time.time()
+    # Fresh interpreters, so no worker inherits a GUI backend from this process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context('spawn'),
+                             initializer=_init_worker,
+                             initargs=(mode, view_angle, dpi, output_dir, event_log, checkpoints)) as pool:
+        futures = {pool.submit(_render_chunk, chunk): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            rendered[futures[future]] = future.result()
+            if progress:
+                done = sum(len(paths) for paths in rendered.values())
+                progress(f"Rendered {done}/{len(frames)} frames ({time.time() - start_time:.1f}s)")
+    return [path for i in range(len(chunks)) for path in rendered[i]]
+
+def assemble_animation(frame_paths: List[str], output: str, fps: float = 10.0):
+    """Write the frames as an animation: Pillow for .gif, ffmpeg for other formats."""
+    if not frame_paths:
+        raise ValueError("No frames to assemble")
+    if os.path.splitext(output)[1].lower() == '.gif':
+        from PIL import Image
+
+        with Image.open(frame_paths[0]) as first:
+            first.save(output, save_all=True, append_images=(Image.open(p) for p in frame_paths[1:]),
+                       duration=int(1000 / fps), loop=0)
+        return
+    ffmpeg = shutil.which('ffmpeg')
+    if ffmpeg is None:
+        raise RuntimeError(f"Writing {output} needs ffmpeg on PATH; use a .gif or the frame images")
+    pattern = os.path.join(os.path.dirname(frame_paths[0]), FRAME_PATTERN.replace('{:05d}', '%05d'))
+    subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-framerate', str(fps), '-i', pattern,
+                    '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', output], check=True)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Render frames and movies of a recorded KMC run.")
+    parser.add_argument('snapshots', nargs='*', help="Snapshot or checkpoint .npz files, one frame each")
+    parser.add_argument('--event-log', help="Replay this event log instead of rendering snapshots")
+    parser.add_argument('--checkpoints', nargs='+', default=[], help="Checkpoint series the event log replays from")
+    parser.add_argument('--every', type=int, default=1000, help="Steps between replayed frames")
+    parser.add_argument('--start', type=int, help="First replayed step (default: earliest checkpoint)")
+    parser.add_argument('--stop', type=int, help="Last replayed step (default: end of the log)")
+    parser.add_argument('--mode', choices=VISUALIZATION['render_modes'], default='surface',
+                        help="CrystalVisualizer render mode")
+    parser.add_argument('--view-angle', type=float, nargs=2, metavar=('ELEV', 'AZIM'), help="3D view angle")
+    parser.add_argument('--dpi', type=int, default=100, help="Frame resolution (the figure is 12x9 inches)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--output', required=True, help="Directory for the frame images")
+    parser.add_argument('--animation', help="Also assemble the frames into this file (.gif, .mp4, ...)")
+    parser.add_argument('--fps', type=float, default=10.0, help="Animation frame rate")
+    return parser
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.event_log:
+        if not args.checkpoints:
+            parser.error("--event-log needs --checkpoints to replay from")
+        steps = replay_steps(read_events(args.event_log), args.checkpoints, args.every, args.start, args.stop)
+        frames = [{'index': i, 'step': step} for i, step in enumerate(steps)]
+    elif args.snapshots:
+        frames = [{'index': i, 'path': path} for i, path in enumerate(snapshot_order(args.snapshots))]
+    else:
+        parser.error("Give snapshot files or --event-log")
+
+    paths = render_frames(frames, args.output, mode=args.mode, workers=args.workers, dpi=args.dpi,
+                          view_angle=tuple(args.view_angle) if args.view_angle else None,
+                          event_log=args.event_log, checkpoints=args.checkpoints)
+    print(f"{len(paths)} frames written to {args.output}")
+    if args.animation:
+        assemble_animation(paths, args.animation, args.fps)
+        print(f"Animation written to {args.animation}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+"""Spatially decomposed parallel KMC over a shared-memory lattice.
+
+The x/y plane is split into a grid of domains, one per worker process,
+and every domain into 2 x 2 sectors (the synchronous sublattice scheme of
+Shim and Amar). In each sub-cycle all workers simulate the sector with
+the same index in their own domain for a window of sync_interval in
+simulated time. Sectors with the same index are separated by at least one
+other sector, so concurrent events never touch the same sites. After all
+four sectors have run (one sweep) the time advances by sync_interval.
+Nucleation, which needs whole clusters that can span domains, then runs
+serially in the coordinator.
+
+Workers run the event code of CrystalGrowthSimulation (tree engine) on a
+copy of their sector with a one-site halo, so rates and moves follow
+kmc.py exactly; halo sites are never selected, but atoms may move into
+them. The lattice itself lives in one shared-memory array that workers
+read and write in place. Each sector keeps its rate catalog between
+sub-cycles and only refreshes the sites that changed since its last run
+(its halo, and atoms the coordinator nucleated); it reports back the sites
+it changed, so the coordinator also updates its indexes and clusters
+locally instead of rebuilding them from the whole lattice every sweep.
+
+    python parallel.py --shape 256 256 24 --workers 8 --sweeps 500 --output runs/par
+
+report() gives event throughput and parallel efficiency: the share of the
+workers' capacity spent on KMC events rather than waiting for the
+slowest sector or for the serial phase. Worker time is CPU time, so
+workers sharing a core are not credited for time they spent descheduled.
+"""
+import argparse
+import math
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from constants import STATES
+from kmc import CrystalGrowthSimulation
+from rng import RandomStream, SeedLike, spawn_seeds
+
+# Narrowest domain edge: two sectors of at least two sites, so halos of concurrently active sectors never overlap
+MIN_DOMAIN_WIDTH = 4
+SECTORS = 4
+
+def _apply_changes(sim: CrystalGrowthSimulation, sites: np.ndarray, old: np.ndarray) -> List[Tuple[int, int, int]]:
+    """Update sim's site sets, mobile atoms and clusters after flat sites changed from old.
+
+    Only those sites are visited. Returns the positions that really
+    changed, for the caller to refresh in its rate catalog.
+    """
+    new = sim.lattice.reshape(-1)[sites]
+    changed = new != old
+    sites, old, new = sites[changed].tolist(), old[changed].tolist(), new[changed].tolist()
+    positions = list(map(tuple, np.column_stack(np.unravel_index(sites, sim.lattice.shape)).tolist()))
+    empty, mobile = STATES['EMPTY'], STATES['MOBILE']
+    for index, pos, was, now in zip(sites, positions, old, new):
+        if was == empty:
+            sim.empty_sites.remove(index)
+            sim.occupied_sites.add(index)
+        elif now == empty:
+            sim.occupied_sites.remove(index)
+            sim.empty_sites.add(index)
+        if was == mobile:
+            sim.mobile_sites.discard(index)
+            sim.cluster_analyzer.atom_removed(pos)
+    # Merge new atoms only once every departed atom has split its cluster
+    for index, pos, was, now in zip(sites, positions, old, new):
+        if now == mobile:
+            sim.mobile_sites.add(index)
+            sim.cluster_analyzer.atom_added(pos)
+    return positions
+
+class SectorEngine:
+    """KMC inside one sector of the shared lattice, run by a worker process."""
+    def __init__(self, lattice: np.ndarray, x_range: Tuple[int, int], y_range: Tuple[int, int],
+                 temperature: float, barriers: Optional[Dict[str, float]],
+                 critical_size: Optional[int], rng: RandomStream):
+        self.shared = lattice
+        size_x, size_y, size_z = lattice.shape
+        # Sector plus a one-site halo, wrapped periodically in x and y
+        xi = np.arange(x_range[0] - 1, x_range[1] + 1) % size_x
+        yi = np.arange(y_range[0] - 1, y_range[1] + 1) % size_y
+        shape = (len(xi), len(yi), size_z)
+        # Flat index in the shared lattice of every sector site, in sector C order
+        self.flat = np.ravel_multi_index(np.meshgrid(xi, yi, np.arange(size_z), indexing='ij'),
+                                         lattice.shape).ravel()
+
+        self.sim = CrystalGrowthSimulation(shape, temperature, engine='tree', cluster_tracking='full',
+                                           diffusion_barriers=barriers, critical_size=critical_size,
+                                           kernel='python')
+        self.sim.rng = rng
+        halo = np.ones(shape[:2], dtype=bool)
+        halo[1:-1, 1:-1] = False
+        self.halo = np.repeat(halo[:, :, None], size_z, axis=2).ravel()
+
+        # Full catalog once; later runs only refresh what changed in between
+        self.sim.lattice.reshape(-1)[:] = self.shared.reshape(-1)[self.flat]
+        self.sim._rebuild_site_sets()
+        self.sim._rebuild_indexes()
+        self._mask_tree()
+
+    def run(self, window: float, temperature: float) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, float]:
+        """Simulate the sector for a window of simulated time.
+
+        Returns its event counts, the shared-lattice flat indices of the
+        sites it changed with their previous states, and the CPU seconds this
+        process spent in the event loop.
+        """
+        sim = self.sim
+        if temperature != sim.temperature:
+            sim.set_temperature(temperature)
+            self._mask_tree()
+        local = sim.lattice.reshape(-1)
+        current = self.shared.reshape(-1)[self.flat]
+        stale = np.flatnonzero(current != local)
+        if len(stale):
+            old = local[stale]
+            local[stale] = current[stale]
+            positions = _apply_changes(sim, stale, old)
+            sim.rate_catalog.refresh(sim.lattice, positions)
+            self._mask_halo(positions)
+        start = local.copy()
+
+        catalog = sim.rate_catalog
+        tree = catalog.site_tree
+        before = dict(sim.event_counts)
+        touched = []
+        busy_start = time.process_time()
+        elapsed = 0.0
+        while tree.total > 0:
+            elapsed += sim.rng.exponential() / tree.total
+            if elapsed > window:
+                break
+            sim._select_and_execute_site_event({})
+            catalog.refresh(sim.lattice, sim._touched_sites)
+            self._mask_halo(sim._touched_sites)
+            touched.extend(sim._touched_sites)
+            sim._touched_sites.clear()
+        busy = time.process_time() - busy_start
+
+        sites = np.unique(np.ravel_multi_index(tuple(np.array(touched, dtype=np.intp).reshape(-1, 3).T),
+                                               sim.lattice.shape))
+        sites = sites[local[sites] != start[sites]]
+        self.shared.reshape(-1)[self.flat[sites]] = local[sites]
+        counts = {name: sim.event_counts[name] - before[name] for name in before}
+        return counts, self.flat[sites], start[sites], busy
+
+    def _mask_tree(self):
+        """Rebuild the site tree from the catalog with every halo rate at zero."""
+        catalog = self.sim.rate_catalog
+        catalog.site_tree.build(np.where(self.halo, 0.0, catalog.site_rates().ravel()))
+
+    def _mask_halo(self, sites: List[Tuple[int, int, int]]):
+        """Keep the rates of refreshed halo sites at zero."""
+        calc, tree = self.sim.rate_calc, self.sim.rate_catalog.site_tree
+        for pos in sites:
+            for site in (pos, *calc.get_periodic_neighbors(pos).values()):
+                index = calc.flat_index(site)
+                if self.halo[index] and tree.get(index):
+                    tree.update(index, 0.0)
+
+def _worker_main(conn, buffer, shape: Tuple[int, int, int], sectors: List[Tuple[Tuple[int, int], Tuple[int, int]]],
+                 temperature: float, barriers: Optional[Dict[str, float]],
+                 critical_size: Optional[int], seed: Dict):
+    """Worker loop: run one sector per ('run', sector, window, temperature) request."""
+    lattice = np.frombuffer(buffer, dtype=np.int8).reshape(shape)
+    rng = RandomStream(seed)
+    engines = [SectorEngine(lattice, x_range, y_range, temperature, barriers, critical_size, rng)
+               for x_range, y_range in sectors]
+    conn.send('ready')
+    while True:
+        message = conn.recv()
+        if message[0] == 'stop':
+            break
+        _, sector, window, temperature = message
+        conn.send(engines[sector].run(window, temperature))
+    conn.close()
+
+def decompose(workers: int, plane: Tuple[int, int]) -> Tuple[int, int]:
+    """Px x Py domain grid for workers processes, with domains as square as possible."""
+    best = None
+    for px in range(1, workers + 1):
+        if workers % px:
+            continue
+        py = workers // px
+        if plane[0] // px < MIN_DOMAIN_WIDTH or plane[1] // py < MIN_DOMAIN_WIDTH:
+            continue
+        mismatch = abs(math.log((plane[0] / px) / (plane[1] / py)))
+        if best is None or mismatch < best[0]:
+            best = (mismatch, (px, py))
+    if best is None:
+        raise ValueError(f"Cannot split a {plane[0]}x{plane[1]} plane into {workers} domains "
+                         f"at least {MIN_DOMAIN_WIDTH} sites wide")
+    return best[1]
+
+def _splits(length: int, parts: int) -> List[int]:
+    return [round(i * length / parts) for i in range(parts + 1)]
+
+def domain_sectors(shape: Tuple[int, int, int], grid: Tuple[int, int]) -> List[List[Tuple[Tuple[int, int], Tuple[int, int]]]]:
+    """Per domain, the (x_range, y_range) of its four sectors, in sector index order."""
+    xs, ys = _splits(shape[0], grid[0]), _splits(shape[1], grid[1])
+    domains = []
+    for i in range(grid[0]):
+        for j in range(grid[1]):
+            x0, x1, y0, y1 = xs[i], xs[i + 1], ys[j], ys[j + 1]
+            xm, ym = (x0 + x1) // 2, (y0 + y1) // 2
+            domains.append([((x0, xm), (y0, ym)), ((x0, xm), (ym, y1)),
+                            ((xm, x1), (y0, ym)), ((xm, x1), (ym, y1))])
+    return domains
+
+class ParallelCrystalGrowth:
+    """Synchronous sublattice parallel KMC on a shared-memory lattice.
+
+    self.sim is the coordinator's CrystalGrowthSimulation; its lattice is
+    the shared array, and it keeps time, event counts, clusters and
+    nucleation, so the usual statistics (coverage, aspect ratio, ...) and
+    runner.summarize() work on it unchanged. Rates live in the workers, so
+    its rate catalog is only brought up to date when run() returns.
+    """
+    def __init__(self, lattice_size, temperature: float, workers: Optional[int] = None,
+                 grid: Optional[Tuple[int, int]] = None, sync_interval: Optional[float] = None,
+                 diffusion_barriers: Optional[Dict[str, float]] = None,
+                 critical_size: Optional[int] = None, seed: SeedLike = None):
+        self.sim = CrystalGrowthSimulation(lattice_size, temperature, diffusion_barriers=diffusion_barriers,
+                                           critical_size=critical_size, seed=seed, kernel='python')
+        shape = self.sim.lattice.shape
+        self.grid = grid or decompose(workers or os.cpu_count() or 1, shape[:2])
+        self.workers = self.grid[0] * self.grid[1]
+        if min(shape[0] // self.grid[0], shape[1] // self.grid[1]) < MIN_DOMAIN_WIDTH:
+            raise ValueError(f"Domains of grid {self.grid} are narrower than {MIN_DOMAIN_WIDTH} sites")
+        # Default window: about one event per site at the fastest single-site rate
+        catalog = self.sim.rate_catalog
+        self.sync_interval = sync_interval or 1.0 / (2 * sum(catalog.diffusion_factors) + catalog.attach_factor)
+
+        # Move the lattice into shared memory; the coordinator and all workers use it in place
+        context = mp.get_context()
+        self._buffer = context.RawArray('b', self.sim.lattice.size)
+        self.lattice = np.frombuffer(self._buffer, dtype=np.int8).reshape(shape)
+        self.lattice[...] = self.sim.lattice
+        self.sim.lattice = self.lattice
+
+        self._connections = []
+        self._processes = []
+        seeds = spawn_seeds(self.sim.rng.seed_sequence, self.workers)
+        for sectors, seed_config in zip(domain_sectors(shape, self.grid), seeds):
+            parent, child = context.Pipe()
+            process = context.Process(
+                target=_worker_main, daemon=True,
+                args=(child, self._buffer, shape, sectors, temperature,
+                      self.sim.rate_calc.barriers, self.sim.critical_size, seed_config))
+            process.start()
+            self._connections.append(parent)
+            self._processes.append(process)
+        for conn in self._connections:
+            conn.recv()  # Wait until every worker has built its sector engines
+
+        self.stats = {'sweeps': 0, 'events': 0, 'wall_time': 0.0, 'worker_busy': 0.0,
+                      'slowest_busy': 0.0, 'serial_time': 0.0}
+
+    def run(self, sweeps: int, max_coverage: float = 1.0) -> int:
+        """Run up to sweeps sweeps (all four sectors once each); returns the sweeps done."""
+        sim = self.sim
+        done = 0
+        while done < sweeps and sim.coverage < max_coverage:
+            start = time.perf_counter()
+            order = list(range(SECTORS))
+            for i in range(SECTORS - 1, 0, -1):  # Random sector order per sweep
+                j = int(sim.rng.random() * (i + 1))
+                order[i], order[j] = order[j], order[i]
+            changes = [self._run_sector(sector) for sector in order]
+
+            serial_start = time.perf_counter()
+            sim.time += self.sync_interval
+            # A site may change in several sub-cycles; its state before the sweep is the first reported
+            sites = np.concatenate([s for s, _ in changes])
+            old = np.concatenate([o for _, o in changes])
+            sites, first = np.unique(sites, return_index=True)
+            _apply_changes(sim, sites, old[first])
+            self._nucleate(self.sync_interval)
+            if sim.time >= sim._next_temperature_change:
+                sim._apply_temperature_schedule()
+            end = time.perf_counter()
+
+            self.stats['serial_time'] += end - serial_start
+            self.stats['wall_time'] += end - start
+            self.stats['sweeps'] += 1
+            done += 1
+        if done:
+            sim.rate_catalog.rebuild(sim.lattice)
+        return done
+
+    def _run_sector(self, sector: int) -> Tuple[np.ndarray, np.ndarray]:
+        """One sub-cycle: every worker runs the given sector of its domain concurrently.
+
+        Returns the flat indices of the changed sites and their previous states.
+        """
+        for conn in self._connections:
+            conn.send(('run', sector, self.sync_interval, self.sim.temperature))
+        busy, sites, old = [], [], []
+        for conn in self._connections:
+            counts, changed, previous, seconds = conn.recv()
+            busy.append(seconds)
+            sites.append(changed)
+            old.append(previous)
+            for name, count in counts.items():
+                self.sim.event_counts[name] += count
+                self.sim.step_count += count
+                self.stats['events'] += count
+        self.stats['worker_busy'] += sum(busy)
+        self.stats['slowest_busy'] += max(busy)
+        return np.concatenate(sites), np.concatenate(old)
+
+    def _nucleate(self, window: float):
+        """Serial nucleation over the last window, using the coordinator's cluster tracker."""
+        sim = self.sim
+        elapsed = 0.0
+        while sim.cluster_analyzer.has_critical_clusters():
+            elapsed += sim.rng.exponential() / sim._calculate_nucleation_rate()
+            if elapsed > window:
+                break
+            sim._execute_nucleation()
+            sim._touched_sites.clear()
+            sim.step_count += 1
+            self.stats['events'] += 1
+
+    def report(self) -> Dict:
+        """Throughput and parallel efficiency of the sweeps run so far.
+
+        efficiency is worker CPU time spent on events over workers x wall
+        time; load_balance is mean over slowest worker CPU time per sub-cycle, and
+        serial_fraction the share of wall time spent at sync points.
+        """
+        stats = self.stats
+        wall = stats['wall_time']
+        return {
+            'workers': self.workers,
+            'grid': list(self.grid),
+            'sync_interval': self.sync_interval,
+            'sweeps': stats['sweeps'],
+            'events': stats['events'],
+            'wall_time': wall,
+            'events_per_second': stats['events'] / wall if wall > 0 else 0.0,
+            'efficiency': stats['worker_busy'] / (self.workers * wall) if wall > 0 else 0.0,
+            'load_balance': (stats['worker_busy'] / (self.workers * stats['slowest_busy'])
+                             if stats['slowest_busy'] > 0 else 1.0),
+            'serial_fraction': stats['serial_time'] / wall if wall > 0 else 0.0
+        }
+
+    def close(self):
+        """Stop the worker processes."""
+        for conn in self._connections:
+            try:
+                conn.send(('stop',))
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=5)
+        self._connections, self._processes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run crystal growth KMC in parallel over x/y domains.")
+    parser.add_argument('--shape', type=int, nargs=3, metavar=('LX', 'LY', 'LZ'), default=(256, 256, 24),
+                        help="Lattice extents")
+    parser.add_argument('--temperature', type=float, default=800, help="Temperature (K)")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--grid', type=int, nargs=2, metavar=('PX', 'PY'), help="Explicit domain grid")
+    parser.add_argument('--sweeps', type=int, default=100, help="Number of sweeps (four sub-cycles each)")
+    parser.add_argument('--sync-interval', type=float, help="Simulated time per sweep")
+    parser.add_argument('--max-coverage', type=float, default=0.95, help="Stop once this fraction is occupied")
+    parser.add_argument('--critical-size', type=int, help="Minimum cluster size for nucleation")
+    parser.add_argument('--seed', type=int, help="Random seed")
+    parser.add_argument('--report-every', type=int, default=10, help="Sweeps between progress lines (0 to disable)")
+    parser.add_argument('--output', help="Directory for summary.json and results.npz")
+    return parser
+
+def main(argv=None) -> int:
+    from runner import summarize, write_results
+
+    args = build_parser().parse_args(argv)
+    config = {
+        'lattice_size': list(args.shape), 'temperature': args.temperature,
+        'workers': args.workers, 'grid': args.grid, 'sweeps': args.sweeps,
+        'max_coverage': args.max_coverage, 'critical_size': args.critical_size, 'seed': args.seed
+    }
+    with ParallelCrystalGrowth(args.shape, args.temperature, workers=args.workers,
+                               grid=tuple(args.grid) if args.grid else None,
+                               sync_interval=args.sync_interval, critical_size=args.critical_size,
+                               seed=args.seed) as engine:
+        sim = engine.sim
+        print(f"{engine.workers} workers on a {engine.grid[0]}x{engine.grid[1]} grid, "
+              f"sync interval {engine.sync_interval:.3g}")
+        series = {'time_points': [0.0], 'coverage': [sim.coverage], 'nucleation_count': [0]}
+        chunk = args.report_every or args.sweeps
+        while engine.stats['sweeps'] < args.sweeps and sim.coverage < args.max_coverage:
+            engine.run(min(chunk, args.sweeps - engine.stats['sweeps']), args.max_coverage)
+            series['time_points'].append(sim.time)
+            series['coverage'].append(sim.coverage)
+            series['nucleation_count'].append(sim.nucleation_count)
+            if args.report_every:
+                report = engine.report()
+                print(f"Sweep {report['sweeps']:,} | Coverage: {sim.coverage:5.1%} | "
+                      f"Events/s: {report['events_per_second']:,.0f} | "
+                      f"Efficiency: {report['efficiency']:.0%}", flush=True)
+
+        report = engine.report()
+        summary = {**summarize(sim, config, report['wall_time']), 'parallel': report}
+        if args.output:
+            write_results(args.output, sim, summary, series)
+    print(f"Parallel efficiency {report['efficiency']:.0%}, load balance {report['load_balance']:.0%}, "
+          f"serial fraction {report['serial_fraction']:.0%}, {report['events_per_second']:,.0f} events/s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
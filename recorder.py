@@ -0,0 +1,199 @@
+"""Columnar time series of a CrystalGrowthSimulation run.
+
+TimeSeriesRecorder keeps one preallocated NumPy column per quantity (step,
+time, coverage, temperature, aspect ratio, mobile atoms, cumulative event
+counts and cluster summary scalars) and grows them by doubling, so taking
+a sample is one row write and costs a fixed number of bytes, not a dict of
+Python objects. Two options keep long runs bounded:
+
+- samples_per_decade: only record once simulated time has grown by a
+  factor 10**(1/n) since the last sample, i.e. evenly in log(time), so the
+  fast early kinetics and the slow late regime get the same resolution;
+- spill_dir: whenever chunk_size rows are held, write them to
+  chunk_00000.npz, chunk_00001.npz, ... in a fresh series_* subdirectory
+  of spill_dir and start over in memory; column() and columns() read the
+  chunks back on demand. A recorder only ever deletes chunks it wrote.
+
+state() is what a checkpoint should store: the rows still in memory plus
+the paths of the spilled chunks, which restore() reattaches without
+reading them back.
+
+    recorder = TimeSeriesRecorder(samples_per_decade=20)
+    recorder.record(sim)            # e.g. every update_interval steps
+    recorder.column('coverage')     # float64 array over all samples
+
+Column names for time, coverage, temperature, aspect ratio and nucleation
+count are those of the runner's results.npz.
+"""
+import os
+import tempfile
+import numpy as np
+from typing import Dict, List, Optional
+from eventlog import EVENT_CODES
+
+COLUMNS: Dict[str, np.dtype] = {
+    'step': np.dtype(np.int64),
+    'time_points': np.dtype(np.float64),
+    'coverage': np.dtype(np.float64),
+    'temperature': np.dtype(np.float64),
+    'aspect_ratios': np.dtype(np.float64),
+    'nucleation_count': np.dtype(np.int64),
+    'mobile': np.dtype(np.int64),
+    **{f'{event}_events': np.dtype(np.int64) for event in EVENT_CODES},
+    'total_clusters': np.dtype(np.int64),
+    'critical_clusters': np.dtype(np.int64),
+    'largest_cluster': np.dtype(np.int64),
+    'avg_cluster_size': np.dtype(np.float64)
+}
+CHUNK_PATTERN = 'chunk_{:05d}.npz'
+# Each recorder spills into its own new subdirectory of spill_dir
+SPILL_PREFIX = 'series_'
+
+class TimeSeriesRecorder:
+    """Growable columns of simulation samples, optionally log-time sampled and spilled to disk."""
+    def __init__(self, capacity: int = 1024, samples_per_decade: Optional[float] = None,
+                 spill_dir: Optional[str] = None, chunk_size: int = 65536):
+        self.samples_per_decade = samples_per_decade
+        self.spill_dir = spill_dir
+        self.chunk_size = chunk_size
+        self._capacity = max(1, capacity)
+        self._chunk_dir: Optional[str] = None
+        self._written: List[str] = []
+        self.reset()
+
+    def reset(self):
+        """Drop all samples; chunk files this recorder wrote are deleted, reattached ones are kept."""
+        self._data = {name: np.empty(self._capacity, dtype=dtype) for name, dtype in COLUMNS.items()}
+        self._size = 0
+        self._spilled = 0
+        self._chunks: List[str] = []
+        self._next_time = None
+        for path in self._written:
+            if os.path.exists(path):
+                os.remove(path)
+        self._written = []
+
+    def __len__(self) -> int:
+        return self._spilled + self._size
+
+    def due(self, time: float) -> bool:
+        """Whether a sample at this simulated time would be recorded."""
+        return self.samples_per_decade is None or self._next_time is None or time >= self._next_time
+
+    def record(self, sim, force: bool = False) -> bool:
+        """Append a sample of sim's current state if due (or forced); returns whether it was taken."""
+        if not force and not self.due(sim.time):
+            return False
+        analyzer = sim.cluster_analyzer
+        sizes = np.fromiter(analyzer.cluster_sizes.values(), dtype=np.int64, count=len(analyzer.cluster_sizes))
+        self.append(
+            step=sim.step_count,
+            time_points=sim.time,
+            coverage=sim.coverage,
+            temperature=sim.temperature,
+            aspect_ratios=sim.calculate_aspect_ratio(),
+            nucleation_count=sim.nucleation_count,
+            mobile=sim.mobile_count,
+            **{f'{event}_events': sim.event_counts.get(event, 0) for event in EVENT_CODES},
+            total_clusters=analyzer.num_clusters,
+            critical_clusters=int(np.count_nonzero(sizes >= analyzer.critical_size)),
+            largest_cluster=int(sizes.max()) if len(sizes) else 0,
+            avg_cluster_size=float(sizes.mean()) if len(sizes) else 0.0
+        )
+        return True
+
+    def append(self, **values):
+        """Append one row; columns not given are recorded as 0."""
+        if self._size == len(self._data['step']):
+            for name, column in self._data.items():
+                self._data[name] = np.resize(column, 2 * len(column))
+        row = self._size
+        for name, column in self._data.items():
+            column[row] = values.get(name, 0)
+        self._size += 1
+        self._advance_sampling(float(values.get('time_points', 0.0)))
+        if self.spill_dir and self._size >= self.chunk_size:
+            self._spill()
+
+    def extend(self, columns: Dict[str, np.ndarray]):
+        """Append many rows at once from arrays of equal length; missing columns are 0."""
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of unequal length: {sorted(lengths)}")
+        count = lengths.pop() if lengths else 0
+        if not count:
+            return
+        needed = self._size + count
+        if needed > len(self._data['step']):
+            for name, column in self._data.items():
+                self._data[name] = np.resize(column, max(needed, 2 * len(column)))
+        for name, column in self._data.items():
+            column[self._size:needed] = columns[name] if name in columns else 0
+        self._size = needed
+        self._advance_sampling(float(self._data['time_points'][needed - 1]))
+        if self.spill_dir and self._size >= self.chunk_size:
+            self._spill()
+
+    def state(self) -> Dict[str, np.ndarray]:
+        """Rows held in memory plus the spilled chunk paths and row count, for restore()."""
+        return {
+            **{name: column[:self._size].copy() for name, column in self._data.items()},
+            'spilled_chunks': np.array(self._chunks, dtype=str),
+            'spilled_rows': np.array(self._spilled, dtype=np.int64)
+        }
+
+    def restore(self, columns: Dict[str, np.ndarray]):
+        """Replace all samples with saved columns: from state(), or all rows from columns()."""
+        self.reset()
+        chunks = [str(path) for path in columns.get('spilled_chunks', ())]
+        missing = [path for path in chunks if not os.path.exists(path)]
+        if missing:
+            raise FileNotFoundError(f"Spilled time-series chunks not found: {missing}")
+        self._chunks = chunks
+        self._spilled = int(columns.get('spilled_rows', 0))
+        self.extend({name: values for name, values in columns.items() if name in COLUMNS})
+        if not self._size and self._chunks:
+            self._advance_sampling(float(self.last('time_points')))
+
+    def column(self, name: str) -> np.ndarray:
+        """All samples of one column, spilled chunks included (a new array)."""
+        if name not in COLUMNS:
+            raise KeyError(f"Unknown column '{name}'")
+        parts = []
+        for path in self._chunks:
+            with np.load(path) as data:
+                parts.append(data[name])
+        parts.append(self._data[name][:self._size])
+        return np.concatenate(parts)
+
+    def last(self, name: str):
+        """Most recent sample of one column, None before the first sample."""
+        if self._size:
+            return self._data[name][self._size - 1].item()
+        if self._chunks:
+            with np.load(self._chunks[-1]) as data:
+                return data[name][-1].item()
+        return None
+
+    def columns(self) -> Dict[str, np.ndarray]:
+        """All samples of every column."""
+        return {name: self.column(name) for name in COLUMNS}
+
+    def _advance_sampling(self, time: float):
+        if self.samples_per_decade is None:
+            return
+        # From t = 0 the next sample is the first one at positive time
+        self._next_time = (time * 10 ** (1.0 / self.samples_per_decade) if time > 0
+                           else np.nextafter(0.0, 1.0))
+
+    def _spill(self):
+        """Write the rows held in memory as the next chunk file and empty the columns."""
+        if self._chunk_dir is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            self._chunk_dir = tempfile.mkdtemp(prefix=SPILL_PREFIX, dir=self.spill_dir)
+        path = os.path.join(self._chunk_dir, CHUNK_PATTERN.format(len(self._written)))
+        np.savez(path, **{name: column[:self._size] for name, column in self._data.items()})
+        self._written.append(path)
+        self._chunks.append(path)
+        self._spilled += self._size
+        self._size = 0
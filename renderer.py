@@ -0,0 +1,299 @@
+"""Rendering in a separate process, fed through shared-memory snapshots.
+
+The stepping process publishes the lattice, the cluster labels and a small
+metrics record into a SnapshotBuffer; a renderer process draws the newest
+snapshot with CrystalVisualizer whenever it is free. The buffer has three
+slots (triple buffering): the writer always has a slot that is neither the
+newest one nor the one being drawn, so publishing is two array copies and
+never waits for matplotlib, and the reader draws straight from shared
+memory without copying. Each snapshot also lists the sites whose state or
+cluster label changed since the snapshot the reader last acquired, so the
+surface view patches only those cells instead of rescanning the lattice.
+
+The renderer window carries the Start, Pause and Reset buttons. Clicks are
+sent back over a control pipe as commands, which the stepping loop polls
+between batches (RendererProcess.commands).
+
+    renderer = RendererProcess(sim.lattice_shape)
+    renderer.publish(sim, step, state='running')
+    for command in renderer.commands():
+        ...
+"""
+import multiprocessing as mp
+import pickle
+import time
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SLOTS = 3
+# Space for the pickled metrics record of one snapshot
+METRICS_BYTES = 256 * 1024
+COMMANDS = ('start', 'pause', 'reset', 'quit')
+# Beyond this share of changed sites a snapshot carries no change list and is redrawn in full
+CHANGES_FRACTION = 0.05
+
+class Snapshot(NamedTuple):
+    seq: int
+    lattice: np.ndarray     # read-only views into shared memory, valid until the next acquire()
+    labels: np.ndarray
+    metrics: Dict
+    changed: Optional[np.ndarray]  # flat indices changed since the previous acquire(), None if unknown
+
+class SnapshotBuffer:
+    """Triple-buffered lattice, cluster label and metrics snapshots in shared memory.
+
+    One process publishes, one process acquires. Lattices may be shorter in
+    z than the shape the buffer was made for (grow_z).
+    """
+    def __init__(self, shape: Tuple[int, int, int], context=None):
+        context = context or mp.get_context()
+        self.shape = tuple(shape)
+        self.size = int(np.prod(self.shape))
+        self._lattices = context.RawArray('b', SLOTS * self.size)
+        self._labels = context.RawArray('i', SLOTS * self.size)
+        self._metrics = context.RawArray('B', SLOTS * METRICS_BYTES)
+        self._changes = context.RawArray('i', SLOTS * int(CHANGES_FRACTION * self.size))
+        self._meta = context.RawArray('q', SLOTS * 3)   # per slot: z extent, metrics length, changes (-1: unknown)
+        # Newest slot, slot being read, sequence, sequence last acquired
+        self._state = context.RawArray('q', [-1, -1, 0, 0])
+        self._lock = context.Lock()
+        self._last_seen = 0
+        self._views = None
+        # Writer side: (sequence, sites changed since the sequence before) not yet acquired
+        self._history: List[Tuple[int, Optional[np.ndarray]]] = []
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_views'] = None
+        return state
+
+    def _arrays(self) -> Tuple[np.ndarray, ...]:
+        if self._views is None:
+            self._views = (
+                np.frombuffer(self._lattices, dtype=np.int8).reshape(SLOTS, self.size),
+                np.frombuffer(self._labels, dtype=np.int32).reshape(SLOTS, self.size),
+                np.frombuffer(self._metrics, dtype=np.uint8).reshape(SLOTS, METRICS_BYTES),
+                np.frombuffer(self._meta, dtype=np.int64).reshape(SLOTS, 3),
+                np.frombuffer(self._state, dtype=np.int64),
+                np.frombuffer(self._changes, dtype=np.int32).reshape(SLOTS, -1)
+            )
+        return self._views
+
+    def publish(self, lattice: np.ndarray, labels: Optional[np.ndarray], metrics: Dict):
+        """Make a copy of lattice, labels and metrics the newest snapshot."""
+        lattices, label_slots, metric_slots, meta, state, change_slots = self._arrays()
+        payload = pickle.dumps(metrics, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > METRICS_BYTES:
+            raise ValueError(f"Snapshot metrics take {len(payload)} bytes, more than {METRICS_BYTES}")
+        with self._lock:
+            slot = next(i for i in range(SLOTS) if i not in (state[0], state[1]))
+            previous, sequence, acquired = int(state[0]), int(state[2]) + 1, int(state[3])
+
+        # Neither the reader nor another acquire touches this slot until it is published
+        n = lattice.size
+        values = lattice.reshape(-1)
+        label_values = 0 if labels is None else labels.reshape(-1)
+        changed = None
+        if previous >= 0 and meta[previous, 0] == lattice.shape[2]:
+            # The newest slot is never written by this process, so it still holds the last snapshot
+            changed = np.flatnonzero((lattices[previous, :n] != values) | (label_slots[previous, :n] != label_values))
+        lattices[slot, :n] = values
+        label_slots[slot, :n] = label_values
+        metric_slots[slot, :len(payload)] = np.frombuffer(payload, dtype=np.uint8)
+        meta[slot] = (lattice.shape[2], len(payload), self._pending_changes(sequence, acquired, changed, slot))
+
+        with self._lock:
+            state[0] = slot
+            state[2] += 1
+
+    def _pending_changes(self, sequence: int, acquired: int, changed: Optional[np.ndarray], slot: int) -> int:
+        """Write the sites changed since the last acquired snapshot into slot; -1 if unknown.
+
+        A reader may skip snapshots, so the list covers every publish after
+        the one it acquired last.
+        """
+        self._history = [(seq, sites) for seq, sites in self._history if seq > acquired]
+        self._history.append((sequence, changed))
+        change_slots = self._arrays()[5]
+        if any(sites is None for _, sites in self._history):
+            return -1
+        sites = np.unique(np.concatenate([sites for _, sites in self._history]))
+        if len(sites) > change_slots.shape[1]:
+            self._history = [(sequence, None)]  # Redrawn in full anyway; stop collecting
+            return -1
+        change_slots[slot, :len(sites)] = sites
+        return len(sites)
+
+    def acquire(self) -> Optional[Snapshot]:
+        """Newest snapshot, or None if there is none newer than the last acquired."""
+        lattices, label_slots, metric_slots, meta, state, change_slots = self._arrays()
+        with self._lock:
+            if state[2] == self._last_seen:
+                return None
+            slot = int(state[0])
+            state[1] = slot
+            self._last_seen = state[3] = int(state[2])
+
+        z_extent, metrics_length, change_count = (int(v) for v in meta[slot])
+        shape = self.shape[:2] + (z_extent,)
+        n = int(np.prod(shape))
+        lattice = lattices[slot, :n].reshape(shape)
+        labels = label_slots[slot, :n].reshape(shape)
+        lattice.flags.writeable = False
+        labels.flags.writeable = False
+        metrics = pickle.loads(metric_slots[slot, :metrics_length].tobytes())
+        changed = None
+        if change_count >= 0:
+            changed = change_slots[slot, :change_count]
+            changed.flags.writeable = False
+        return Snapshot(self._last_seen, lattice, labels, metrics, changed)
+
+def snapshot_metrics(sim, step: int, state: str) -> Dict:
+    """Small metrics record for a snapshot; critical clusters are listed by label ID only."""
+    analyzer = sim.cluster_analyzer
+    sizes = list(analyzer.cluster_sizes.values())
+    return {
+        'step': step,
+        'time': sim.time,
+        'coverage': sim.coverage,
+        'aspect_ratio': sim.calculate_aspect_ratio(),
+        'mobile': sim.mobile_count,
+        'nucleation_count': sim.nucleation_count,
+        'events': dict(sim.event_counts),
+        'cluster_stats': {
+            'total_clusters': analyzer.num_clusters,
+            'critical_clusters': [{'id': c['id'], 'size': c['size']} for c in analyzer.get_critical_clusters()],
+            'largest_size': max(sizes) if sizes else 0,
+            'avg_size': sum(sizes) / len(sizes) if sizes else 0.0
+        },
+        'state': state
+    }
+
+class RendererProcess:
+    """Simulation-side handle of the renderer process: snapshots out, commands in."""
+    def __init__(self, shape: Tuple[int, int, int], view_angle=None, fps: float = 10.0,
+                 num_steps: Optional[int] = None, mode: str = 'voxels'):
+        # A fresh interpreter, so the GUI backend never inherits state from this process
+        context = mp.get_context('spawn')
+        self.buffer = SnapshotBuffer(shape, context)
+        self.fps = fps
+        self._last_publish = 0.0
+        self._conn, child = context.Pipe()
+        self.process = context.Process(target=_renderer_main, name='KMCRenderer', daemon=True,
+                                       args=(self.buffer, child, view_angle, fps, num_steps, mode))
+        self.process.start()
+        child.close()
+
+    def publish(self, sim, step: int, state: str, force: bool = False) -> bool:
+        """Publish sim as the newest snapshot, at most fps times per second unless forced."""
+        now = time.perf_counter()
+        if not force and now - self._last_publish < 1.0 / self.fps:
+            return False
+        self._last_publish = now
+        self.buffer.publish(sim.lattice, sim.cluster_analyzer.cluster_labels,
+                            snapshot_metrics(sim, step, state))
+        return True
+
+    def commands(self, timeout: float = 0.0) -> List[str]:
+        """Commands sent from the renderer window since the last call.
+
+        Waits up to timeout seconds for the first one; 'quit' is reported
+        when the window was closed or the renderer died.
+        """
+        received = []
+        try:
+            if self._conn.poll(timeout):
+                while self._conn.poll():
+                    received.append(self._conn.recv())
+        except (EOFError, OSError):
+            received.append('quit')
+        if not received and not self.process.is_alive():
+            received.append('quit')
+        return received
+
+    def save(self, filename: str, timeout: float = 30.0):
+        """Have the renderer draw the newest snapshot and save it to filename."""
+        self._conn.send(('save', filename))
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline and self.process.is_alive():
+            if self._conn.poll(0.1):
+                message = self._conn.recv()
+                if message == ('saved', filename):
+                    return
+        print(f"Renderer did not save {filename}")
+
+    def close(self):
+        """Ask the renderer to exit and wait for it."""
+        try:
+            self._conn.send(('stop',))
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._conn.close()
+
+def _renderer_main(buffer: SnapshotBuffer, conn, view_angle, fps: float, num_steps: Optional[int],
+                   mode: str = 'voxels'):
+    """Renderer process: draw the newest snapshot, forward button clicks as commands."""
+    import matplotlib.pyplot as plt
+    from matplotlib.widgets import Button
+    from visualization import CrystalVisualizer
+
+    visualizer = CrystalVisualizer(mode=mode)
+    fig = visualizer.fig
+    fig.subplots_adjust(bottom=0.2)
+    buttons = {}
+    for label, command, left in (('Start', 'start', 0.15), ('Pause', 'pause', 0.40), ('Reset', 'reset', 0.65)):
+        button = Button(fig.add_axes([left, 0.05, 0.2, 0.075]), label, color='lightgray', hovercolor='0.95')
+        button.label.set_fontsize(12)
+        button.on_clicked(lambda _, command=command: conn.send(command))
+        buttons[command] = button
+    status_text = fig.text(0.05, 0.15, "Ready to start simulation...", fontsize=11,
+                           bbox=dict(facecolor='white', alpha=0.9, edgecolor='lightgray', boxstyle='round'))
+    if mode == 'maps':
+        visualizer.keep_animated(status_text)  # Blitted frames only redraw animated artists
+    closed = []
+    fig.canvas.mpl_connect('close_event', lambda _: closed.append(True))
+
+    def draw(snapshot: Snapshot):
+        metrics = snapshot.metrics
+        state = metrics['state']
+        buttons['start'].set_active(state not in ('running', 'paused'))
+        buttons['pause'].label.set_text('Resume' if state == 'paused' else 'Pause')
+        buttons['pause'].set_active(state in ('running', 'paused'))
+        steps = f"/{num_steps:,}" if num_steps else ""
+        status_text.set_text(
+            f"{state.upper()} | Step {metrics['step']:,}{steps} | Mobile: {metrics['mobile']} | "
+            f"Coverage: {metrics['coverage']:5.1%} | Aspect: {metrics['aspect_ratio']:.2f} | "
+            f"Nucleation: {metrics['nucleation_count']} | "
+            f"Clusters: {len(metrics['cluster_stats']['critical_clusters'])}")
+        if mode == 'voxels':
+            # Only the full voxel view colors critical clusters cell by cell
+            for cluster in metrics['cluster_stats']['critical_clusters']:
+                cluster['indices'] = np.argwhere(snapshot.labels == cluster['id'])
+        visualizer.visualize_crystal(snapshot.lattice, metrics=metrics, cluster_map=snapshot.labels,
+                                     view_angle=view_angle, changed=snapshot.changed)
+
+    try:
+        while not closed:
+            snapshot = buffer.acquire()
+            if snapshot is not None:
+                draw(snapshot)
+            else:
+                plt.pause(1.0 / fps)  # Keeps the window responsive between snapshots
+            while conn.poll():
+                message = conn.recv()
+                if message[0] == 'stop':
+                    return
+                if message[0] == 'save':
+                    snapshot = buffer.acquire()
+                    if snapshot is not None:
+                        draw(snapshot)
+                    visualizer.save_visualization(message[1])
+                    conn.send(('saved', message[1]))
+        conn.send('quit')
+    except (EOFError, BrokenPipeError, OSError):
+        pass  # The simulation process is gone
+    finally:
+        plt.close('all')
@@ -0,0 +1,103 @@
+import math
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Union
+
+SeedLike = Optional[Union[int, np.random.SeedSequence, Dict]]
+
+class RandomStream:
+    """Seeded random source for one simulation.
+
+    Wraps a NumPy Generator and hands out uniforms from pre-generated
+    blocks, so the KMC loop pays one Python call per number instead of a
+    Generator call. Independent child streams for replicas are spawned from
+    the stream's SeedSequence, which makes every replica of an ensemble
+    reproducible bit-for-bit from the parent seed alone.
+    """
+    def __init__(self, seed: SeedLike = None, block_size: int = 4096):
+        self.seed_sequence = as_seed_sequence(seed)
+        self.generator = np.random.Generator(np.random.PCG64(self.seed_sequence))
+        self.block_size = block_size
+        self._array = np.zeros(0)        # current block; _block is the same numbers as a list
+        self._block: List[float] = []
+        self._pos = 0
+
+    def _refill(self):
+        self._array = self.generator.random(self.block_size)
+        self._block = self._array.tolist()
+        self._pos = 0
+
+    def random(self) -> float:
+        """Uniform float in [0, 1)."""
+        if self._pos >= len(self._block):
+            self._refill()
+        value = self._block[self._pos]
+        self._pos += 1
+        return value
+
+    def exponential(self) -> float:
+        """Unit-mean exponential variate, -ln(u) with u in (0, 1]."""
+        return -math.log(1.0 - self.random())
+
+    def peek(self, n: int) -> np.ndarray:
+        """Up to n upcoming uniforms as a read-only array, without consuming them (see advance).
+
+        Returns what is left of the current block, refilling it first when
+        it is exhausted, so the result may be shorter than n but never empty.
+        """
+        if self._pos >= len(self._block):
+            self._refill()
+        view = self._array[self._pos:self._pos + n]
+        view.flags.writeable = False
+        return view
+
+    def advance(self, n: int):
+        """Consume n uniforms previously obtained with peek."""
+        self._pos += n
+
+    def choice_index(self, weights: Sequence[float]) -> int:
+        """Index drawn in proportion to non-negative weights."""
+        r = self.random() * sum(weights)
+        last = 0
+        for i, w in enumerate(weights):
+            if w > 0:
+                if r < w:
+                    return i
+                r -= w
+                last = i
+        # Rounding fell off the end: return the last non-zero weight
+        return last
+
+    def spawn(self, n: int) -> List['RandomStream']:
+        """Independent child streams, e.g. one per replica."""
+        return [RandomStream(child, self.block_size) for child in self.seed_sequence.spawn(n)]
+
+    def get_state(self) -> Dict:
+        """Full stream state, including the unused part of the current block."""
+        return {
+            'bit_generator': self.generator.bit_generator.state,
+            'block': list(self._block[self._pos:])
+        }
+
+    def set_state(self, state: Dict):
+        """Restore a state produced by get_state."""
+        self.generator.bit_generator.state = state['bit_generator']
+        self._block = list(state['block'])
+        self._array = np.array(self._block, dtype=np.float64)
+        self._pos = 0
+
+def as_seed_sequence(seed: SeedLike) -> np.random.SeedSequence:
+    """Accept an int, None, a SeedSequence or a dict from seed_to_config."""
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    if isinstance(seed, dict):
+        return np.random.SeedSequence(seed['entropy'], spawn_key=tuple(seed.get('spawn_key', ())))
+    return np.random.SeedSequence(seed)
+
+def seed_to_config(seed: SeedLike) -> Dict:
+    """JSON-serializable description of a seed that as_seed_sequence can rebuild."""
+    seq = as_seed_sequence(seed)
+    return {'entropy': int(seq.entropy), 'spawn_key': [int(k) for k in seq.spawn_key]}
+
+def spawn_seeds(seed: SeedLike, n: int) -> List[Dict]:
+    """n independent child seeds of a parent seed, in config form."""
+    return [seed_to_config(child) for child in as_seed_sequence(seed).spawn(n)]
@@ -0,0 +1,366 @@
+"""Headless batch runner for CrystalGrowthSimulation.
+
+Runs the KMC loop without any GUI and writes the results to disk:
+
+    python runner.py --size 30 --temperature 800 --steps 10000 --output runs/800K
+
+With ``--checkpoint-every N`` the full simulation state is saved every N
+steps (atomically, to <output>/checkpoint.npz by default), and
+``--resume PATH`` continues a run from such a checkpoint at the exact step.
+A checkpoint path containing ``{step}`` keeps every checkpoint instead of
+overwriting one file.
+
+``--shape LX LY LZ`` runs a non-cubic lattice (periodic in x and y, open in
+z), and ``--grow-z`` allocates z layers only as the film thickens.
+
+``--ramp T_END DURATION`` and ``--anneal PEAK START RAMP HOLD`` drive the
+temperature from ``--temperature`` along a schedule over simulated time.
+
+``--engine rejection_free`` only ever selects executable moves; the
+summary reports the share of null events (steps that changed nothing)
+per event type for every engine.
+
+``--event-log`` streams every lattice change to <output>/events.kmclog and
+keeps a checkpoint series in <output>/checkpoints/, from which
+eventlog.replay_lattice() can rebuild the lattice at any step, and
+offline_render.py can render the run as frames or a movie afterwards.
+
+The time series (recorder.TimeSeriesRecorder columns, saved in
+results.npz) is sampled every ``--update-interval`` steps; with
+``--samples-per-decade N`` only N samples per decade of simulated time are
+kept, and ``--spill-series`` writes full chunks under <output>/series/
+instead of holding the whole series in memory. Checkpoints then store only
+the samples not yet spilled and the paths of the chunks, which ``--resume``
+picks back up.
+
+Only numpy and the simulation core are imported up front; matplotlib,
+seaborn and scipy are imported on demand (``--plots``), so batch jobs on
+compute nodes start immediately and need no display.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from typing import Callable, Dict, Optional
+from kmc import CrystalGrowthSimulation, ENGINES, KERNELS
+from rng import seed_to_config
+from schedules import TemperatureSchedule
+from checkpoint import save_checkpoint, load_checkpoint, load_checkpoint_extra
+from eventlog import EventLogWriter
+from recorder import TimeSeriesRecorder
+
+DEFAULT_CONFIG = {
+    'lattice_size': 30,      # Edge length, or [Lx, Ly, Lz]
+    'grow_z': False,         # Allocate z layers as the film thickens
+    'temperature': 800,
+    'temperature_schedule': None,  # TemperatureSchedule.to_config() form
+    'num_steps': 10000,
+    'max_coverage': 0.95,   # Stop if coverage reaches this value
+    'engine': 'grouped',
+    'kernel': 'auto',        # Compiled grouped-step batches when numba is installed
+    'diffusion': None,       # Per-axis barrier overrides, e.g. {'x': 0.7}
+    'critical_size': None,   # Override SIMULATION_PARAMS['critical_size']
+    'seed': None,            # int, or {'entropy', 'spawn_key'} from rng.spawn_seeds
+    'update_interval': 150,  # Steps between time-series samples
+    'samples_per_decade': None,  # Log-time sampling: keep this many samples per decade of time
+    'spill_series': False,   # Write time-series chunks under <output_dir>/series/ as they fill
+    'report_every': 1000,    # Steps between progress reports (0 disables)
+    'checkpoint_every': 0,   # Steps between automatic checkpoints (0 disables)
+    'checkpoint_path': None, # Defaults to <output_dir>/checkpoint.npz; may contain {step}
+    'event_log': False,      # Stream events to <output_dir>/events.kmclog
+    'profile': False,        # Per-phase step timings in the summary ('metrics')
+    'plots': False
+}
+
+def run_simulation(config: Dict, output_dir: Optional[str] = None,
+                   progress: Optional[Callable[[str], None]] = print,
+                   resume_from: Optional[str] = None) -> Dict:
+    """Run one simulation to completion and return its summary record.
+
+    With resume_from, the simulation and its time series are restored from
+    that checkpoint; the simulation parameters stored there take precedence
+    over config, while stopping and output settings still come from config.
+    """
+    config = {**DEFAULT_CONFIG, **config}
+    if config['update_interval'] < 1:
+        raise ValueError(f"update_interval must be at least 1, got {config['update_interval']}")
+    if resume_from:
+        sim = load_checkpoint(resume_from)
+        sim.set_kernel(config['kernel'])
+        saved_series = load_checkpoint_extra(resume_from)
+        config.update(
+            lattice_size=sim.lattice_size,
+            grow_z=sim.grow_z,
+            temperature=sim.temperature,
+            temperature_schedule=(sim.temperature_schedule.to_config()
+                                  if sim.temperature_schedule is not None else None),
+            engine=sim.engine,
+            diffusion=sim.rate_calc.barriers,
+            critical_size=sim.critical_size,
+            seed=seed_to_config(sim.rng.seed_sequence)
+        )
+        if progress:
+            progress(f"Resumed from {resume_from} at step {sim.step_count:,}")
+    else:
+        # Record the concrete seed so an unseeded run can still be repeated exactly
+        config['seed'] = seed_to_config(config['seed'])
+        sim = CrystalGrowthSimulation(
+            config['lattice_size'],
+            config['temperature'],
+            engine=config['engine'],
+            diffusion_barriers=config['diffusion'],
+            critical_size=config['critical_size'],
+            seed=config['seed'],
+            kernel=config['kernel'],
+            grow_z=config['grow_z'],
+            temperature_schedule=(TemperatureSchedule.from_config(config['temperature_schedule'])
+                                  if config['temperature_schedule'] else None)
+        )
+        saved_series = {}
+    if config['profile']:
+        sim.enable_profiling()
+    if config['spill_series'] and not output_dir:
+        raise ValueError("spill_series needs output_dir")
+    spill_dir = os.path.join(output_dir, 'series') if config['spill_series'] else None
+    recorder = TimeSeriesRecorder(samples_per_decade=config['samples_per_decade'], spill_dir=spill_dir)
+    if saved_series:
+        recorder.restore(saved_series)
+    else:
+        recorder.record(sim, force=True)
+
+    checkpointing = config['checkpoint_every'] or config['event_log']
+    checkpoint_path = config['checkpoint_path']
+    if checkpointing and not checkpoint_path:
+        if not output_dir:
+            raise ValueError("checkpoint_every and event_log need checkpoint_path or output_dir")
+        # Replay needs a series of checkpoints to start from, not a single overwritten file
+        checkpoint_path = (os.path.join(output_dir, 'checkpoints', 'step_{step:09d}.npz')
+                           if config['event_log'] else os.path.join(output_dir, 'checkpoint.npz'))
+
+    def checkpoint():
+        save_checkpoint(sim, checkpoint_path.format(step=sim.step_count), extra=recorder.state())
+
+    if config['event_log']:
+        if not output_dir:
+            raise ValueError("event_log needs output_dir")
+        sim.event_log = EventLogWriter(os.path.join(output_dir, 'events.kmclog'))
+        checkpoint()  # Base state for replaying the logged deltas
+
+    start_time = time.time()
+    start_step = sim.step_count  # A resumed run only times the steps of this session
+    try:
+        _run_loop(sim, config, recorder, progress, checkpoint)
+    finally:
+        if sim.event_log is not None:
+            sim.event_log.close()
+            sim.event_log = None
+
+    # A run stopped by max_coverage ends between sampling points; always keep its final state
+    if recorder.last('step') != sim.step_count:
+        recorder.record(sim, force=True)
+    if checkpointing:
+        checkpoint()
+    summary = summarize(sim, config, time.time() - start_time, start_step)
+    if output_dir:
+        series = recorder.columns()
+        write_results(output_dir, sim, summary, series)
+        if config['plots']:
+            write_plots(output_dir, sim, series)
+    return summary
+
+def _run_loop(sim: CrystalGrowthSimulation, config: Dict, recorder: TimeSeriesRecorder,
+              progress: Optional[Callable[[str], None]], checkpoint: Callable[[], None]):
+    """Step until num_steps or max_coverage, sampling, reporting and checkpointing."""
+    periods = [config['update_interval'], config['report_every'] if progress else 0, config['checkpoint_every']]
+    while sim.step_count < config['num_steps'] and sim.coverage < config['max_coverage']:
+        # Run straight to the next step that needs sampling, reporting or a checkpoint
+        target = min([config['num_steps']] + [(sim.step_count // n + 1) * n for n in periods if n])
+        sim.run_steps(target - sim.step_count, config['max_coverage'])
+
+        if sim.step_count % config['update_interval'] == 0:
+            recorder.record(sim)
+
+        if progress and config['report_every'] and sim.step_count % config['report_every'] == 0:
+            progress(f"Step {sim.step_count:,}/{config['num_steps']:,} | "
+                     f"Coverage: {sim.coverage:5.1%} | "
+                     f"Nucleation: {sim.nucleation_count}")
+
+        if config['checkpoint_every'] and sim.step_count % config['checkpoint_every'] == 0:
+            checkpoint()
+
+def summarize(sim: CrystalGrowthSimulation, config: Dict, real_time: float, start_step: int = 0) -> Dict:
+    """Collect the final scalars of a run into a JSON-serializable record.
+
+    real_time covers the steps after start_step (those of this session), so
+    steps_per_second is the rate of this session, also after a resume.
+    """
+    cluster_stats = sim.cluster_analyzer.get_cluster_statistics()
+    session_steps = sim.step_count - start_step
+    return {
+        'config': config,
+        'steps': sim.step_count,
+        'session_steps': session_steps,
+        'simulated_time': sim.time,
+        'real_time': real_time,
+        'steps_per_second': session_steps / real_time if real_time > 0 else 0.0,
+        'coverage': sim.coverage,
+        'final_temperature': sim.temperature,
+        'aspect_ratio': float(sim.calculate_aspect_ratio()),
+        'nucleation_count': sim.nucleation_count,
+        'mobile_atoms': sim.mobile_count,
+        'event_counts': dict(sim.event_counts),
+        'null_counts': dict(sim.null_counts),
+        'null_event_fractions': sim.null_event_fractions(),
+        'total_clusters': cluster_stats['total_clusters'],
+        'critical_clusters': len(cluster_stats['critical_clusters']),
+        'largest_cluster': cluster_stats['largest_size'],
+        'metrics': sim.metrics
+    }
+
+def write_results(output_dir: str, sim: CrystalGrowthSimulation, summary: Dict, series: Dict):
+    """Write summary.json and the final lattice plus time series as compressed npz."""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+    np.savez_compressed(
+        os.path.join(output_dir, 'results.npz'),
+        lattice=sim.lattice,
+        **series
+    )
+
+def write_plots(output_dir: str, sim: CrystalGrowthSimulation, series: Dict):
+    """Render the final state and growth curves without a display."""
+    import matplotlib
+    matplotlib.use('Agg')
+    from visualization import CrystalVisualizer
+    from graph import GraphVisualizer
+
+    visualizer = CrystalVisualizer()
+    visualizer.visualize_crystal(sim.lattice, cluster_map=sim.cluster_analyzer.cluster_labels)
+    visualizer.save_visualization(os.path.join(output_dir, 'final_state.png'))
+
+    graph_visualizer = GraphVisualizer()
+    try:
+        graph_visualizer.create_growth_plot(
+            time_data=series['time_points'],
+            coverage_data=series['coverage'],
+            aspect_ratios=series['aspect_ratios']
+        )
+        graph_visualizer.save_plot(os.path.join(output_dir, 'growth_kinetics.pdf'))
+    finally:
+        graph_visualizer.close()
+
+def positive_int(value: str) -> int:
+    """argparse type for counts that must be at least 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a crystal growth KMC simulation without a GUI.")
+    parser.add_argument('--size', type=int, default=DEFAULT_CONFIG['lattice_size'], help="Lattice edge length")
+    parser.add_argument('--shape', type=int, nargs=3, metavar=('LX', 'LY', 'LZ'),
+                        help="Non-cubic lattice extents (overrides --size)")
+    parser.add_argument('--grow-z', action='store_true',
+                        help="Allocate z layers on demand as the film thickens, up to LZ")
+    parser.add_argument('--temperature', type=float, default=DEFAULT_CONFIG['temperature'], help="Temperature (K)")
+    parser.add_argument('--ramp', type=float, nargs=2, metavar=('T_END', 'DURATION'),
+                        help="Ramp linearly from --temperature to T_END over DURATION of simulated time")
+    parser.add_argument('--anneal', type=float, nargs=4, metavar=('PEAK', 'START', 'RAMP', 'HOLD'),
+                        help="Heat from --temperature to PEAK at START, hold for HOLD, cool back")
+    parser.add_argument('--schedule-resolution', type=float, default=5.0,
+                        help="Temperature step (K) used to discretise ramps")
+    parser.add_argument('--steps', type=int, default=DEFAULT_CONFIG['num_steps'], help="Maximum number of KMC steps")
+    parser.add_argument('--max-coverage', type=float, default=DEFAULT_CONFIG['max_coverage'],
+                        help="Stop once this fraction of sites is occupied")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_CONFIG['engine'], help="Event selection engine")
+    parser.add_argument('--kernel', choices=KERNELS, default=DEFAULT_CONFIG['kernel'],
+                        help="Grouped-engine step kernel: compiled numba batches or pure Python")
+    parser.add_argument('--diffusion', type=float, nargs=3, metavar=('X', 'Y', 'Z'),
+                        help="Override the x/y/z diffusion barriers (eV)")
+    parser.add_argument('--critical-size', type=int, help="Minimum cluster size for nucleation")
+    parser.add_argument('--seed', type=int, help="Random seed (default: fresh OS entropy, recorded in summary.json)")
+    parser.add_argument('--update-interval', type=positive_int, default=DEFAULT_CONFIG['update_interval'],
+                        help="Steps between time-series samples")
+    parser.add_argument('--samples-per-decade', type=float,
+                        help="Keep only this many time-series samples per decade of simulated time")
+    parser.add_argument('--spill-series', action='store_true',
+                        help="Write time-series chunks under <output>/series/ instead of keeping them in memory")
+    parser.add_argument('--report-every', type=int, default=DEFAULT_CONFIG['report_every'],
+                        help="Steps between progress lines (0 to disable)")
+    parser.add_argument('--checkpoint-every', type=int, default=0,
+                        help="Save a checkpoint every N steps (0 to disable)")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>/checkpoint.npz)")
+    parser.add_argument('--resume', help="Continue from this checkpoint file")
+    parser.add_argument('--event-log', action='store_true',
+                        help="Stream every event to <output>/events.kmclog for replay")
+    parser.add_argument('--output', help="Directory for summary.json and results.npz")
+    parser.add_argument('--profile', action='store_true', help="Record per-phase step timings in the summary")
+    parser.add_argument('--plots', action='store_true', help="Also render final_state.png and growth plots")
+    return parser
+
+def config_from_args(args: argparse.Namespace) -> Dict:
+    """Map parsed command-line arguments onto a runner config."""
+    return {
+        'lattice_size': list(args.shape) if args.shape else args.size,
+        'grow_z': args.grow_z,
+        'temperature': args.temperature,
+        'temperature_schedule': schedule_from_args(args),
+        'num_steps': args.steps,
+        'max_coverage': args.max_coverage,
+        'engine': args.engine,
+        'kernel': args.kernel,
+        'diffusion': dict(zip('xyz', args.diffusion)) if args.diffusion else None,
+        'critical_size': args.critical_size,
+        'seed': args.seed,
+        'update_interval': args.update_interval,
+        'samples_per_decade': args.samples_per_decade,
+        'spill_series': args.spill_series,
+        'report_every': args.report_every,
+        'checkpoint_every': args.checkpoint_every,
+        'checkpoint_path': args.checkpoint,
+        'event_log': args.event_log,
+        'profile': args.profile,
+        'plots': args.plots
+    }
+
+def schedule_from_args(args: argparse.Namespace) -> Optional[Dict]:
+    """Temperature schedule config for --ramp or --anneal, None for a fixed temperature."""
+    if args.ramp and args.anneal:
+        raise SystemExit("--ramp and --anneal are mutually exclusive")
+    if args.ramp:
+        end_temperature, duration = args.ramp
+        schedule = TemperatureSchedule.ramp(args.temperature, end_temperature, duration,
+                                            resolution=args.schedule_resolution)
+    elif args.anneal:
+        peak, start, ramp, hold = args.anneal
+        schedule = TemperatureSchedule.anneal(args.temperature, peak, start, ramp, hold,
+                                              resolution=args.schedule_resolution)
+    else:
+        return None
+    return schedule.to_config()
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    summary = run_simulation(config_from_args(args), output_dir=args.output, resume_from=args.resume)
+
+    print(f"Steps completed: {summary['session_steps']:,} in {summary['real_time']:.2f} s "
+          f"({summary['steps_per_second']:,.0f} steps/s), {summary['steps']:,} in total")
+    print(f"Final coverage: {summary['coverage']:.1%} | "
+          f"Nucleation events: {summary['nucleation_count']} | "
+          f"Aspect ratio: {summary['aspect_ratio']:.2f}")
+    print(f"Null events: {summary['null_event_fractions']['total']:.1%} of steps ({summary['config']['engine']} engine)")
+    if summary['metrics']:
+        profiled = sum(m['seconds'] for m in summary['metrics'].values())
+        print("Step phases: " + ", ".join(
+            f"{phase} {m['seconds'] / profiled:.0%}"
+            for phase, m in sorted(summary['metrics'].items(), key=lambda item: -item[1]['seconds'])))
+    if args.output:
+        print(f"Results written to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+"""Programmable temperature schedules for CrystalGrowthSimulation.
+
+A schedule is a piecewise-linear temperature profile over simulated time,
+given as (time, temperature) knots and held constant after the last knot.
+Sloped segments are discretised into constant levels no more than
+`resolution` kelvin apart, so the simulation only has to switch its cached
+rate tables at a finite set of change points:
+
+    schedule = TemperatureSchedule.ramp(700, 900, duration=5e-3)
+    schedule = TemperatureSchedule.anneal(700, 950, start=1e-3, ramp=5e-4, hold=2e-3)
+    sim = CrystalGrowthSimulation(30, 700, temperature_schedule=schedule)
+
+Temperature changes are applied between KMC steps, at the first step that
+reaches a change point.
+"""
+import bisect
+import math
+from typing import Dict, List, Sequence, Tuple
+
+class TemperatureSchedule:
+    """Temperature as a piecewise-constant function of simulated time."""
+    def __init__(self, points: Sequence[Tuple[float, float]], resolution: float = 5.0):
+        if not points:
+            raise ValueError("A temperature schedule needs at least one (time, temperature) point")
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        self.points = [(float(t), float(T)) for t, T in points]
+        if any(t1 < t0 for (t0, _), (t1, _) in zip(self.points, self.points[1:])):
+            raise ValueError("Schedule times must be non-decreasing")
+        self.resolution = resolution
+
+        # Level i holds temperatures[i] from change_times[i] until change_times[i + 1]
+        self.change_times: List[float] = [-math.inf]
+        self.temperatures: List[float] = [self.points[0][1]]
+        for (t0, T0), (t1, T1) in zip(self.points, self.points[1:]):
+            levels = max(1, math.ceil(abs(T1 - T0) / resolution)) if t1 > t0 else 0
+            for i in range(levels):
+                # Each level takes the profile value at the middle of its interval
+                self._add_level(t0 + (t1 - t0) * i / levels, T0 + (T1 - T0) * (i + 0.5) / levels)
+        self._add_level(self.points[-1][0], self.points[-1][1])
+
+    def _add_level(self, time: float, temperature: float):
+        if temperature == self.temperatures[-1]:
+            return
+        if time == self.change_times[-1]:
+            self.temperatures[-1] = temperature
+        else:
+            self.change_times.append(time)
+            self.temperatures.append(temperature)
+
+    @classmethod
+    def constant(cls, temperature: float) -> 'TemperatureSchedule':
+        return cls([(0.0, temperature)])
+
+    @classmethod
+    def ramp(cls, start_temperature: float, end_temperature: float, duration: float,
+             start: float = 0.0, resolution: float = 5.0) -> 'TemperatureSchedule':
+        """Linear ramp from start to end temperature, then hold."""
+        return cls([(start, start_temperature), (start + duration, end_temperature)], resolution)
+
+    @classmethod
+    def anneal(cls, base_temperature: float, anneal_temperature: float, start: float,
+               ramp: float, hold: float, resolution: float = 5.0) -> 'TemperatureSchedule':
+        """Heat to the anneal temperature, hold it, and cool back to the base temperature."""
+        return cls([
+            (start, base_temperature),
+            (start + ramp, anneal_temperature),
+            (start + ramp + hold, anneal_temperature),
+            (start + 2 * ramp + hold, base_temperature)
+        ], resolution)
+
+    def temperature_at(self, time: float) -> float:
+        """Temperature in effect at a simulated time."""
+        return self.temperatures[bisect.bisect_right(self.change_times, time) - 1]
+
+    def next_change(self, time: float) -> float:
+        """First change point after time (inf when the temperature stays fixed)."""
+        i = bisect.bisect_right(self.change_times, time)
+        return self.change_times[i] if i < len(self.change_times) else math.inf
+
+    def to_config(self) -> Dict:
+        """JSON-serializable form, accepted by from_config."""
+        return {'points': [list(p) for p in self.points], 'resolution': self.resolution}
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'TemperatureSchedule':
+        return cls(config['points'], config.get('resolution', 5.0))
@@ -0,0 +1,59 @@
+import numpy as np
+
+class SumTree:
+    """Binary sum tree over per-site rates.
+
+    Leaves hold individual rates and every internal node holds the sum of its
+    two children, so updating a rate and drawing an index proportionally to
+    its rate are both O(log N). Internal nodes are always recomputed from
+    their children, which keeps the tree free of accumulated rounding drift.
+    """
+    def __init__(self, num_leaves: int):
+        self.num_leaves = num_leaves
+        self.capacity = 1
+        while self.capacity < max(num_leaves, 1):
+            self.capacity *= 2
+        self.tree = np.zeros(2 * self.capacity, dtype=np.float64)
+
+    @property
+    def total(self) -> float:
+        """Sum of all leaf rates."""
+        return float(self.tree[1])
+
+    def build(self, weights: np.ndarray):
+        """Load all leaf rates at once and rebuild the internal nodes."""
+        cap = self.capacity
+        self.tree.fill(0.0)
+        self.tree[cap:cap + self.num_leaves] = weights
+        lo = cap // 2
+        while lo >= 1:
+            self.tree[lo:2*lo] = self.tree[2*lo:4*lo:2] + self.tree[2*lo+1:4*lo:2]
+            lo //= 2
+
+    def get(self, index: int) -> float:
+        """Rate stored at a leaf."""
+        return float(self.tree[self.capacity + index])
+
+    def update(self, index: int, weight: float):
+        """Set a leaf rate and propagate the change to the root."""
+        tree = self.tree
+        node = self.capacity + index
+        tree[node] = weight
+        node >>= 1
+        while node:
+            tree[node] = tree[2*node] + tree[2*node + 1]
+            node >>= 1
+
+    def find(self, value: float) -> int:
+        """Return the leaf whose cumulative rate interval contains value."""
+        tree = self.tree
+        node = 1
+        while node < self.capacity:
+            left = tree[2*node]
+            # Rounding can push value past the last non-empty child; never descend into a zero subtree
+            if value < left or tree[2*node + 1] <= 0.0:
+                node = 2*node
+            else:
+                value -= left
+                node = 2*node + 1
+        return node - self.capacity
@@ -0,0 +1,159 @@
+import random
+import numpy as np
+
+class IndexedSiteSet:
+    """Set of flat lattice indices with O(1) add, remove, membership and random pick.
+
+    Members are packed densely in an items array and a slot array maps every
+    lattice index to its position in items (-1 when absent). Removal swaps the
+    last member into the freed slot, so no per-site Python objects are kept.
+    """
+    def __init__(self, num_sites: int):
+        self.num_sites = num_sites
+        index_dtype = np.int32 if num_sites < 2**31 else np.int64
+        self._items = np.empty(64, dtype=index_dtype)
+        self._slots = np.full(num_sites, -1, dtype=index_dtype)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, index: int) -> bool:
+        return self._slots[index] >= 0
+
+    def __iter__(self):
+        return iter(self.items().tolist())
+
+    def items(self) -> np.ndarray:
+        """Current members as an array (a copy, in internal order)."""
+        return self._items[:self._size].copy()
+
+    def add(self, index: int):
+        """Add a site index; no-op if already present."""
+        if self._slots[index] >= 0:
+            return
+        if self._size == len(self._items):
+            self._items = np.resize(self._items, 2 * len(self._items))
+        self._items[self._size] = index
+        self._slots[index] = self._size
+        self._size += 1
+
+    def discard(self, index: int):
+        """Remove a site index if present."""
+        slot = self._slots[index]
+        if slot < 0:
+            return
+        self._size -= 1
+        last = self._items[self._size]
+        self._items[slot] = last
+        self._slots[last] = slot
+        self._slots[index] = -1
+
+    def update(self, indices: np.ndarray):
+        """Add many site indices at once."""
+        indices = np.asarray(indices, dtype=self._items.dtype)
+        indices = indices[self._slots[indices] < 0]
+        if not len(indices):
+            return
+        needed = self._size + len(indices)
+        if needed > len(self._items):
+            self._items = np.resize(self._items, max(needed, 2 * len(self._items)))
+        self._items[self._size:needed] = indices
+        self._slots[indices] = np.arange(self._size, needed, dtype=self._items.dtype)
+        self._size = needed
+
+    def reserve(self, extra: int):
+        """Make room for extra more members without reallocating (up to num_sites)."""
+        needed = min(self.num_sites, self._size + extra)
+        if needed > len(self._items):
+            self._items = np.resize(self._items, needed)
+
+    def set_items(self, indices: np.ndarray):
+        """Replace the members, keeping the given order (used to restore a saved set)."""
+        self.clear()
+        self.update(indices)
+
+    def clear(self):
+        """Remove all members."""
+        self._slots[self._items[:self._size]] = -1
+        self._size = 0
+
+    def item(self, position: int) -> int:
+        """Member at a position of the internal order, 0 <= position < len(self)."""
+        if not 0 <= position < self._size:
+            raise IndexError(f"position {position} out of range for {self._size} members")
+        return int(self._items[position])
+
+    def choice(self, rng=random) -> int:
+        """Uniformly random member, drawn with rng.random()."""
+        if not self._size:
+            raise IndexError("choice from an empty IndexedSiteSet")
+        return int(self._items[int(rng.random() * self._size)])
+
+class SiteBitmap:
+    """Set of lattice sites stored as a boolean occupancy map over flat indices.
+
+    Membership, add and remove are single array accesses and the member
+    count is kept alongside, so len() never scans. Sites may be given as
+    (x, y, z) tuples or flat indices; iteration yields tuples.
+    """
+    def __init__(self, shape: tuple):
+        self.shape = tuple(shape)
+        self._mask = np.zeros(self.shape, dtype=bool)
+        self._flat = self._mask.reshape(-1)  # view for flat-index access
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, site) -> bool:
+        return bool(self._site_view(site)[site])
+
+    def __iter__(self):
+        return iter(map(tuple, np.argwhere(self._mask).tolist()))
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Read-only boolean map of the members, in lattice shape."""
+        view = self._mask.view()
+        view.flags.writeable = False
+        return view
+
+    def indices(self) -> np.ndarray:
+        """Flat indices of the members, in ascending order."""
+        return np.flatnonzero(self._flat)
+
+    def add(self, site):
+        """Add a site; no-op if already present."""
+        view = self._site_view(site)
+        if not view[site]:
+            view[site] = True
+            self._size += 1
+
+    def discard(self, site):
+        """Remove a site if present."""
+        view = self._site_view(site)
+        if view[site]:
+            view[site] = False
+            self._size -= 1
+
+    def remove(self, site):
+        """Remove a site, raising KeyError if absent."""
+        view = self._site_view(site)
+        if not view[site]:
+            raise KeyError(site)
+        view[site] = False
+        self._size -= 1
+
+    def set_mask(self, mask: np.ndarray):
+        """Replace the members with the True entries of a lattice-shaped mask."""
+        self._mask[...] = mask
+        self._size = int(np.count_nonzero(self._flat))
+
+    def clear(self):
+        """Remove all members."""
+        self._mask[...] = False
+        self._size = 0
+
+    def _site_view(self, site) -> np.ndarray:
+        return self._mask if isinstance(site, tuple) else self._flat
@@ -0,0 +1,206 @@
+"""Parameter sweeps over independent CrystalGrowthSimulation runs.
+
+Expands a grid of parameter values into one runner config per point and
+executes them across a process pool (all cores by default):
+
+    python sweep.py --temperature 700 800 900 --size 20 30 --diffusion-x 0.6 0.75 \
+        --critical-size 4 6 --steps 5000 --output sweeps/regimes
+
+With ``--replicas N`` each point is run N times. Replica seeds are
+independent child streams spawned from ``--seed``, so the whole ensemble
+can be re-run bit-for-bit from that one number.
+
+Every run writes its own record to <output>/<point>/summary.json (plus
+results.npz), and the sweep ends with a summary table of coverage,
+nucleation count and aspect ratio per point, also saved as
+sweep_summary.json and sweep_summary.csv. A run that raises does not stop
+the sweep: it is reported as a failed record (label, parameters and error)
+in sweep_summary.json, and the remaining runs carry on.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+from kmc import ENGINES
+from runner import DEFAULT_CONFIG, run_simulation
+from rng import spawn_seeds
+
+# Sweepable parameters and how they map onto the runner config
+SWEEP_PARAMETERS = ('temperature', 'lattice_size', 'diffusion_x', 'diffusion_y', 'diffusion_z', 'critical_size')
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """Cartesian product of the grid values, one dict of parameters per point."""
+    unknown = set(grid) - set(SWEEP_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = [name for name in SWEEP_PARAMETERS if grid.get(name)]
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+def point_config(point: Dict, base_config: Dict) -> Dict:
+    """Runner config for one grid point."""
+    config = {**DEFAULT_CONFIG, **base_config}
+    diffusion = dict(config.get('diffusion') or {})
+    for name, value in point.items():
+        if name.startswith('diffusion_'):
+            diffusion[name.split('_')[1]] = value
+        else:
+            config[name] = value
+    config['diffusion'] = diffusion or None
+    return config
+
+def point_label(point: Dict) -> str:
+    """Short directory-safe name for a grid point, e.g. 'temperature=800_lattice_size=30'."""
+    return '_'.join(f"{name}={value}" for name, value in point.items()) or 'default'
+
+def run_label(point: Dict, replica: int, replicas: int) -> str:
+    """Label of one run: the point label, suffixed with the replica when there are several."""
+    label = point_label(point)
+    return f"{label}_rep{replica}" if replicas > 1 else label
+
+def _run_point(index: int, total: int, point: Dict, replica: int, seed: Dict,
+               base_config: Dict, output_dir: Optional[str], replicas: int) -> Dict:
+    """Worker entry point: run one grid point replica and return its result record."""
+    label = run_label(point, replica, replicas)
+    prefix = f"[{index + 1}/{total} {label}]"
+    run_dir = os.path.join(output_dir, label) if output_dir else None
+
+    summary = run_simulation(
+        {**point_config(point, base_config), 'seed': seed},
+        output_dir=run_dir,
+        progress=lambda message: print(f"{prefix} {message}", flush=True)
+    )
+    return {'index': index, 'point': point, 'replica': replica, 'label': label, **summary}
+
+def run_sweep(grid: Dict[str, List], base_config: Optional[Dict] = None,
+              output_dir: Optional[str] = None, workers: Optional[int] = None,
+              replicas: int = 1, seed: Optional[int] = None) -> List[Dict]:
+    """Run every grid point (times replicas) in a process pool; records come back in grid order.
+
+    A run that raises yields a record with an 'error' message instead of results.
+    """
+    base_config = base_config or {}
+    runs = [(point, r) for point in expand_grid(grid) for r in range(replicas)]
+    seeds = spawn_seeds(seed, len(runs))
+    workers = workers or os.cpu_count() or 1
+    print(f"Sweeping {len(runs)} runs on {workers} worker processes")
+
+    records = []
+    start_time = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_point, i, len(runs), point, replica, seeds[i],
+                        base_config, output_dir, replicas): i
+            for i, (point, replica) in enumerate(runs)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            point, replica = runs[index]
+            try:
+                record = future.result()
+            except Exception as exc:
+                record = {'index': index, 'point': point, 'replica': replica,
+                          'label': run_label(point, replica, replicas), 'error': f"{type(exc).__name__}: {exc}"}
+                print(f"Failed {done}/{len(runs)}: {record['label']} ({record['error']})", flush=True)
+            else:
+                print(f"Completed {done}/{len(runs)}: {record['label']} "
+                      f"({record['real_time']:.1f} s)", flush=True)
+            records.append(record)
+
+    records.sort(key=lambda r: r['index'])
+    failed = [record for record in records if 'error' in record]
+    print(f"Sweep finished in {time.time() - start_time:.1f} s"
+          + (f", {len(failed)} of {len(records)} runs failed" if failed else ""))
+    if output_dir:
+        write_summary(output_dir, records)
+    print(format_summary_table(records))
+    return records
+
+def summary_rows(records: List[Dict]) -> List[Dict]:
+    """One flat row per completed run: the swept parameters followed by the key results."""
+    return [
+        {
+            **record['point'],
+            'replica': record['replica'],
+            'coverage': record['coverage'],
+            'nucleation_count': record['nucleation_count'],
+            'aspect_ratio': record['aspect_ratio'],
+            'steps': record['steps'],
+            'simulated_time': record['simulated_time']
+        }
+        for record in records if 'error' not in record
+    ]
+
+def format_summary_table(records: List[Dict]) -> str:
+    """Fixed-width table of the sweep results."""
+    rows = summary_rows(records)
+    if not rows:
+        return "No sweep results"
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(_format_cell(r[c])) for r in rows)) for c in columns}
+    lines = [
+        "  ".join(c.rjust(widths[c]) for c in columns),
+        "  ".join('-' * widths[c] for c in columns)
+    ]
+    for row in rows:
+        lines.append("  ".join(_format_cell(row[c]).rjust(widths[c]) for c in columns))
+    return "\n".join(lines)
+
+def _format_cell(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+def write_summary(output_dir: str, records: List[Dict]):
+    """Write all records (failed runs included) as JSON and the summary table as CSV."""
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'sweep_summary.json'), 'w') as f:
+        json.dump(records, f, indent=2)
+    rows = summary_rows(records)
+    if rows:
+        with open(os.path.join(output_dir, 'sweep_summary.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Sweep crystal growth KMC parameters across a process pool.")
+    parser.add_argument('--temperature', type=float, nargs='+', help="Temperatures (K)")
+    parser.add_argument('--size', dest='lattice_size', type=int, nargs='+', help="Lattice edge lengths")
+    parser.add_argument('--diffusion-x', type=float, nargs='+', help="X-direction barriers (eV)")
+    parser.add_argument('--diffusion-y', type=float, nargs='+', help="Y-direction barriers (eV)")
+    parser.add_argument('--diffusion-z', type=float, nargs='+', help="Z-direction barriers (eV)")
+    parser.add_argument('--critical-size', type=int, nargs='+', help="Critical cluster sizes")
+    parser.add_argument('--steps', type=int, default=DEFAULT_CONFIG['num_steps'], help="Maximum KMC steps per run")
+    parser.add_argument('--max-coverage', type=float, default=DEFAULT_CONFIG['max_coverage'],
+                        help="Stop each run once this fraction of sites is occupied")
+    parser.add_argument('--engine', choices=ENGINES, default=DEFAULT_CONFIG['engine'], help="Event selection engine")
+    parser.add_argument('--grow-z', action='store_true', help="Allocate z layers on demand as films thicken")
+    parser.add_argument('--report-every', type=int, default=DEFAULT_CONFIG['report_every'],
+                        help="Steps between progress lines per run (0 to disable)")
+    parser.add_argument('--replicas', type=int, default=1, help="Independent replicas per parameter point")
+    parser.add_argument('--seed', type=int, help="Parent seed for all replica streams")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--output', help="Directory for per-point records and the sweep summary")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    grid = {name: getattr(args, name) for name in SWEEP_PARAMETERS}
+    base_config = {
+        'num_steps': args.steps,
+        'max_coverage': args.max_coverage,
+        'engine': args.engine,
+        'grow_z': args.grow_z,
+        'report_every': args.report_every
+    }
+    records = run_sweep(grid, base_config, output_dir=args.output, workers=args.workers,
+                        replicas=args.replicas, seed=args.seed)
+    return 1 if any('error' in record for record in records) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
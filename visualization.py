@@ -1,17 +1,274 @@
 import numpy as np
 import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap
+from matplotlib.colors import ListedColormap, LightSource
 from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+from typing import Dict, Optional, Tuple
 from constants import VISUALIZATION, STATES
 
-class CrystalVisualizer:
+# 'voxels': ax.voxels over the whole grid every frame; 'surface': cached exposed faces, patched per frame;
+# 'maps': 2D height map, top-down state projection and a z-slice, blitted
+RENDER_MODES = VISUALIZATION['render_modes']
+
+def _face_geometry() -> Tuple[np.ndarray, np.ndarray]:
+    """Unit-cube corner offsets (6, 4, 3) and outward normals (6, 3) of the faces -x, +x, -y, +y, -z, +z."""
+    corners = np.zeros((6, 4, 3))
+    normals = np.zeros((6, 3))
+    for axis in range(3):
+        b, c = [a for a in range(3) if a != axis]
+        for side in (0, 1):
+            face = 2 * axis + side
+            corners[face, :, axis] = side
+            corners[face, :, b] = (0, 1, 1, 0)
+            corners[face, :, c] = (0, 0, 1, 1)
+            normals[face, axis] = 1 if side else -1
+    return corners, normals
+
+FACE_CORNERS, FACE_NORMALS = _face_geometry()
+
+class SurfaceMesh:
+    """Exposed faces of the occupied voxels, kept as dense arrays and patched in place.
+
+    A face is exposed when the neighboring cell across it is empty or lies
+    outside the lattice; the floor below z = 0 counts as filled, so the
+    underside of the substrate is never built. Faces are stored densely
+    (removal swaps the last face into the freed slot) with a dict from face
+    key (flat cell index * 6 + face) to slot, so memory and the cost of a
+    frame follow the surface, and update() only revisits the cells whose
+    occupancy or color changed since the previous frame. When the caller
+    knows which cells may have changed, update_cells() takes just those and
+    never touches the rest of the lattice.
+    """
+    # Beyond this share of changed cells, a vectorized rebuild beats patching
+    REBUILD_FRACTION = 0.05
+
+    def __init__(self, shape: Tuple[int, int, int]):
+        self.shape = tuple(shape)
+        self._strides = (self.shape[1] * self.shape[2], self.shape[2], 1)
+        self._occupied = None
+        self._keys = None
+        self.count = 0
+        self.verts = np.zeros((0, 4, 3))
+        self.faces = np.zeros(0, dtype=np.int8)      # face direction, index into FACE_NORMALS
+        self.colors = np.zeros(0, dtype=np.int16)    # color key of the owning cell
+        self._cells = np.zeros(0, dtype=np.int64)
+        self._slots: Dict[int, int] = {}
+
+    def update(self, occupied: np.ndarray, keys: np.ndarray) -> int:
+        """Bring the mesh in line with an occupancy mask and per-cell color keys.
+
+        Returns the number of cells revisited (the whole lattice on a rebuild).
+        """
+        occupied = occupied.reshape(-1)
+        keys = keys.reshape(-1)
+        if self._occupied is None:
+            self._rebuild(occupied, keys)
+            return occupied.size
+        moved = np.flatnonzero(occupied != self._occupied)
+        recolored = np.flatnonzero(keys != self._keys)
+        if len(moved) + len(recolored) > self.REBUILD_FRACTION * occupied.size:
+            self._rebuild(occupied, keys)
+            return occupied.size
+        self._occupied, self._keys = occupied.copy(), keys.copy()
+        return self._patch(moved, recolored)
+
+    def update_cells(self, cells: np.ndarray, occupied: np.ndarray, keys: np.ndarray) -> int:
+        """Like update(), given only the occupancy and color keys of the listed flat cells.
+
+        Every other cell must be unchanged since the previous update.
+        """
+        if self._occupied is None:
+            raise ValueError("update_cells() needs a mesh built by update() first")
+        moved = cells[occupied != self._occupied[cells]]
+        recolored = cells[keys != self._keys[cells]]
+        self._occupied[cells] = occupied
+        self._keys[cells] = keys
+        if len(moved) + len(recolored) > self.REBUILD_FRACTION * self._occupied.size:
+            self._rebuild(self._occupied, self._keys)
+            return self._occupied.size
+        return self._patch(moved, recolored)
+
+    def _patch(self, moved: np.ndarray, recolored: np.ndarray) -> int:
+        """Refresh the faces around moved cells and the colors of recolored ones."""
+        keys = self._keys
+        cells = set(moved.tolist())
+        for cell in moved.tolist():
+            for face in range(6):
+                neighbor = self._neighbor(cell, face)
+                if neighbor >= 0:
+                    cells.add(neighbor)
+        for cell in cells:
+            self._refresh_cell(cell)
+        for cell in recolored.tolist():
+            if cell not in cells:
+                for face in range(6):
+                    slot = self._slots.get(cell * 6 + face)
+                    if slot is not None:
+                        self.colors[slot] = keys[cell]
+        return len(cells) + len(recolored)
+
+    def _neighbor(self, cell: int, face: int) -> int:
+        """Flat index of the cell across face, -1 outside the lattice (-2 below the floor)."""
+        axis, side = divmod(face, 2)
+        coord = (cell // self._strides[axis]) % self.shape[axis] + (1 if side else -1)
+        if coord < 0:
+            return -2 if axis == 2 else -1
+        if coord >= self.shape[axis]:
+            return -1
+        return cell + (self._strides[axis] if side else -self._strides[axis])
+
+    def _refresh_cell(self, cell: int):
+        for face in range(6):
+            key = cell * 6 + face
+            neighbor = self._neighbor(cell, face)
+            exposed = self._occupied[cell] and neighbor != -2 and (neighbor == -1 or not self._occupied[neighbor])
+            slot = self._slots.get(key)
+            if exposed and slot is None:
+                self._add(cell, face)
+            elif exposed:
+                self.colors[slot] = self._keys[cell]
+            elif slot is not None:
+                self._remove(key, slot)
+
+    def _add(self, cell: int, face: int):
+        if self.count == len(self.verts):
+            capacity = max(64, 2 * self.count)
+            self.verts = np.resize(self.verts, (capacity, 4, 3))
+            self.faces = np.resize(self.faces, capacity)
+            self.colors = np.resize(self.colors, capacity)
+            self._cells = np.resize(self._cells, capacity)
+        slot = self.count
+        self.verts[slot] = np.unravel_index(cell, self.shape) + FACE_CORNERS[face]
+        self.faces[slot] = face
+        self.colors[slot] = self._keys[cell]
+        self._cells[slot] = cell
+        self._slots[cell * 6 + face] = slot
+        self.count += 1
+
+    def _remove(self, key: int, slot: int):
+        self.count -= 1
+        last = self.count
+        del self._slots[key]
+        if slot != last:
+            self.verts[slot] = self.verts[last]
+            self.faces[slot] = self.faces[last]
+            self.colors[slot] = self.colors[last]
+            self._cells[slot] = self._cells[last]
+            self._slots[int(self._cells[slot]) * 6 + int(self.faces[slot])] = slot
+
+    def _rebuild(self, occupied: np.ndarray, keys: np.ndarray):
+        """Build all faces from scratch with whole-array operations."""
+        self._occupied, self._keys = occupied.copy(), keys.copy()
+        grid = occupied.reshape(self.shape)
+        cells, faces = [], []
+        for face in range(6):
+            axis, side = divmod(face, 2)
+            # Occupancy of the neighbor across this face; outside is empty, except the floor
+            beyond = np.zeros_like(grid)
+            inner = [slice(None)] * 3
+            outer = [slice(None)] * 3
+            if side:
+                inner[axis], outer[axis] = slice(0, -1), slice(1, None)
+            else:
+                inner[axis], outer[axis] = slice(1, None), slice(0, -1)
+                if axis == 2:
+                    beyond[:, :, 0] = True
+            beyond[tuple(inner)] = grid[tuple(outer)]
+            exposed = np.flatnonzero(grid & ~beyond)
+            cells.append(exposed)
+            faces.append(np.full(len(exposed), face, dtype=np.int8))
+        self._cells = np.concatenate(cells)
+        self.faces = np.concatenate(faces)
+        self.count = len(self._cells)
+        self.colors = keys[self._cells].astype(np.int16)
+        origins = np.column_stack(np.unravel_index(self._cells, self.shape))
+        self.verts = origins[:, None, :] + FACE_CORNERS[self.faces]
+        self._slots = dict(zip((self._cells * 6 + self.faces).tolist(), range(self.count)))
+
+class ClusterBoxes:
+    """Bounding boxes of labeled clusters by ID, patched from the cells whose label changed.
+
+    A changed cluster is searched for only within its previous box and its
+    changed cells, so keeping the boxes current costs the size of the
+    changed clusters, not of the lattice.
+    """
     def __init__(self):
+        self.labels: Optional[np.ndarray] = None   # copy of the labels the boxes describe
+        self.boxes: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}   # ID -> (low, high), high exclusive
+
+    def rebuild(self, labels: Optional[np.ndarray]):
+        """Boxes of every cluster from a full labels array (None: no clusters)."""
+        from scipy.ndimage import find_objects
+
+        self.labels = None if labels is None else labels.copy()
+        self.boxes = {}
+        if labels is not None:
+            for cluster_id, box in enumerate(find_objects(labels), start=1):
+                if box is not None:
+                    self.boxes[cluster_id] = (np.array([s.start for s in box]), np.array([s.stop for s in box]))
+
+    def update(self, labels: np.ndarray, cells: np.ndarray):
+        """Adopt labels, which differ from the previous ones only at the flat cells."""
+        previous = self.labels.reshape(-1)
+        old, new = previous[cells], labels.reshape(-1)[cells]
+        previous[cells] = new
+        coords = np.column_stack(np.unravel_index(cells, labels.shape))
+        for cluster_id in (set(old.tolist()) | set(new.tolist())) - {0}:
+            joined = coords[new == cluster_id]
+            lows = [joined.min(axis=0)] if len(joined) else []
+            highs = [joined.max(axis=0) + 1] if len(joined) else []
+            if cluster_id in self.boxes:
+                lows.append(self.boxes[cluster_id][0])
+                highs.append(self.boxes[cluster_id][1])
+            low, high = np.min(lows, axis=0), np.max(highs, axis=0)
+            members = np.argwhere(labels[tuple(slice(a, b) for a, b in zip(low, high))] == cluster_id)
+            if len(members):
+                self.boxes[cluster_id] = (low + members.min(axis=0), low + members.max(axis=0) + 1)
+            else:
+                del self.boxes[cluster_id]
+
+    def members(self, cluster_id: int) -> np.ndarray:
+        """Flat indices of the cells of one cluster, found within its box."""
+        if cluster_id not in self.boxes:
+            return np.zeros(0, dtype=np.int64)
+        low, high = self.boxes[cluster_id]
+        local = np.argwhere(self.labels[tuple(slice(a, b) for a, b in zip(low, high))] == cluster_id)
+        return np.ravel_multi_index(tuple((local + low).T), self.labels.shape)
+
+    def faces(self) -> np.ndarray:
+        """Faces (n, 4, 3) of all boxes."""
+        if not self.boxes:
+            return np.zeros((0, 4, 3))
+        low, high = (np.array(v, dtype=float) for v in zip(*self.boxes.values()))
+        # Scale the unit-cube faces to each box
+        return (low[:, None, None, :] + FACE_CORNERS[None] * (high - low)[:, None, None, :]).reshape(-1, 4, 3)
+
+class CrystalVisualizer:
+    def __init__(self, mode: str = 'voxels'):
         """Initialize the visualizer with enhanced settings."""
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Unknown render mode '{mode}', expected one of {RENDER_MODES}")
+        self.mode = mode
         self.cmap = ListedColormap(VISUALIZATION['colors'])
         self.fig = plt.figure(figsize=(12, 9), facecolor='white')
-        self.ax = self.fig.add_subplot(111, projection='3d')
-        plt.tight_layout()
-        self._setup_axes()
+        self._metric_texts = []
+        self._mesh: Optional[SurfaceMesh] = None
+        self._surface = None
+        self._boxes = None
+        self._cluster_boxes = ClusterBoxes()
+        self._critical = set()  # critical cluster IDs of the last surface frame
+        self._face_palette = self._shaded_palette()
+        self._images = None
+        self._maps_shape = None
+        self._frame_keys = None
+        self._background = None
+        self._extra_animated = []
+        self.slice_z = 1  # z-slice shown in 'maps' mode; the first layer above the substrate
+        if mode == 'maps':
+            self._setup_maps()
+        else:
+            self.ax = self.fig.add_subplot(111, projection='3d')
+            plt.tight_layout()
+            self._setup_axes()
 
     def _setup_axes(self):
         """Configure axes with consistent styling."""
@@ -23,14 +280,33 @@ class CrystalVisualizer:
         self.ax.yaxis.pane.set_edgecolor('w')
         self.ax.zaxis.pane.set_edgecolor('w')
 
-    def visualize_crystal(self, lattice, metrics=None, cluster_map=None, view_angle=None):
-        """Render 3D crystal with enhanced visualization features."""
+    def visualize_crystal(self, lattice, metrics=None, cluster_map=None, view_angle=None, changed=None):
+        """Render 3D crystal with enhanced visualization features.
+
+        changed optionally lists the flat indices of the cells whose state or
+        cluster label differ from the previous call; surface mode then
+        patches only those cells instead of comparing the whole lattice.
+        """
+        if self.mode == 'maps':
+            try:
+                self._draw_maps(lattice, metrics, cluster_map)
+            except Exception as e:
+                print(f"Visualization error: {str(e)}")
+            return
+        if self.mode == 'surface':
+            try:
+                self._draw_surface(lattice, metrics, cluster_map, view_angle, changed)
+                plt.draw()
+                plt.pause(0.001)
+            except Exception as e:
+                self._mesh = None  # The caches may be half patched; rebuild them on the next frame
+                print(f"Visualization error: {str(e)}")
+            return
         try:
             self.ax.clear()
-            size = lattice.shape[0]
-            
+            self._metric_texts = []
             # Prepare grid with proper scaling
-            x, y, z = np.indices((size+1, size+1, size+1))
+            x, y, z = np.indices(tuple(n + 1 for n in lattice.shape))
             colors = np.empty(lattice.shape + (4,))
             
             # Apply state colors with better contrast
@@ -52,7 +328,7 @@ class CrystalVisualizer:
                 self._draw_cluster_boxes(cluster_map)
             
             # Configure view and labels
-            self._configure_view(size, view_angle)
+            self._configure_view(lattice.shape, view_angle)
             
             # Add metrics with better layout
             if metrics:
@@ -64,6 +340,191 @@ class CrystalVisualizer:
         except Exception as e:
             print(f"Visualization error: {str(e)}")
 
+    def _key_colors(self) -> np.ndarray:
+        """RGBA per color key: the state colors, then the critical-cluster color."""
+        colors = [np.array(self.cmap(state)) for state in range(len(VISUALIZATION['colors']))]
+        critical = np.array(self.cmap(STATES['NUCLEATION']))
+        critical[:3] = np.clip(critical[:3] * 1.3, 0, 1)
+        colors.append(critical)
+        return np.array(colors)
+
+    def _shaded_palette(self) -> np.ndarray:
+        """RGBA per (color key, face direction), see _key_colors."""
+        base = self._key_colors()
+        base[:, 3] = VISUALIZATION['voxel_alpha']
+        # Fixed light, as ax.voxels(shade=True) uses, so each face direction gets one brightness
+        shade = FACE_NORMALS @ LightSource(azdeg=225, altdeg=19.4712).direction
+        factors = 0.65 + 0.35 * shade
+        palette = np.repeat(base[:, None, :], 6, axis=1)
+        palette[:, :, :3] *= factors[None, :, None]
+        return palette
+
+    def _color_keys(self, lattice, cluster_map, metrics) -> np.ndarray:
+        """Color key per cell: its state, overridden by cluster and critical-cluster highlighting."""
+        if cluster_map is not None and cluster_map.shape != lattice.shape:
+            cluster_map = None
+        return self._cell_keys(lattice, cluster_map, self._critical_ids(metrics))
+
+    @staticmethod
+    def _critical_ids(metrics) -> set:
+        return {c['id'] for c in (metrics or {}).get('cluster_stats', {}).get('critical_clusters', [])}
+
+    @staticmethod
+    def _cell_keys(states, labels, critical: set) -> np.ndarray:
+        """Color keys of cells from their states and cluster labels (labels may be None)."""
+        keys = states.astype(np.int16)
+        if labels is not None:
+            keys[labels > 0] = STATES['CLUSTER']
+            if critical:
+                keys[np.isin(labels, list(critical))] = len(VISUALIZATION['colors'])
+        return keys
+
+    def _draw_surface(self, lattice, metrics, cluster_map, view_angle, changed=None):
+        """Surface mode: patch the cached face mesh and update the artists in place."""
+        if self._mesh is None or self._mesh.shape != lattice.shape:
+            self.ax.clear()
+            self._setup_axes()
+            self._metric_texts = []
+            self._mesh = SurfaceMesh(lattice.shape)
+            self._surface = Poly3DCollection(np.zeros((0, 4, 3)), edgecolor='k', linewidths=0.15)
+            self._boxes = Poly3DCollection(np.zeros((0, 4, 3)), facecolors=(0.7, 0.2, 0.7, 0.05),
+                                           edgecolors='purple', linewidths=1.5, linestyles=':')
+            self.ax.add_collection3d(self._surface)
+            self.ax.add_collection3d(self._boxes)
+            self._configure_view(lattice.shape, view_angle)
+            changed = None  # A new mesh is built from the whole lattice
+
+        mesh, boxes = self._mesh, self._cluster_boxes
+        labels = cluster_map if cluster_map is not None and cluster_map.shape == lattice.shape else None
+        critical = self._critical_ids(metrics) if labels is not None else set()
+        if changed is None or (labels is None) != (boxes.labels is None):
+            mesh.update(lattice != STATES['EMPTY'], self._cell_keys(lattice, labels, critical))
+            boxes.rebuild(labels)
+        else:
+            cells = np.asarray(changed, dtype=np.int64)
+            if labels is not None:
+                boxes.update(labels, cells)
+                # Clusters that became critical or stopped being so change color without changing label
+                cells = np.unique(np.concatenate(
+                    [cells, *(boxes.members(cid) for cid in critical ^ self._critical)]))
+                labels = labels.reshape(-1)[cells]
+            states = lattice.reshape(-1)[cells]
+            mesh.update_cells(cells, states != STATES['EMPTY'], self._cell_keys(states, labels, critical))
+        self._critical = critical
+        self._surface.set_verts(mesh.verts[:mesh.count])
+        self._surface.set_facecolor(self._face_palette[mesh.colors[:mesh.count], mesh.faces[:mesh.count]])
+        self._boxes.set_verts(boxes.faces())
+        self.ax.view_init(*(view_angle or VISUALIZATION['view_angle']))
+
+        for text in self._metric_texts:
+            text.remove()
+        self._metric_texts = []
+        if metrics:
+            self._add_enhanced_metrics(metrics)
+
+    def _setup_maps(self):
+        """Maps mode: a metrics strip over three image panels; images are made on the first frame."""
+        self.ax = self.fig.add_axes([0.04, 0.76, 0.92, 0.14])  # Carries the metrics overlay
+        self.ax.axis('off')
+        self.ax.title.set_animated(True)
+        grid = self.fig.add_gridspec(1, 3, left=0.05, right=0.97, bottom=0.24, top=0.70, wspace=0.5)
+        self._map_axes = [self.fig.add_subplot(grid[0, i]) for i in range(3)]
+        for ax, title in zip(self._map_axes, ("Height map", "Top-down state", "")):
+            ax.set(title=title, xlabel='X (nm)', ylabel='Y (nm)')
+        self._map_axes[2].title.set_animated(True)
+        self._key_cmap = ListedColormap(self._key_colors())
+        self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+        self.fig.canvas.mpl_connect('key_press_event', self._on_key)
+
+    def _draw_maps(self, lattice, metrics, cluster_map):
+        """Maps mode: reduce the lattice to 2D images and blit them with the metrics overlay."""
+        size_x, size_y, size_z = lattice.shape
+        if self._maps_shape != lattice.shape:
+            extent = (0, size_x, 0, size_y)
+            if self._images is None:
+                blank = np.zeros((size_y, size_x))
+                keys = dict(cmap=self._key_cmap, vmin=-0.5, vmax=len(self._key_cmap.colors) - 0.5)
+                self._images = [
+                    ax.imshow(blank, origin='lower', interpolation='nearest', animated=True, **options)
+                    for ax, options in zip(self._map_axes, (dict(cmap='viridis'), keys, keys))
+                ]
+                self.fig.colorbar(self._images[0], ax=self._map_axes[0], fraction=0.046, pad=0.04,
+                                  label='Height (layers)')
+            for image in self._images:
+                image.set_extent(extent)
+            self._images[0].set_clim(0, size_z)
+            self._maps_shape = lattice.shape
+            self._background = None
+
+        # Column heights and the state of each column's topmost atom, by whole-array reductions
+        keys = self._color_keys(lattice, cluster_map, metrics)
+        occupied = lattice != STATES['EMPTY']
+        filled = occupied.any(axis=2)
+        top = size_z - 1 - np.argmax(occupied[:, :, ::-1], axis=2)
+        height = np.where(filled, top + 1, 0)
+        surface = np.take_along_axis(keys, top[:, :, None], axis=2)[:, :, 0]
+        surface[~filled] = STATES['EMPTY']
+        self._frame_keys = keys
+        self._images[0].set_data(height.T)
+        self._images[1].set_data(surface.T)
+        self._set_slice_image()
+
+        for text in self._metric_texts:
+            text.remove()
+        self._metric_texts = []
+        if metrics:
+            self._add_enhanced_metrics(metrics)
+            for text in self._metric_texts:
+                text.set_animated(True)
+        self._blit_maps()
+
+    def set_slice(self, z: int):
+        """Show layer z in the slice panel of maps mode (the up/down keys step through layers)."""
+        self.slice_z = int(z)
+        if self._frame_keys is not None:
+            self._set_slice_image()
+            self._blit_maps()
+
+    def _set_slice_image(self):
+        size_z = self._frame_keys.shape[2]
+        self.slice_z = min(max(self.slice_z, 0), size_z - 1)
+        self._images[2].set_data(self._frame_keys[:, :, self.slice_z].T)
+        self._map_axes[2].set_title(f"Slice z = {self.slice_z} of {size_z}")
+
+    def keep_animated(self, artist):
+        """Redraw artist, e.g. a status line on this figure, with every blitted frame of maps mode."""
+        artist.set_animated(True)
+        self._extra_animated.append(artist)
+
+    def _animated_artists(self):
+        return [*self._images, self._map_axes[2].title, self.ax.title, *self._metric_texts, *self._extra_animated]
+
+    def _blit_maps(self):
+        """Redraw only the animated artists over the cached static background."""
+        canvas = self.fig.canvas
+        if self._background is None:
+            canvas.draw()  # Static parts; _on_draw caches them and adds the animated artists
+            plt.pause(0.001)
+        else:
+            canvas.restore_region(self._background)
+            for artist in self._animated_artists():
+                self.fig.draw_artist(artist)
+            canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def _on_draw(self, event):
+        """After a full draw (first frame, resize): cache the background, then draw the animated artists."""
+        canvas = self.fig.canvas
+        if self._images is None or canvas.is_saving():
+            return
+        self._background = canvas.copy_from_bbox(self.fig.bbox)
+        for artist in self._animated_artists():
+            self.fig.draw_artist(artist)
+
+    def _on_key(self, event):
+        if event.key in ('up', 'down'):
+            self.set_slice(self.slice_z + (1 if event.key == 'up' else -1))
+
     def _process_clusters(self, lattice, colors, cluster_map, metrics):
         """Process and highlight clusters with improved visualization."""
         # Highlight all clusters
@@ -90,20 +551,21 @@ class CrystalVisualizer:
             shade=True  # Enable shading for better depth perception
         )
 
-    def _configure_view(self, size, view_angle):
+    def _configure_view(self, shape, view_angle):
         """Configure the 3D view with consistent settings."""
+        size_x, size_y, size_z = shape
         self.ax.view_init(*(view_angle or VISUALIZATION['view_angle']))
         self.ax.set(
             xlabel='X (nm)', 
             ylabel='Y (nm)', 
             zlabel='Z (nm)',
-            xlim=(0, size),
-            ylim=(0, size),
-            zlim=(0, size)
+            xlim=(0, size_x),
+            ylim=(0, size_y),
+            zlim=(0, size_z)
         )
-        self.ax.set_xticks(np.linspace(0, size, 5))
-        self.ax.set_yticks(np.linspace(0, size, 5))
-        self.ax.set_zticks(np.linspace(0, size, 5))
+        self.ax.set_xticks(np.linspace(0, size_x, 5))
+        self.ax.set_yticks(np.linspace(0, size_y, 5))
+        self.ax.set_zticks(np.linspace(0, size_z, 5))
 
     def _draw_cluster_boxes(self, cluster_map):
         """Draw bounding boxes around clusters with improved styling."""
@@ -192,7 +654,9 @@ class CrystalVisualizer:
 
     def _add_text_box(self, x, y, text, fontsize=10, bbox_alpha=0.8):
         """Helper method to add consistent text boxes."""
-        self.ax.text2D(
+        # 3D axes place 2D text with text2D; the maps overlay is a plain axes
+        add_text = self.ax.text2D if hasattr(self.ax, 'text2D') else self.ax.text
+        text = add_text(
             x, y,
             text,
             transform=self.ax.transAxes,
@@ -205,19 +669,32 @@ class CrystalVisualizer:
             fontsize=fontsize,
             verticalalignment='top'
         )
+        self._metric_texts.append(text)
+        return text
+
+    def save_visualization(self, filename, dpi=300, tight=True):
+        """Save visualization with higher quality settings.
 
-    def save_visualization(self, filename):
-        """Save visualization with higher quality settings."""
+        tight=False keeps the full figure, so every saved frame has the same size.
+        """
+        # A normal draw leaves out animated (blitted) artists
+        animated = self._animated_artists() if self._images is not None else []
+        for artist in animated:
+            artist.set_animated(False)
         try:
             self.fig.savefig(
                 filename, 
-                dpi=300, 
-                bbox_inches='tight',
+                dpi=dpi, 
+                bbox_inches='tight' if tight else None,
                 facecolor=self.fig.get_facecolor(),
                 transparent=False
             )
+            self._background = None  # Saving redraws the canvas at another resolution
         except Exception as e:
             print(f"Error saving visualization: {str(e)}")
+        finally:
+            for artist in animated:
+                artist.set_animated(True)
 
     def __del__(self):
         """Clean up resources safely."""